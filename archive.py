@@ -0,0 +1,148 @@
+import os
+import uuid
+
+import pandas as pd
+
+from ingest import price_key, price_table_columns
+
+# Install requirements-archive.txt to use the archive; the crawler runs without it.
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+if pa is not None:
+    # Columns stored in the files, and the partition keys in the directory names.
+    file_schema = pa.schema([
+        ("station_id", pa.dictionary(pa.int32(), pa.string())),
+        ("brand", pa.dictionary(pa.int32(), pa.string())),
+        ("price", pa.float32()),
+        ("update_time", pa.timestamp("us", tz="UTC")),
+    ])
+    partition_schema = pa.schema([("month", pa.string()), ("fuel_type", pa.string())])
+    archive_schema = pa.unify_schemas([file_schema, partition_schema])
+    partitioning = ds.partitioning(partition_schema, flavor="hive")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The Parquet archive needs pyarrow. Run "
+                          "`pip install -r requirements-archive.txt`.")
+
+
+def to_utc(t):
+    """
+    :param t: Time; naive times are taken as UTC.
+    """
+    t = pd.Timestamp(t)
+    return t.tz_localize("UTC") if t.tz is None else t.tz_convert("UTC")
+
+
+def write_archive(prices, root):
+    """
+    Append fuel prices to the Parquet dataset at `root`, partitioned by the UTC month of
+    "update_time" and by fuel type, e.g. root/month=2026-01/fuel_type=91/*.parquet.
+    A day has too few prices to be worth a partition. Rows are sorted by station and
+    time, so the statistics of row groups let readers skip the ones without the
+    requested stations.
+    :param prices: Data frame with `price_table_columns`.
+    :param root: Directory of the dataset.
+    :return: Number of rows written.
+    """
+    require_pyarrow()
+    prices = prices[price_table_columns].dropna(subset=price_key)
+    if prices.empty:
+        return 0
+    prices = prices.assign(
+        update_time=pd.to_datetime(prices['update_time'], utc=True),
+        price=pd.to_numeric(prices['price']),
+    )
+    prices = prices.assign(month=prices['update_time'].dt.strftime("%Y-%m"))
+    prices = prices.sort_values(['station_id', 'update_time'])
+    table = pa.Table.from_pandas(prices, schema=archive_schema, preserve_index=False)
+    # A unique file name per write, so runs append instead of overwriting each other.
+    pq.write_to_dataset(table, root, partitioning=partitioning,
+                        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+                        existing_data_behavior="overwrite_or_ignore",
+                        # A backfill of years spans months times fuel types, which may
+                        # exceed the default limit of 1024 partitions per write.
+                        max_partitions=1_000_000)
+    return table.num_rows
+
+
+def read_archive(root, station_ids=None, since=None, until=None, fuel_types=None,
+                 columns=None):
+    """
+    Read fuel prices from the Parquet dataset at `root`. Filters are pushed down to the
+    dataset scan: partitions outside the months and fuel types are never opened, and row
+    groups without the stations are skipped by their statistics.
+    :param station_ids: Only these stations, if given.
+    :param since: Only prices updated at or after this time, if given.
+    :param until: Only prices updated before this time, if given.
+    :param fuel_types: Only these fuel types, if given.
+    :param columns: Columns to read, by default `price_table_columns`.
+    :return: Data frame of prices, unique on `price_key` (the same price is archived by
+    every run until it's updated), sorted by station and time.
+    """
+    require_pyarrow()
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    conditions = []
+    if station_ids is not None:
+        conditions.append(ds.field("station_id").isin(list(station_ids)))
+    if since is not None:
+        since = to_utc(since)
+        conditions.append(ds.field("month") >= since.strftime("%Y-%m"))
+        conditions.append(ds.field("update_time") >= pa.scalar(
+            since.to_pydatetime(), type=pa.timestamp("us", tz="UTC")))
+    if until is not None:
+        until = to_utc(until)
+        conditions.append(ds.field("month") <= until.strftime("%Y-%m"))
+        conditions.append(ds.field("update_time") < pa.scalar(
+            until.to_pydatetime(), type=pa.timestamp("us", tz="UTC")))
+    if fuel_types is not None:
+        conditions.append(ds.field("fuel_type").isin(list(fuel_types)))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    if columns is None:
+        columns = price_table_columns
+    scan_columns = columns + [c for c in price_key if c not in columns]
+    prices = dataset.to_table(columns=scan_columns, filter=condition).to_pandas()
+    for column in ['station_id', 'brand']:
+        if column in prices and isinstance(prices[column].dtype, pd.CategoricalDtype):
+            prices[column] = prices[column].astype(object)
+    prices = prices.drop_duplicates(subset=price_key)
+    prices = prices.sort_values(['station_id', 'update_time'], ignore_index=True)
+    return prices[columns]
+
+
+def compact_archive(root):
+    """
+    Merge the files of each partition, one per write, into one file without duplicated
+    prices, so reads open fewer files.
+    :return: Number of partitions compacted.
+    """
+    require_pyarrow()
+    compacted = 0
+    for month in sorted(os.listdir(root)):
+        if not month.startswith("month="):
+            continue
+        for fuel_type in sorted(os.listdir(os.path.join(root, month))):
+            directory = os.path.join(root, month, fuel_type)
+            files = [os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.endswith(".parquet")]
+            if len(files) < 2:
+                continue
+            prices = pq.read_table(files, schema=file_schema, partitioning=None).to_pandas()
+            prices = prices.drop_duplicates(subset=['station_id', 'update_time'])
+            prices = prices.sort_values(['station_id', 'update_time'])
+            table = pa.Table.from_pandas(prices, schema=file_schema, preserve_index=False)
+            # Write the merged file before removing the old ones, so a crash in between
+            # only leaves duplicates, which readers drop.
+            pq.write_table(table, os.path.join(directory, f"{uuid.uuid4().hex}-0.parquet"))
+            for file in files:
+                os.remove(file)
+            compacted += 1
+    return compacted
@@ -0,0 +1,49 @@
+import argparse
+import logging
+import os
+import sys
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from archive import require_pyarrow, write_archive, compact_archive
+
+parser = argparse.ArgumentParser(
+    description="Copy fuel prices from the database into the local Parquet archive.")
+parser.add_argument("archive", metavar="DIR", help="Directory of the Parquet dataset.")
+parser.add_argument("--since", default=None,
+                    help="Only copy prices updated at or after this time.")
+parser.add_argument("--until", default=None,
+                    help="Only copy prices updated before this time.")
+parser.add_argument("--compact-only", action="store_true",
+                    help="Don't copy; only merge the files of each partition, which "
+                         "every run appends to.")
+parser.add_argument("--chunk-size", type=int, default=500_000,
+                    help="Rows fetched and written at a time.")
+args = parser.parse_args()
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+require_pyarrow()
+
+if args.compact_only:
+    n = compact_archive(args.archive)
+    logging.info(f"Successfully compact {n} partitions of {args.archive}.")
+    sys.exit()
+
+engine = create_engine(os.environ["NEON_DB"])
+query = text("SELECT station_id, brand, fuel_type, price, update_time "
+             "FROM public.fuel_prices "
+             "WHERE (CAST(:since AS timestamptz) IS NULL OR update_time >= :since) "
+             "AND (CAST(:until AS timestamptz) IS NULL OR update_time < :until)")
+n = 0
+with engine.connect().execution_options(stream_results=True) as conn:
+    for chunk in pd.read_sql(query, conn, params={"since": args.since, "until": args.until},
+                             chunksize=args.chunk_size):
+        n += write_archive(chunk, args.archive)
+        logging.info(f"Archived {n} rows.")
+compact_archive(args.archive)
+logging.info(f"Successfully archive {n} rows to {args.archive}.")
@@ -0,0 +1,71 @@
+"""
+Compare reading the history of a few stations from the Parquet archive with filters
+pushed down, and reading the whole archive then filtering it. Doesn't need a database.
+
+    python -m benchmarks.bench_archive --rows 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from archive import write_archive, read_archive, compact_archive
+from benchmarks.local_db import synthetic_prices
+
+
+def directory_size(root):
+    return sum(os.path.getsize(os.path.join(path, name))
+               for path, _, names in os.walk(root) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--stations", type=int, default=600)
+    parser.add_argument("--runs", type=int, default=10,
+                        help="Writes that the rows are split into, like daily crawls.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Merge the files of each partition before reading.")
+    args = parser.parse_args()
+
+    station_ids = [f"{i:032d}" for i in range(args.stations)]
+    prices = synthetic_prices(station_ids, args.rows, days=args.days)
+    end = prices['update_time'].max()
+    with tempfile.TemporaryDirectory() as root:
+        t0 = time.perf_counter()
+        for i in range(args.runs):
+            write_archive(prices.iloc[i::args.runs], root)
+        write_time = time.perf_counter() - t0
+        print(f"Wrote {prices.shape[0]} rows in {write_time:.2f}s, "
+              f"{directory_size(root) / 2 ** 20:.1f} MiB on disk "
+              f"({prices.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB in memory).")
+        if args.compact:
+            t0 = time.perf_counter()
+            compact_archive(root)
+            print(f"Compacted in {time.perf_counter() - t0:.2f}s, "
+                  f"{directory_size(root) / 2 ** 20:.1f} MiB on disk.")
+
+        query = dict(station_ids=station_ids[:5], since=end - pd.Timedelta(days=30),
+                     until=end + pd.Timedelta(seconds=1))
+        t0 = time.perf_counter()
+        pushed_down = read_archive(root, **query)
+        pushdown_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        everything = read_archive(root)
+        filtered = everything[everything['station_id'].isin(query['station_ids']) &
+                              (everything['update_time'] >= query['since']) &
+                              (everything['update_time'] < query['until'])]
+        full_scan_time = time.perf_counter() - t0
+        assert filtered.shape[0] == pushed_down.shape[0]
+
+    print(f"5 stations, 30 days: {pushed_down.shape[0]} rows")
+    print(f"pushdown:  {pushdown_time:.3f}s")
+    print(f"full scan: {full_scan_time:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare logging in on every run with a fresh session (as main.py did) against
+`GaspyClient` with its login cache, over several consecutive runs against the local
+stub server. Reports per-request latency, logins, TCP handshakes, bytes on the wire,
+and re-authentications when the stub's login expires mid-run.
+
+    python -m benchmarks.bench_client --runs 5 --chunks 20 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+from requests import Session
+
+import crawler
+from gaspy_client import GaspyClient
+from geohash_planner import fixed_chunks
+from metrics import metrics
+from benchmarks.stub_gaspy import StubGaspy, fuel_type_meta
+
+
+def fresh_session_run(units, concurrency):
+    session = Session()
+    session.post(f"{crawler.gaspy_url}/api/v1/Public/login", data=json.dumps({}))
+    crawler.mount_pool(session, concurrency)
+    return asyncio.run(crawler.crawl_async(session, units, "bench", rate=float("inf"),
+                                           concurrency=concurrency))
+
+
+def client_run(units, concurrency, cache_path):
+    client = GaspyClient("bench", "bench", cache_path=cache_path, pool_size=concurrency)
+    client.login()
+    return asyncio.run(crawler.crawl_async(client, units, client.device_id,
+                                           rate=float("inf"), concurrency=concurrency))
+
+
+def measure(name, run, runs, **stub_args):
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    metrics.reset()
+    with StubGaspy(stations, **stub_args) as stub:
+        crawler.gaspy_url = stub.url
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            run()
+        seconds = time.perf_counter() - t0
+    summary = metrics.summary()
+    requests = summary["requests"]["blocksFromHashcodes"]
+    print(f"{name:<26} {seconds:>6.2f} {requests['latency_p50'] * 1000:>8.1f} "
+          f"{requests['latency_p95'] * 1000:>8.1f} {stub.logins:>6} {stub.connections:>6} "
+          f"{stub.bytes_sent / 2 ** 20:>7.2f} {summary['counters'].get('relogins', 0):>8} "
+          f"{summary['counters'].get('failed_regions', 0):>6}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=20,
+                        help="Number of station chunks to crawl per fuel type and run.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Server-side latency of each request, in seconds.")
+    args = parser.parse_args()
+
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+    units = crawler.plan_units(list(fuel_types), fuel_types,
+                               fixed_chunks(stations)[:args.chunks])
+    print(f"{args.runs} runs of {len(units)} requests")
+    print(f"{'':<26} {'time s':>6} {'p50 ms':>8} {'p95 ms':>8} {'logins':>6} "
+          f"{'conns':>6} {'MiB':>7} {'relogins':>8} {'failed':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "session.json")
+        seconds = measure("fresh session", lambda: fresh_session_run(units, args.concurrency),
+                args.runs, latency=args.latency, token_ttl=3600)
+        measure("client", lambda: client_run(units, args.concurrency, cache_path),
+                args.runs, latency=args.latency, token_ttl=3600)
+        os.remove(cache_path)
+        measure("client, gzip", lambda: client_run(units, args.concurrency, cache_path),
+                args.runs, latency=args.latency, token_ttl=3600, compress=True)
+        os.remove(cache_path)
+        # The login expires about twice per run.
+        measure("client, login expires", lambda: client_run(units, args.concurrency,
+                                                            cache_path),
+                args.runs, latency=args.latency, token_ttl=seconds / args.runs / 2)
+
+
+if __name__ == '__main__':
+    main()
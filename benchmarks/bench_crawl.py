@@ -0,0 +1,67 @@
+"""
+Compare the sequential, batched and async crawl engines against the local stub server.
+
+    python -m benchmarks.bench_crawl --chunks 12 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import pandas as pd
+from requests import Session
+
+import crawler
+from geohash_planner import fixed_chunks
+from benchmarks.stub_gaspy import StubGaspy, brands, fuel_type_meta
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=12,
+                        help="Number of station chunks to crawl per fuel type.")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Server-side latency of each request, in seconds.")
+    parser.add_argument("--rate", type=float, default=8.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    geo_hash_chunks = fixed_chunks(stations)[:args.chunks]
+    fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+    units = crawler.plan_units(list(fuel_types), fuel_types, geo_hash_chunks)
+    start_time = pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=1)
+    device_id = str(uuid.uuid4()).upper()
+
+    with StubGaspy(stations, latency=args.latency) as stub:
+        crawler.gaspy_url = stub.url
+
+        t0 = time.perf_counter()
+        sequential_blocks = crawler.crawl_sequential(Session(), units, device_id)
+        sequential_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batched_blocks = crawler.crawl_batched(
+            Session(), crawler.plan_batches(units), device_id)
+        batched_time = time.perf_counter() - t0
+
+        session = Session()
+        crawler.mount_pool(session, args.concurrency)
+        t0 = time.perf_counter()
+        async_blocks = asyncio.run(crawler.crawl_async(
+            session, units, device_id, rate=args.rate, concurrency=args.concurrency))
+        async_time = time.perf_counter() - t0
+
+    sequential_rows = crawler.parse_blocks(sequential_blocks, brands, start_time)
+    assert sequential_rows.equals(crawler.parse_blocks(batched_blocks, brands, start_time)), \
+        "The batched crawl returns different rows from the sequential crawl."
+    assert sequential_rows.equals(crawler.parse_blocks(async_blocks, brands, start_time)), \
+        "The async crawl returns different rows from the sequential crawl."
+    print(f"requests: {len(units)}, rows: {len(sequential_rows)}")
+    print(f"sequential: {sequential_time:.2f}s, {len(units) / sequential_time:.2f} req/s")
+    print(f"batched:    {batched_time:.2f}s, {len(units) / batched_time:.2f} req/s")
+    print(f"async:      {async_time:.2f}s, {len(units) / async_time:.2f} req/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Compare the payload size and build time of the history page of a busy station, as a
+Plotly Express figure of every report (as before) and as the downsampled step chart
+with typed arrays, uncompressed and compressed. Uses a local PostgreSQL database (see
+benchmarks/local_db.py). Browser render time isn't measured; the number of points drawn
+is reported instead.
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_history --interval 10
+"""
+import argparse
+import gzip
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dash._utils import to_json
+
+from postgresql_upsert import upsert_dataframe
+from benchmarks.local_db import bench_engine, reset_schema, load_stations
+
+# The dashboard connects to NEON_DB when it's imported.
+os.environ["NEON_DB"] = os.environ.get("BENCH_DB", "")
+import dashboard  # noqa: E402
+
+
+def busy_station_prices(station_id, interval, change_probability, days=180, seed=0):
+    """
+    Reports every `interval` minutes over `days` days for 4 fuel types, where each
+    report changes the price with `change_probability`.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp('now', tz='UTC').floor('min')
+    times = pd.date_range(end=end, periods=days * 24 * 60 // interval,
+                          freq=f"{interval}min")
+    frames = []
+    for fuel_type, base in [("91", 250.0), ("95", 270.0), ("98", 285.0), ("D", 210.0)]:
+        changes = rng.random(len(times)) < change_probability
+        steps = np.where(changes, rng.normal(0, 3, len(times)), 0)
+        frames.append(pd.DataFrame({
+            "station_id": station_id, "brand": "Z", "fuel_type": fuel_type,
+            "price": np.round(base + np.cumsum(steps), 1), "update_time": times,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def step_value(df, fuel_type, at):
+    """
+    Price shown by the step chart of `df` at times `at`.
+    """
+    part = df[df['fuel_type'] == fuel_type]
+    i = np.searchsorted(part['update_time'].to_numpy(), at, side='right') - 1
+    return part['price'].to_numpy()[i]
+
+
+def payload(build):
+    """
+    :return: Seconds to query, build and serialize, JSON bytes, gzip bytes, brotli bytes (or
+    None), and the number of points.
+    """
+    t0 = time.perf_counter()
+    fig = build()
+    body = to_json(fig.to_plotly_json()).encode()
+    seconds = time.perf_counter() - t0
+    points = sum(len(trace.y) if not isinstance(trace.y, dict) else 0
+                 for trace in fig.data)
+    return (seconds, len(body), len(gzip.compress(body, compresslevel=6)),
+            len(dashboard.brotli.compress(body, quality=5)) if dashboard.brotli else None,
+            points)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=int, default=10,
+                        help="Minutes between reports of each fuel type.")
+    parser.add_argument("--change-probability", type=float, default=0.02)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    station_id = load_stations(engine)['station_id'].iloc[0]
+    prices = busy_station_prices(station_id, args.interval, args.change_probability)
+    upsert_dataframe(engine, prices, ['station_id', 'fuel_type', 'update_time'],
+                     'fuel_prices', backend="copy")
+
+    history = dashboard.get_historical_prices(station_id)
+    downsampled = dashboard.step_downsample(history, dashboard.history_max_points)
+    # Without the limit of points, only repeated prices are dropped.
+    changes = dashboard.step_downsample(history, history.shape[0])
+    at = history['update_time'].sample(2000, random_state=0).sort_values().to_numpy()
+    for fuel_type in history['fuel_type'].unique():
+        assert (step_value(history, fuel_type, at) ==
+                step_value(changes, fuel_type, at)).all(), \
+            f"The step chart of {fuel_type} changes."
+
+    def before():
+        fig = dashboard.px.line(dashboard.get_historical_prices(station_id),
+                                x="update_time", y="price", color="fuel_type",
+                                line_shape="hv", markers=True)
+        fig.update_layout(font={'family': 'Arial'})
+        return fig
+
+    print(f"{history.shape[0]} reports, {changes.shape[0]} price changes, "
+          f"{downsampled.shape[0]} points with HISTORY_MAX_POINTS="
+          f"{dashboard.history_max_points}")
+    print(f"{'':<12} {'build s':>8} {'JSON kB':>9} {'gzip kB':>9} {'brotli kB':>10} "
+          f"{'points':>8}")
+    for name, build in [("every point", before),
+                        ("step chart", lambda: dashboard.generate_history_figure(
+                            station_id))]:
+        dashboard.query_cache.clear()
+        seconds, size, gzip_size, brotli_size, points = payload(build)
+        brotli_text = "-" if brotli_size is None else f"{brotli_size / 1000:.1f}"
+        print(f"{name:<12} {seconds:>8.3f} {size / 1000:>9.1f} {gzip_size / 1000:>9.1f} "
+              f"{brotli_text:>10} {points:>8}")
+
+
+if __name__ == '__main__':
+    main()
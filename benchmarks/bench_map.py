@@ -0,0 +1,93 @@
+"""
+Compare the payload size and build time of the dashboard map when it shows every
+station, and when it shows only the viewport, as the number of stations grows. Uses a
+local PostgreSQL database (see benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_map
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from benchmarks.local_db import bench_engine, reset_schema
+
+# The dashboard connects to NEON_DB when it's imported.
+os.environ["NEON_DB"] = os.environ.get("BENCH_DB", "")
+import dashboard  # noqa: E402
+
+
+def synthetic_stations(stations, copies, seed=0):
+    """
+    `copies` copies of each station within about 2km of it, with new IDs and the geo hash
+    of the original station.
+    """
+    rng = np.random.default_rng(seed)
+    stations = pd.concat([stations] * copies, ignore_index=True)
+    stations['station_id'] = [f"{i:032d}" for i in range(stations.shape[0])]
+    stations['latitude'] += rng.uniform(-0.02, 0.02, size=stations.shape[0])
+    stations['longitude'] += rng.uniform(-0.02, 0.02, size=stations.shape[0])
+    return stations
+
+
+def build(fuel_type, viewport=None):
+    """
+    :return: Payload size in bytes, and seconds to query and build the figure.
+    """
+    dashboard.query_cache.clear()
+    t0 = time.perf_counter()
+    if viewport is None:
+        # All stations of the fuel type, as the map did before it was viewport-aware.
+        with open("sqls/get_latest_price.sql") as f:
+            df = pd.read_sql(text(f.read()), dashboard.engine,
+                             params={"fuel_type": fuel_type})
+        fig = dashboard.px.scatter_map(df, lat="latitude", lon="longitude", color="price",
+                                       custom_data=["brand", "price", "station_id", "name"])
+    else:
+        fig = dashboard.generate_map_figure(fuel_type, viewport)
+    payload = json.dumps(fig.to_plotly_json(), default=str)
+    return len(payload), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    views = {
+        "all stations": None,
+        "New Zealand": dashboard.initial_viewport,
+        "Auckland z8": dashboard.snap_viewport((174.3, -37.2, 175.3, -36.6), 8),
+        "Auckland z12": dashboard.snap_viewport((174.74, -36.88, 174.80, -36.84), 12),
+    }
+    stations = pd.read_csv("stations.csv", dtype={"id": str}).rename(
+        columns={"id": "station_id"}).drop(columns="city").dropna(
+        subset=["latitude", "longitude"])
+    print(f"{'stations':>9} {'view':<14} {'payload kB':>11} {'seconds':>8}")
+    for copies in args.copies:
+        reset_schema(engine)
+        scaled = synthetic_stations(stations, copies)
+        scaled.to_sql("stations", engine, schema="public", if_exists="append", index=False)
+        rng = np.random.default_rng(copies)
+        pd.DataFrame({
+            "station_id": scaled['station_id'],
+            "fuel_type": "91",
+            "brand": rng.choice(["Z", "BP", "Mobil", "Gull", "Waitomo"], size=scaled.shape[0]),
+            "price": np.round(rng.uniform(180, 320, size=scaled.shape[0]), 1),
+            "update_time": pd.Timestamp('now', tz='UTC'),
+        }).to_sql("latest_prices", engine, schema="public", if_exists="append", index=False)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE public.stations, public.latest_prices")
+        for name, viewport in views.items():
+            payload_size, seconds = build("91", viewport)
+            print(f"{scaled.shape[0]:>9} {name:<14} {payload_size / 1024:>11.1f} "
+                  f"{seconds:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the per-row and vectorized parsing of blocksFromHashcodes responses on
+synthetic data.
+
+    python -m benchmarks.bench_parse --responses 200 --stations 40
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+import crawler
+from benchmarks.stub_gaspy import brands
+
+
+def synthetic_blocks(n_responses, n_stations, now):
+    rng = random.Random(0)
+    blocks = []
+    for i in range(n_responses):
+        data = []
+        for j in range(n_stations):
+            update_time = now - pd.Timedelta(minutes=rng.randrange(48 * 60))
+            data.append({
+                "stationKey": f"station{i:05d}{j:03d}",
+                "stationName": f"Station {i}-{j}",
+                "brandId": rng.choice(list(brands) + ["0"]),
+                # A few malformed fields exercise the coercion of both parsers.
+                "price": rng.choice([round(rng.uniform(180, 300), 1)] * 20 + [None, "n/a"]),
+                "dateUpdated": rng.choice(
+                    [update_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")] * 50 + ["garbage"]),
+                "lat": -36.8 + rng.random(),
+                "lng": 174.7 + rng.random(),
+                "geoHash": "rckq" + "".join(rng.choices("0123456789bcdefg", k=2)),
+            })
+        blocks.append((rng.choice(["91", "D", "95", "98"]), data))
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--responses", type=int, default=200)
+    parser.add_argument("--stations", type=int, default=40,
+                        help="Stations per response.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    now = pd.Timestamp('now', tz='UTC')
+    start_time = now - pd.Timedelta(days=1)
+    blocks = synthetic_blocks(args.responses, args.stations, now)
+    n = args.responses * args.stations
+
+    timings = {}
+    results = {}
+    for name, parse in [("per-row", crawler.parse_blocks_per_row),
+                        ("vectorized", crawler.parse_blocks)]:
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            results[name] = parse(blocks, brands, start_time)
+            best = min(best, time.perf_counter() - t0)
+        timings[name] = best
+
+    # The per-row path keeps pd.NA in object columns, so compare as floats / strings.
+    per_row, vectorized = results["per-row"], results["vectorized"]
+    for column in ['price', 'latitude', 'longitude']:
+        per_row[column] = pd.to_numeric(per_row[column]).astype(float)
+    per_row['update_time'] = per_row['update_time'].astype(vectorized['update_time'].dtype)
+    pd.testing.assert_frame_equal(per_row.astype(object).where(per_row.notna(), None),
+                                  vectorized.astype(object).where(vectorized.notna(), None))
+
+    print(f"stations: {n}, rows kept: {vectorized.shape[0]}")
+    for name, seconds in timings.items():
+        print(f"{name:<10} {seconds * 1000:8.1f} ms, {n / seconds:12,.0f} stations/s")
+    print(f"speedup: {timings['per-row'] / timings['vectorized']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
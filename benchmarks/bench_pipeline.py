@@ -0,0 +1,83 @@
+"""
+Compare crawling then writing with the pipelined writer, against the local stub server
+and a local PostgreSQL database (see benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_pipeline
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import pandas as pd
+from requests import Session
+from sqlalchemy import text
+
+import crawler
+from geohash_planner import fixed_chunks
+from ingest import price_table_columns, station_table_columns, write_chunks, write_prices, \
+    PipelineWriter
+from benchmarks.local_db import bench_engine, reset_schema, load_stations
+from benchmarks.stub_gaspy import StubGaspy, brands, fuel_type_meta
+
+
+def crawl(units, args, sink=None):
+    session = Session()
+    crawler.mount_pool(session, args.concurrency)
+    return asyncio.run(crawler.crawl_async(
+        session, units, str(uuid.uuid4()).upper(), rate=args.rate,
+        concurrency=args.concurrency, sink=sink))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Server-side latency of each request, in seconds.")
+    parser.add_argument("--rate", type=float, default=8.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=16)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    stations = load_stations(engine)
+    fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+    units = crawler.plan_units(list(fuel_types), fuel_types,
+                               fixed_chunks(stations, chunk_size=39))
+    start_time = pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=1)
+
+    with StubGaspy(stations.rename(columns={"station_id": "id"}).dropna(
+            subset=["geo_hash"]), latency=args.latency) as stub:
+        crawler.gaspy_url = stub.url
+
+        t0 = time.perf_counter()
+        blocks = crawl(units, args)
+        crawl_time = time.perf_counter() - t0
+        compound_data = crawler.parse_blocks(blocks, brands, start_time)
+        compound_data = compound_data.drop_duplicates(subset=['station_id', 'fuel_type'])
+        compound_data["name"] = compound_data["name"].str[:128]
+        write_prices(engine, compound_data[price_table_columns])
+        station_locs = compound_data.drop_duplicates(subset=['station_id']).dropna(
+            subset=['geo_hash'])
+        write_chunks(engine, station_locs[station_table_columns], ['station_id'],
+                     'stations')
+        sequential_time = time.perf_counter() - t0
+
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE public.fuel_prices, public.latest_prices"))
+        t0 = time.perf_counter()
+        writer = PipelineWriter(engine, brands, start_time, queue_size=args.queue_size)
+        writer.start()
+        try:
+            crawl(units, args, sink=writer.put)
+        finally:
+            writer.close()
+        pipeline_time = time.perf_counter() - t0
+
+    print(f"requests: {len(units)}, crawl only: {crawl_time:.2f}s")
+    print(f"crawl then write: {sequential_time:.2f}s, {compound_data.shape[0]} rows")
+    print(f"pipelined:        {pipeline_time:.2f}s, {writer.prices_written} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Count requests per fuel type of the fixed chunks and the trie planner over stations.csv,
+and check against the stub server that each plan returns the same stations.
+
+    python -m benchmarks.bench_planner --max-hashcodes 39
+"""
+import argparse
+
+import pandas as pd
+from requests import Session
+
+import crawler
+from geohash_planner import fixed_chunks, trie_chunks
+from benchmarks.stub_gaspy import StubGaspy, brands
+
+
+def crawled_stations(geo_hash_chunks, start_time):
+    units = crawler.plan_units(['91'], {'91': 1}, geo_hash_chunks)
+    session = Session()
+    blocks = []
+    for fuel_type, fuel_type_id, geo_hash_list in units:
+        response = session.post(
+            f"{crawler.gaspy_url}/api/v1/Map/blocksFromHashcodes",
+            data=crawler.blocks_request_body(geo_hash_list, fuel_type_id, fuel_type, ""))
+        blocks.append((fuel_type, crawler.parse_blocks_response(response, geo_hash_list)))
+    return set(crawler.parse_blocks(blocks, brands, start_time)['station_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-hashcodes", type=int, default=39)
+    args = parser.parse_args()
+
+    stations = pd.read_csv("stations.csv", dtype=str)
+    baseline = fixed_chunks(stations, args.max_hashcodes)
+    plans = {
+        "fixed": baseline,
+        "trie": trie_chunks(stations, args.max_hashcodes),
+        "trie, mixed lengths": trie_chunks(stations, args.max_hashcodes, mixed_lengths=True),
+        "trie, siblings >= 3": trie_chunks(stations, args.max_hashcodes, sibling_threshold=3),
+        "trie, siblings >= 2, mixed lengths": trie_chunks(
+            stations, args.max_hashcodes, mixed_lengths=True, sibling_threshold=2),
+    }
+    start_time = pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=30)
+    with StubGaspy(latency=0) as stub:
+        crawler.gaspy_url = stub.url
+        expected = crawled_stations(baseline, start_time)
+        for name, chunks in plans.items():
+            covered = crawled_stations(chunks, start_time) >= expected
+            print(f"{name:<36} {len(chunks):>4} requests per fuel type, "
+                  f"{len(baseline) - len(chunks):>3} saved, "
+                  f"{'covers' if covered else 'MISSES'} all stations")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure how long refreshing "daily_price_stats" takes, in full and for the last day as
+after each crawl, and compare the latency of the dashboard's trend query on the rollup
+with computing the same statistics from "fuel_prices", on a year of synthetic prices in a
+local PostgreSQL database (see benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_price_stats --rows 2000000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from ingest import refresh_price_stats
+from postgresql_upsert import upsert_dataframe
+from benchmarks.bench_queries import latency
+from benchmarks.local_db import bench_engine, reset_schema, load_stations, synthetic_prices
+
+# The statistics of sqls/get_daily_price_stats.sql for one dimension, without the rollup.
+raw_city_trend = """SELECT (fp.update_time AT TIME ZONE 'Pacific/Auckland')::date AS day,
+       s.city AS value, count(DISTINCT fp.station_id) AS stations, count(*) AS reports,
+       min(fp.price) AS min_price,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY fp.price) AS median_price,
+       avg(fp.price) AS mean_price, max(fp.price) AS max_price
+FROM public.fuel_prices fp
+    JOIN public.stations s
+ON fp.station_id = s.station_id
+WHERE fp.fuel_type = :fuel_type
+    AND s.city IS NOT NULL
+    AND fp.update_time >= current_date - :days
+GROUP BY 1, 2
+ORDER BY 2, 1"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    stations = load_stations(engine)
+    prices = synthetic_prices(stations['station_id'], args.rows, days=args.days)
+    upsert_dataframe(engine, prices, ['station_id', 'fuel_type', 'update_time'],
+                     'fuel_prices', backend="copy")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print(f"Loaded {prices.shape[0]} rows.")
+
+    t0 = time.perf_counter()
+    n = refresh_price_stats(engine)
+    print(f"Full refresh:     {time.perf_counter() - t0:>7.2f}s, {n} rows")
+    t0 = time.perf_counter()
+    n = refresh_price_stats(engine, prices['update_time'].max() - pd.Timedelta(days=1))
+    print(f"Last day refresh: {time.perf_counter() - t0:>7.2f}s, {n} rows")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE public.daily_price_stats")
+
+    with open("sqls/get_daily_price_stats.sql") as f:
+        sql_daily_price_stats = f.read()
+    print(f"{'trend query, 90 days':<24} {'p50':>8} {'p95':>8}  (ms)")
+    for name, sql in [("daily_price_stats", sql_daily_price_stats),
+                      ("fuel_prices", raw_city_trend)]:
+        params = [{"fuel_type": fuel_type, "dimension": "city", "days": 90}
+                  for fuel_type in ["91", "D", "95", "98"]]
+        p50, p95 = latency(engine, sql, params, args.repeat)
+        print(f"{name:<24} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
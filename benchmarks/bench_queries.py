@@ -0,0 +1,128 @@
+"""
+Measure the latency of the queries in sqls/ on years of synthetic prices, before and
+after migrations/002_partition_fuel_prices.sql, on a local PostgreSQL database (see
+benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_queries --rows 2000000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from postgresql_upsert import upsert_dataframe, invalidate_table_cache
+from benchmarks.local_db import bench_engine, reset_schema, load_stations, synthetic_prices
+
+# sqls/prices_of_unknown_stations.sql before it was rewritten as an anti-join.
+legacy_unknown_stations = """select *
+from fuel_prices
+where station_id not in (select distinct station_id from stations)
+order by station_id, update_time"""
+
+
+# "fuel_prices" before migrations/002_partition_fuel_prices.sql.
+legacy_fuel_prices = """DROP TABLE public.fuel_prices CASCADE;
+DROP FUNCTION public.ensure_fuel_prices_partitions;
+CREATE TABLE public.fuel_prices (
+    station_id character varying(32),
+    fuel_type character varying(8),
+    brand character varying(32),
+    price numeric(6,1),
+    update_time timestamp with time zone
+);
+ALTER TABLE ONLY public.fuel_prices
+    ADD CONSTRAINT fuel_prices_uniq_1 UNIQUE (station_id, fuel_type, update_time);
+DROP INDEX public.latest_prices_fuel_type_idx;"""
+
+
+def run_sql_file(engine, path):
+    with open(path) as f:
+        sql = "\n".join(line for line in f.read().splitlines()
+                        if not line.startswith("\\"))
+    with engine.begin() as conn:
+        # A DB-API cursor without parameters, so "%" in format() strings is kept as is.
+        with conn.connection.dbapi_connection.cursor() as cursor:
+            cursor.execute(sql)
+
+
+def latency(engine, sql, params_list, repeat):
+    """
+    :return: Median and p95 of query latency in milliseconds.
+    """
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            for params in params_list:
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), float(np.percentile(samples, 95))
+
+
+def measure(engine, queries, repeat):
+    return {name: latency(engine, sql, params_list, repeat)
+            for name, (sql, params_list) in queries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--unknown-stations", type=int, default=50,
+                        help="Stations with prices but not in the stations table.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(legacy_fuel_prices)
+    stations = load_stations(engine)
+    station_ids = list(stations['station_id']) + [
+        f"unknown{i:025d}" for i in range(args.unknown_stations)]
+    prices = synthetic_prices(station_ids, args.rows, days=365 * args.years)
+    t0 = time.perf_counter()
+    upsert_dataframe(engine, prices, ['station_id', 'fuel_type', 'update_time'],
+                     'fuel_prices', backend="copy")
+    run_sql_file(engine, "sqls/rebuild_latest_prices.sql")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print(f"Loaded {prices.shape[0]} rows in {time.perf_counter() - t0:.1f}s")
+
+    with open("sqls/get_latest_price.sql") as f:
+        sql_latest_price = f.read()
+    with open("sqls/get_price.sql") as f:
+        sql_price_per_station = f.read()
+    with open("sqls/prices_of_unknown_stations.sql") as f:
+        sql_unknown_stations = f.read()
+    sample = pd.Series(station_ids).sample(20, random_state=0)
+    price_params = [{"station_id": station_id} for station_id in sample]
+    latest_params = [{"fuel_type": fuel_type} for fuel_type in ["91", "D", "95", "98"]]
+
+    before = measure(engine, {
+        "get_latest_price": (sql_latest_price, latest_params),
+        "get_price": (sql_price_per_station, price_params),
+        "prices_of_unknown_stations": (legacy_unknown_stations, [{}]),
+    }, args.repeat)
+
+    t0 = time.perf_counter()
+    run_sql_file(engine, "migrations/002_partition_fuel_prices.sql")
+    invalidate_table_cache(engine)
+    print(f"Migrated in {time.perf_counter() - t0:.1f}s")
+    after = measure(engine, {
+        "get_latest_price": (sql_latest_price, latest_params),
+        "get_price": (sql_price_per_station, price_params),
+        "prices_of_unknown_stations": (sql_unknown_stations, [{}]),
+    }, args.repeat)
+
+    print(f"{'query':<28} {'before p50':>10} {'p95':>8} {'after p50':>10} {'p95':>8}  (ms)")
+    for name in before:
+        print(f"{name:<28} {before[name][0]:>10.2f} {before[name][1]:>8.2f} "
+              f"{after[name][0]:>10.2f} {after[name][1]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
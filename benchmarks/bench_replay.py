@@ -0,0 +1,103 @@
+"""
+Deterministic end-to-end throughput of parsing and upserting, replaying a recording of
+gaspy.nz responses (main.py --record FILE) against a local PostgreSQL database (see
+benchmarks/local_db.py). Without --recording, one is made from the local stub first.
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_replay \
+        --recording crawl.jsonl.gz
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+from requests import Session
+from sqlalchemy import text
+
+import crawler
+from geohash_planner import fixed_chunks
+from ingest import price_table_columns, station_table_columns, write_chunks, write_prices
+from recording import RecordingSession, ReplaySession
+from benchmarks.local_db import bench_engine, reset_schema
+from benchmarks.stub_gaspy import StubGaspy
+
+
+def login(session):
+    response_json = session.post(f"{crawler.gaspy_url}/api/v1/Public/login",
+                                 data=json.dumps({})).json()
+    fuel_types = {meta['code']: int(key)
+                  for key, meta in response_json['data']['fuel_types'].items()}
+    return fuel_types, response_json['data']['brands']
+
+
+def record_stub(path):
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    with StubGaspy(stations, latency=0) as stub:
+        crawler.gaspy_url = stub.url
+        session = RecordingSession(Session(), path, pd.Timestamp('now', tz='UTC'))
+        fuel_types, _ = login(session)
+        units = crawler.plan_units(list(fuel_types), fuel_types,
+                                   fixed_chunks(stations, chunk_size=39))
+        asyncio.run(crawler.crawl_async(session, units, "bench", rate=float("inf"),
+                                        concurrency=8))
+        session.close()
+
+
+def replay(path, engine, backend):
+    """
+    :return: Seconds spent in each stage, and the number of rows parsed and written.
+    """
+    t0 = time.perf_counter()
+    session = ReplaySession(path)
+    fuel_types, brands = login(session)
+    blocks = asyncio.run(crawler.crawl_async(
+        session, session.units(fuel_types), "bench", rate=float("inf"), concurrency=8))
+    t1 = time.perf_counter()
+    prices = crawler.parse_blocks(blocks, brands,
+                                  session.recorded_at - pd.Timedelta(days=1))
+    t2 = time.perf_counter()
+    prices = prices.drop_duplicates(subset=['station_id', 'fuel_type'])
+    prices["name"] = prices["name"].str[:128]
+    write_prices(engine, prices[price_table_columns], backend)
+    station_locs = prices.drop_duplicates(subset=['station_id']).dropna(subset=['geo_hash'])
+    write_chunks(engine, station_locs[station_table_columns], ['station_id'], 'stations',
+                 backend)
+    t3 = time.perf_counter()
+    return {"load": t1 - t0, "parse": t2 - t1, "write": t3 - t2,
+            "parsed": sum(len(data) for _, data in blocks), "written": prices.shape[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording", default=None,
+                        help="Recording made by main.py --record. By default, record the "
+                             "local stub.")
+    parser.add_argument("--backend", choices=["values", "copy"], default="copy")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.recording
+        if path is None:
+            path = os.path.join(directory, "stub.jsonl.gz")
+            record_stub(path)
+        reset_schema(engine)
+        print(f"{'run':>3} {'load s':>7} {'parse s':>8} {'rows/s':>10} {'write s':>8} "
+              f"{'rows/s':>10}")
+        for i in range(args.repeat):
+            # Each run writes into empty tables, so runs are comparable.
+            with engine.begin() as conn:
+                conn.execute(text("TRUNCATE public.fuel_prices, public.latest_prices, "
+                                  "public.stations"))
+            result = replay(path, engine, args.backend)
+            print(f"{i:>3} {result['load']:>7.2f} {result['parse']:>8.3f} "
+                  f"{result['parsed'] / result['parse']:>10,.0f} {result['write']:>8.3f} "
+                  f"{result['written'] / result['write']:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
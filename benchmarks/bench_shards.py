@@ -0,0 +1,80 @@
+"""
+Run main.py as N shard processes in parallel against the local stub server and a local
+PostgreSQL database (see benchmarks/local_db.py), merge their metrics, and check that
+the shards together write the same prices as one process.
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_shards --shards 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from benchmarks.local_db import bench_engine, reset_schema, load_stations
+from benchmarks.stub_gaspy import StubGaspy
+
+
+def run_shards(env, count, directory, extra_args):
+    """
+    :return: Seconds until all shards finish.
+    """
+    t0 = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "main.py", "--shard", f"{i}/{count}",
+             "--metrics", os.path.join(directory, f"metrics.{i}of{count}.json"),
+             "--checkpoint", os.path.join(directory, f"checkpoint.{i}of{count}.jsonl")]
+            + extra_args,
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for i in range(1, count + 1)
+    ]
+    for i, process in enumerate(processes, start=1):
+        if process.wait() != 0:
+            raise RuntimeError(f"Shard {i}/{count} exits with {process.returncode}.")
+    return time.perf_counter() - t0
+
+
+def fuel_prices(engine):
+    return pd.read_sql(text("SELECT station_id, fuel_type, price, update_time "
+                            "FROM public.fuel_prices ORDER BY 1, 2, 4"), engine)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Server-side latency of each request, in seconds.")
+    parser.add_argument("--rate", type=float, default=4.0,
+                        help="Requests per second of each process.")
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    extra_args = ["--mode", "async", "--rate", str(args.rate), "--db-backend", "copy"]
+    with StubGaspy(latency=args.latency) as stub, \
+            tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, NEON_DB=os.environ["BENCH_DB"], GASPY_URL=stub.url,
+                   GASPY_EMAIL="bench", GASPY_PASSWORD="bench")
+        results = {}
+        for count in [1, args.shards]:
+            reset_schema(engine)
+            load_stations(engine)
+            seconds = run_shards(env, count, directory, extra_args)
+            results[count] = seconds, fuel_prices(engine)
+            inputs = [os.path.join(directory, f"metrics.{i}of{count}.json")
+                      for i in range(1, count + 1)]
+            subprocess.run([sys.executable, "merge_metrics.py", *inputs, "--output",
+                            os.path.join(directory, f"metrics.{count}.json")], check=True)
+
+    (one_seconds, one_prices), (n_seconds, n_prices) = results[1], results[args.shards]
+    print(f"1 process:   {one_seconds:.1f}s, {one_prices.shape[0]} prices")
+    print(f"{args.shards} processes: {n_seconds:.1f}s, {n_prices.shape[0]} prices")
+    print(f"Same prices: {one_prices.equals(n_prices)}")
+
+
+if __name__ == '__main__':
+    main()
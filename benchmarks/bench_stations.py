@@ -0,0 +1,115 @@
+"""
+Compare loading stations at crawl startup with `select * from stations` against
+`StationIndex` with and without its local cache, and re-upserting every crawled station
+against writing only the changed ones, on synthetic stations in a local PostgreSQL
+database (see benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_stations --stations 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from geohash_planner import fixed_chunks
+from ingest import station_table_columns, write_chunks
+from station_index import StationIndex
+from benchmarks.local_db import bench_engine, reset_schema
+
+base32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+
+def synthetic_stations(n, seed=0):
+    """
+    Stations around the ones of stations.csv, with geo hashes of 6 to 8 characters.
+    """
+    rng = np.random.default_rng(seed)
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    base = stations.iloc[rng.integers(stations.shape[0], size=n)].reset_index(drop=True)
+    suffixes = ["".join(chars) for chars in base32[rng.integers(32, size=(n, 2))]]
+    return pd.DataFrame({
+        "station_id": [f"{i:032d}" for i in range(n)],
+        "name": base["name"].to_numpy(),
+        "geo_hash": (base["geo_hash"].str[:6] + pd.Series(suffixes)).str[
+            :6 + rng.integers(3)],
+        "latitude": base["latitude"].astype(float) + rng.normal(0, 0.01, n),
+        "longitude": base["longitude"].astype(float) + rng.normal(0, 0.01, n),
+    })
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - t0)
+    return min(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stations", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=["values", "copy"], default="values")
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    stations = synthetic_stations(args.stations)
+    stations.to_sql("stations", engine, schema="public", if_exists="append", index=False)
+
+    def full_load():
+        with engine.connect() as conn:
+            return pd.read_sql("select * from stations", conn)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "stations_cache.json")
+
+        def index_load(path):
+            return StationIndex.load(engine, path).stations
+
+        full_time, full_stations = timed(full_load, args.repeat)
+        cold_time, _ = timed(lambda: index_load(None), args.repeat)
+        index_load(cache_path)
+        warm_time, warm_stations = timed(lambda: index_load(cache_path), args.repeat)
+    assert fixed_chunks(full_stations) == fixed_chunks(warm_stations)
+    print(f"{args.stations} stations, startup load:")
+    print(f"select *:            {full_time:.3f}s")
+    print(f"index, no cache:     {cold_time:.3f}s")
+    print(f"index, cache hit:    {warm_time:.3f}s")
+
+    # A crawl sees every station again, with 1% new and 1% moved.
+    rng = np.random.default_rng(1)
+    crawled = stations.copy()
+    moved = rng.choice(args.stations, size=args.stations // 100, replace=False)
+    crawled.loc[moved, "latitude"] += 0.001
+    new = synthetic_stations(args.stations // 100, seed=2).assign(
+        station_id=[f"new{i:029d}" for i in range(args.stations // 100)])
+    crawled = pd.concat([crawled, new], ignore_index=True)[station_table_columns]
+    index = StationIndex.load(engine)
+
+    def write_all():
+        write_chunks(engine, crawled, ['station_id'], 'stations', args.backend)
+        return crawled.shape[0]
+
+    def write_changed():
+        changed = index.changed(crawled)
+        write_chunks(engine, changed, ['station_id'], 'stations', args.backend)
+        return changed.shape[0]
+
+    all_time, all_rows = timed(write_all, 1)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE public.stations"))
+    stations.to_sql("stations", engine, schema="public", if_exists="append", index=False)
+    changed_time, changed_rows = timed(write_changed, 1)
+    print(f"Write crawled stations ({args.backend}):")
+    print(f"every station:       {all_time:.3f}s, {all_rows} rows")
+    print(f"changed only:        {changed_time:.3f}s, {changed_rows} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare the multi-VALUES and COPY backends of postgresql_upsert against a local
+PostgreSQL database (see benchmarks/local_db.py).
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.bench_upsert
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from postgresql_upsert import upsert_dataframe
+from benchmarks.local_db import bench_engine, reset_schema, load_stations, synthetic_prices
+
+
+def write(engine, prices, backend, chunk_size):
+    t0 = time.perf_counter()
+    for i in range(0, prices.shape[0], chunk_size):
+        upsert_dataframe(engine, prices.iloc[i:i + chunk_size],
+                         ['station_id', 'fuel_type', 'update_time'], 'fuel_prices',
+                         backend=backend)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--values-chunk-size", type=int, default=2000)
+    parser.add_argument("--copy-chunk-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    engine = bench_engine()
+    reset_schema(engine)
+    stations = load_stations(engine)
+    print(f"{'rows':>9} {'backend':<8} {'insert s':>9} {'rows/s':>10} "
+          f"{'update s':>9} {'rows/s':>10}")
+    for n_rows in args.rows:
+        prices = synthetic_prices(stations['station_id'], n_rows)
+        for backend, chunk_size in [("values", args.values_chunk_size),
+                                    ("copy", args.copy_chunk_size)]:
+            with engine.begin() as conn:
+                conn.execute(text("TRUNCATE public.fuel_prices"))
+            # The first pass inserts new rows, the second conflicts on every row.
+            insert_time = write(engine, prices, backend, chunk_size)
+            update_time = write(engine, prices, backend, chunk_size)
+            print(f"{prices.shape[0]:>9} {backend:<8} {insert_time:>9.2f} "
+                  f"{prices.shape[0] / insert_time:>10,.0f} {update_time:>9.2f} "
+                  f"{prices.shape[0] / update_time:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare two reports of benchmarks/suite.py, e.g. of the base branch and a change, and
+list metrics which are worse by more than the threshold. Exits with 1 if any is.
+
+    python -m benchmarks.compare base.json change.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def compare(old, new, threshold):
+    """
+    :param old: Metrics of the baseline report.
+    :param new: Metrics of the new report.
+    :param threshold: Relative change counted as a regression, e.g. 0.1 for 10%.
+    :return: List of (name, old value, new value, relative change, regressed), where a
+    positive change is an improvement.
+    """
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name]["value"], new[name]["value"]
+        if before == 0:
+            change = 0.0 if after == 0 else float("inf")
+        else:
+            change = (after - before) / abs(before)
+        if new[name]["better"] == "lower":
+            change = -change
+        rows.append((name, before, after, change, change < -threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change counted as a regression.")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"old: {old['meta']['commit']}, new: {new['meta']['commit']}")
+    rows = compare(old["metrics"], new["metrics"], args.threshold)
+    for name, before, after, change, regressed in rows:
+        unit = new["metrics"][name]["unit"]
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<48} {before:>14,.3f} {after:>14,.3f} {unit:<10} "
+              f"{change:>+8.1%} {flag}")
+    for name in sorted(old["metrics"].keys() ^ new["metrics"].keys()):
+        print(f"{name:<48} only in {'old' if name in old['metrics'] else 'new'}")
+    if any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Helpers to prepare a local PostgreSQL database for benchmarks. The connection string is
+read from the BENCH_DB environment variable. Never point it at the production database:
+the tables of database_schema.sql are dropped and recreated.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+
+def bench_engine():
+    bench_db = os.environ.get("BENCH_DB")
+    if not bench_db:
+        raise ValueError("BENCH_DB environment variable is not set.")
+    return create_engine(bench_db)
+
+
+def reset_schema(engine, schema_file="database_schema.sql"):
+    """
+    Drop and recreate the tables of `schema_file`. psql meta-commands and the session
+    settings of the dump (some need PostgreSQL 17) are skipped. "fuel_prices" gets the
+    partitions of the past 5 years, for synthetic history.
+    """
+    with open(schema_file) as f:
+        ddl = "\n".join(line for line in f.read().splitlines()
+                        if not line.startswith(("\\", "SET ", "SELECT pg_catalog.")))
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS public.fuel_prices, public.latest_prices, "
+                          "public.stations, public.daily_price_stats, "
+                          "public.table_versions CASCADE"))
+        # Left by migrations/002_partition_fuel_prices.sql and 006_table_versions.sql.
+        conn.execute(text("DROP FUNCTION IF EXISTS public.ensure_fuel_prices_partitions"))
+        conn.execute(text("DROP FUNCTION IF EXISTS public.bump_table_version"))
+        # A DB-API cursor without parameters, so "%" in format() strings is kept as is.
+        with conn.connection.dbapi_connection.cursor() as cursor:
+            cursor.execute(ddl)
+            cursor.execute("SELECT public.ensure_fuel_prices_partitions("
+                           "now() - interval '5 years', now())")
+
+
+def load_stations(engine, stations_file="stations.csv"):
+    stations = pd.read_csv(stations_file, dtype={"id": str})
+    stations = stations.rename(columns={"id": "station_id"})
+    stations.to_sql("stations", engine, schema="public", if_exists="append", index=False)
+    return stations
+
+
+def synthetic_prices(station_ids, n_rows, end=None, days=365, seed=0):
+    """
+    Random fuel price reports of `station_ids` over `days` days before `end`, unique on
+    (station_id, fuel_type, update_time).
+    """
+    rng = np.random.default_rng(seed)
+    if end is None:
+        end = pd.Timestamp('now', tz='UTC').floor('s')
+    station_ids = np.asarray(station_ids)
+    seconds = rng.choice(days * 86400, size=n_rows, replace=n_rows > days * 86400)
+    prices = pd.DataFrame({
+        "station_id": station_ids[rng.integers(len(station_ids), size=n_rows)],
+        "brand": rng.choice(["Z", "BP", "Mobil", "Gull", "Waitomo"], size=n_rows),
+        "fuel_type": rng.choice(["91", "D", "95", "98"], size=n_rows),
+        "price": np.round(rng.uniform(180, 320, size=n_rows), 1),
+        "update_time": end - pd.to_timedelta(seconds, unit="s"),
+    })
+    return prices.drop_duplicates(subset=["station_id", "fuel_type", "update_time"],
+                                  ignore_index=True)
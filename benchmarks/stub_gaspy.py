@@ -0,0 +1,155 @@
+"""
+Local stand-in for the gaspy.nz endpoints used by the crawler, so crawl throughput can
+be measured offline. Stations come from stations.csv; prices are deterministic per
+(station, fuel type), so two crawls of the stub return identical rows.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+fuel_type_meta = {"1": "91", "2": "D", "3": "95", "4": "98"}
+brands = {"1": "Z", "2": "BP", "3": "Mobil", "4": "Gull", "5": "Waitomo"}
+
+
+def _digest(*parts):
+    return int(hashlib.md5("|".join(parts).encode()).hexdigest(), 16)
+
+
+class StubGaspy:
+    """
+    Serve login and blocksFromHashcodes on 127.0.0.1 in a background thread.
+    :param stations: DataFrame with columns id, name, geo_hash, latitude, longitude.
+    :param latency: Seconds each blocksFromHashcodes response is delayed.
+    :param fail_every: If set, every n-th blocksFromHashcodes request returns 503.
+    :param token_ttl: If set, login sets a session cookie valid for this many seconds,
+    and blocksFromHashcodes requests without a valid one get 401.
+    :param compress: Gzip responses to clients accepting it.
+    """
+    def __init__(self, stations=None, latency=0.05, fail_every=None, token_ttl=None,
+                 compress=False):
+        if stations is None:
+            stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+        self.stations = stations
+        self.latency = latency
+        self.fail_every = fail_every
+        self.token_ttl = token_ttl
+        self.compress = compress
+        self.tokens = {}
+        self.requests = 0
+        self.logins = 0
+        self.unauthorized = 0
+        # TCP connections accepted, i.e. handshakes.
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._now = pd.Timestamp('now', tz='UTC').floor('s')
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def station_record(self, station, fuel_type):
+        key = _digest(station['id'], fuel_type)
+        update_time = self._now - pd.Timedelta(minutes=key % (36 * 60))
+        return {
+            "stationKey": station['id'],
+            "stationName": station['name'],
+            "brandId": str(key % len(brands) + 1),
+            "price": round(180 + key % 1200 / 10, 1),
+            "dateUpdated": update_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "lat": float(station['latitude']),
+            "lng": float(station['longitude']),
+            "geoHash": station['geo_hash'],
+        }
+
+    def blocks(self, hashcodes, fuel_type):
+        matched = self.stations[self.stations['geo_hash'].str.startswith(tuple(hashcodes))]
+        return [self.station_record(station, fuel_type)
+                for _, station in matched.iterrows()]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if stub.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=6)
+                    self.send_header("Content-Encoding", "gzip")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+
+            def authorized(self):
+                if stub.token_ttl is None:
+                    return True
+                cookies = dict(part.strip().split("=", 1)
+                               for part in self.headers.get("Cookie", "").split(";")
+                               if "=" in part)
+                with stub._lock:
+                    issued = stub.tokens.get(cookies.get("session"))
+                return issued is not None and time.monotonic() - issued < stub.token_ttl
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path == "/api/v1/Public/login":
+                    token = uuid.uuid4().hex
+                    with stub._lock:
+                        stub.logins += 1
+                        stub.tokens[token] = time.monotonic()
+                    self.reply(200, {"success": True, "data": {
+                        "fuel_types": {k: {"code": v} for k, v in fuel_type_meta.items()},
+                        "brands": brands,
+                    }}, {"Set-Cookie": f"session={token}; Path=/; HttpOnly"})
+                elif self.path == "/api/v1/Map/blocksFromHashcodes":
+                    if not self.authorized():
+                        with stub._lock:
+                            stub.unauthorized += 1
+                        self.reply(401, {"success": False, "error": "Unauthorized"})
+                        return
+                    with stub._lock:
+                        stub.requests += 1
+                        n = stub.requests
+                    time.sleep(stub.latency)
+                    if stub.fail_every and n % stub.fail_every == 0:
+                        self.reply(503, {"success": False})
+                        return
+                    self.reply(200, {"success": True, "data": stub.blocks(
+                        body["hashcodes"], body["fuel_type_code"])})
+                else:
+                    self.reply(404, {"success": False, "error": "Not found"})
+
+        return Handler
@@ -0,0 +1,282 @@
+"""
+Run the hot-path benchmarks in one go and write a machine-readable JSON report, so
+results can be compared across commits with benchmarks/compare.py:
+- crawl: requests per second of the async engine against the local stub.
+- parse: stations and rows per second of the vectorized parser.
+- upsert: rows per second of each backend and chunk size, inserting and updating.
+- dashboard: p50/p95 latency of the map, history and trends callbacks, served by a
+  threaded HTTP server to concurrent simulated users.
+Sections using the database need a local PostgreSQL database (see
+benchmarks/local_db.py), and are skipped if BENCH_DB isn't set.
+
+    BENCH_DB=postgresql://localhost/gaspy_bench python -m benchmarks.suite --output report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from requests import Session
+from sqlalchemy import text
+
+import crawler
+from geohash_planner import fixed_chunks
+from metrics import metrics
+from benchmarks.bench_parse import synthetic_blocks
+from benchmarks.bench_upsert import write
+from benchmarks.local_db import bench_engine, reset_schema, load_stations, synthetic_prices
+from benchmarks.stub_gaspy import StubGaspy, brands, fuel_type_meta
+
+sections = ["crawl", "parse", "upsert", "dashboard"]
+
+
+class Report:
+    """
+    Metrics of one run of the suite, each with its unit and whether higher or lower is
+    better, and the commit and machine they were measured on.
+    """
+    def __init__(self, args):
+        self.meta = {
+            "started": pd.Timestamp('now', tz='UTC').isoformat(),
+            "commit": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "arguments": vars(args),
+        }
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="higher"):
+        self.metrics[name] = {"value": float(value), "unit": unit, "better": better}
+        print(f"{name:<48} {value:>14,.3f} {unit}")
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump({"meta": self.meta, "metrics": self.metrics}, f, indent=2)
+
+
+def git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_crawl(report, args):
+    stations = pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+    fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+    units = crawler.plan_units(list(fuel_types), fuel_types, fixed_chunks(stations))
+    with StubGaspy(stations, latency=args.latency) as stub:
+        crawler.gaspy_url = stub.url
+        session = Session()
+        crawler.mount_pool(session, args.concurrency)
+        metrics.reset()
+        t0 = time.perf_counter()
+        blocks = asyncio.run(crawler.crawl_async(
+            session, units, "bench", rate=float("inf"), concurrency=args.concurrency))
+        seconds = time.perf_counter() - t0
+    requests = metrics.summary()["requests"]["blocksFromHashcodes"]
+    report.add("crawl.async.requests_per_second", len(units) / seconds, "req/s")
+    report.add("crawl.async.latency_p50", requests["latency_p50"] * 1000, "ms", "lower")
+    report.add("crawl.async.latency_p95", requests["latency_p95"] * 1000, "ms", "lower")
+    report.add("crawl.async.stations_per_second",
+               sum(len(data) for _, data in blocks) / seconds, "stations/s")
+
+
+def bench_parse(report, args):
+    now = pd.Timestamp('now', tz='UTC')
+    blocks = synthetic_blocks(args.parse_responses, 40, now)
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        rows = crawler.parse_blocks(blocks, brands, now - pd.Timedelta(days=1))
+        best = min(best, time.perf_counter() - t0)
+    report.add("parse.vectorized.stations_per_second", args.parse_responses * 40 / best,
+               "stations/s")
+    report.add("parse.vectorized.rows_per_second", rows.shape[0] / best, "rows/s")
+
+
+def bench_upsert(report, args, engine):
+    reset_schema(engine)
+    stations = load_stations(engine)
+    prices = synthetic_prices(stations['station_id'], args.upsert_rows)
+    for backend, chunk_sizes in [("values", args.values_chunk_sizes),
+                                 ("copy", args.copy_chunk_sizes)]:
+        for chunk_size in chunk_sizes:
+            with engine.begin() as conn:
+                conn.execute(text("TRUNCATE public.fuel_prices"))
+            # The first pass inserts new rows, the second conflicts on every row.
+            insert_time = write(engine, prices, backend, chunk_size)
+            update_time = write(engine, prices, backend, chunk_size)
+            report.add(f"upsert.{backend}.chunk_{chunk_size}.insert_rows_per_second",
+                       prices.shape[0] / insert_time, "rows/s")
+            report.add(f"upsert.{backend}.chunk_{chunk_size}.update_rows_per_second",
+                       prices.shape[0] / update_time, "rows/s")
+
+
+def seed_dashboard(engine, args):
+    """
+    Stations of stations.csv with synthetic history, the latest prices and the daily
+    statistics derived from it.
+    :return: IDs of the stations.
+    """
+    from ingest import refresh_price_stats
+    from postgresql_upsert import upsert_dataframe
+    from benchmarks.bench_queries import run_sql_file
+
+    reset_schema(engine)
+    stations = load_stations(engine)
+    prices = synthetic_prices(stations['station_id'], args.history_rows, days=180)
+    upsert_dataframe(engine, prices, ['station_id', 'fuel_type', 'update_time'],
+                     'fuel_prices', backend="copy")
+    run_sql_file(engine, "sqls/rebuild_latest_prices.sql")
+    refresh_price_stats(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return stations.dropna(subset=['geo_hash'])['station_id'].tolist()
+
+
+def callback_body(output, inputs):
+    """
+    Body of a Dash callback request.
+    :param output: "component-id.property" of the single output.
+    :param inputs: List of ("component-id.property", value).
+    """
+    component_id, prop = output.split(".")
+    return {
+        "output": output,
+        "outputs": {"id": component_id, "property": prop},
+        "inputs": [{"id": name.split(".")[0], "property": name.split(".")[1],
+                    "value": value} for name, value in inputs],
+        "changedPropIds": [inputs[-1][0]],
+        "state": [],
+    }
+
+
+def user_actions(dashboard, station_ids, rng):
+    """
+    A random action of a user: panning or zooming the map, opening the history of a
+    station, or changing the trends chart.
+    :return: (callback name, request body).
+    """
+    fuel_type = rng.choice(["91", "95", "98", "D"])
+    action = rng.choice(["map", "map", "history", "trends"])
+    if action == "map":
+        zoom = rng.choice([5, 8, 10, 12])
+        lon, lat = rng.uniform(172.0, 176.0), rng.uniform(-44.0, -37.0)
+        span = 180 / 2 ** zoom
+        viewport = dashboard.snap_viewport(
+            (lon - span, lat - span / 2, lon + span, lat + span / 2), zoom)
+        return action, callback_body("station-map.figure", [
+            ("fuel-type-dropdown.value", fuel_type), ("map-viewport.data", viewport)])
+    if action == "history":
+        return action, callback_body("page-content.children", [
+            ("url.pathname", "/history"), ("url.search", f"?id={rng.choice(station_ids)}")])
+    return action, callback_body("trends-graph.figure", [
+        ("trends-fuel-type.value", fuel_type),
+        ("trends-dimension.value", rng.choice(["city", "brand", "geo_hash"])),
+        ("trends-statistic.value", "median_price"),
+        ("trends-days.value", rng.choice([30, 90, 180]))])
+
+
+def bench_dashboard(report, args, engine):
+    from werkzeug.serving import make_server
+
+    station_ids = seed_dashboard(engine, args)
+    # The dashboard connects to NEON_DB when it's imported.
+    os.environ["NEON_DB"] = os.environ["BENCH_DB"]
+    import dashboard
+
+    dashboard.query_cache.clear()
+    server = make_server("127.0.0.1", 0, dashboard.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    url = f"{base_url}/_dash-update-component"
+    # Dash registers the callbacks on the first request; don't race users for it.
+    Session().get(f"{base_url}/_dash-dependencies").raise_for_status()
+
+    def simulate_user(i):
+        rng = random.Random(i)
+        session = Session()
+        samples = []
+        for _ in range(args.requests_per_user):
+            action, body = user_actions(dashboard, station_ids, rng)
+            t0 = time.perf_counter()
+            response = session.post(url, json=body, headers={"Accept-Encoding": "gzip"})
+            samples.append((action, time.perf_counter() - t0, response.status_code))
+        return samples
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.users) as executor:
+        samples = [s for user in executor.map(simulate_user, range(args.users))
+                   for s in user]
+    seconds = time.perf_counter() - t0
+    server.shutdown()
+
+    errors = sum(status != 200 for _, _, status in samples)
+    report.add("dashboard.requests_per_second", len(samples) / seconds, "req/s")
+    report.add("dashboard.errors", errors, "requests", "lower")
+    for action in ["map", "history", "trends"]:
+        latencies = [latency for name, latency, _ in samples if name == action]
+        if latencies:
+            report.add(f"dashboard.{action}.latency_p50",
+                       np.percentile(latencies, 50) * 1000, "ms", "lower")
+            report.add(f"dashboard.{action}.latency_p95",
+                       np.percentile(latencies, 95) * 1000, "ms", "lower")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--only", nargs="+", choices=sections, default=sections)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="[crawl] Server-side latency of each request, in seconds.")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="[crawl] Requests in flight.")
+    parser.add_argument("--parse-responses", type=int, default=500,
+                        help="[parse] Responses of 40 stations to parse.")
+    parser.add_argument("--upsert-rows", type=int, default=100_000)
+    parser.add_argument("--values-chunk-sizes", type=int, nargs="+",
+                        default=[500, 2000, 10_000])
+    parser.add_argument("--copy-chunk-sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--history-rows", type=int, default=500_000,
+                        help="[dashboard] Synthetic price reports over 6 months.")
+    parser.add_argument("--users", type=int, default=8,
+                        help="[dashboard] Concurrent simulated users.")
+    parser.add_argument("--requests-per-user", type=int, default=25)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    report = Report(args)
+    engine = bench_engine() if os.environ.get("BENCH_DB") else None
+    for section in args.only:
+        if section in ["upsert", "dashboard"] and engine is None:
+            print(f"Skip {section}: BENCH_DB environment variable is not set.")
+            continue
+        if section == "crawl":
+            bench_crawl(report, args)
+        elif section == "parse":
+            bench_parse(report, args)
+        elif section == "upsert":
+            bench_upsert(report, args, engine)
+        else:
+            bench_dashboard(report, args, engine)
+    report.write(args.output)
+    print(f"Report written to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of a crawl run, so an interrupted run can be resumed.
+    The first line holds the run's `start_time`; each following line holds one
+    completed unit: its fuel type, geo hash list and the raw "data" of the response.
+    Every line is flushed to disk as soon as it's written. Units may be recorded from
+    several threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, start_time):
+        """
+        Begin a new run, discarding any previous checkpoint.
+        """
+        self.close()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            logging.warning(f"Discard the checkpoint {self.path} of an interrupted run; "
+                            f"run with --resume to continue it instead.")
+        self._file = open(self.path, "w")
+        self._write({"start_time": start_time.isoformat()})
+
+    def resume(self):
+        """
+        Load the checkpoint of an interrupted run, and keep appending to it.
+        :return: (start_time, blocks) where blocks maps (fuel_type, tuple(geo_hash_list))
+        to the raw data of completed units. If there's no checkpoint, return (None, {}).
+        """
+        if not os.path.exists(self.path):
+            return None, {}
+        start_time = None
+        blocks = {}
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The run may be killed in the middle of writing the last line.
+                    logging.warning("Skip a truncated line in the checkpoint.")
+                    continue
+                if "start_time" in record:
+                    start_time = pd.Timestamp(record["start_time"])
+                else:
+                    key = (record["fuel_type"], tuple(record["geo_hash_list"]))
+                    blocks[key] = record["data"]
+        self._file = open(self.path, "a")
+        return start_time, blocks
+
+    def record(self, fuel_type, geo_hash_list, data):
+        self._write({"fuel_type": fuel_type, "geo_hash_list": geo_hash_list, "data": data})
+
+    def _write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """
+        Remove the checkpoint after the run's results are written to the database.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
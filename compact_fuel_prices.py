@@ -0,0 +1,79 @@
+import argparse
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine, text
+
+parser = argparse.ArgumentParser(
+    description="Rewrite the history in \"fuel_prices\" so that only price changes are "
+                "kept, like main.py --change-only, and report the space saved.")
+parser.add_argument("--dry-run", action="store_true",
+                    help="Only report how many rows would be removed.")
+parser.add_argument("--vacuum", action="store_true",
+                    help="Run VACUUM FULL afterward, so the space is returned to the "
+                         "operating system and measured. It locks the table meanwhile.")
+args = parser.parse_args()
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+with open("sqls/price_runs.sql") as f:
+    sql_price_runs = f.read()
+with open("sqls/rebuild_latest_prices.sql") as f:
+    sql_rebuild_latest_prices = f.read()
+# Works whether or not "fuel_prices" is partitioned.
+sql_table_size = text("SELECT sum(pg_total_relation_size(relid)) FROM ("
+                      "SELECT relid FROM pg_partition_tree('public.fuel_prices') "
+                      "UNION SELECT 'public.fuel_prices'::regclass) t")
+
+engine = create_engine(os.environ["NEON_DB"])
+with engine.begin() as c:
+    size_before = c.execute(sql_table_size).scalar()
+    rows_before = c.execute(text("SELECT count(*) FROM public.fuel_prices")).scalar()
+    has_valid_to = c.execute(text(
+        "SELECT EXISTS (SELECT FROM information_schema.columns WHERE table_schema = "
+        "'public' AND table_name = 'fuel_prices' AND column_name = 'valid_to')"
+    )).scalar()
+    # A row stored by --change-only --valid-to was last reported at its "valid_to".
+    c.exec_driver_sql(sql_price_runs.format(
+        last_seen="coalesce(valid_to, update_time)" if has_valid_to else "update_time"))
+    runs = c.execute(text("SELECT count(*) FROM price_runs")).scalar()
+    removed = c.execute(text(
+        "SELECT coalesce(sum(reports - 1), 0) FROM price_runs")).scalar()
+    logging.info(f"{rows_before} rows, {runs} price changes: {removed} rows "
+                 f"({removed / max(rows_before, 1):.1%}) repeat an unchanged price.")
+    if not args.dry_run:
+        if has_valid_to:
+            # Never move a stored "valid_to" earlier.
+            c.execute(text(
+                "UPDATE public.fuel_prices fp "
+                "SET valid_to = greatest(fp.valid_to, r.valid_to) FROM price_runs r "
+                "WHERE fp.station_id = r.station_id AND fp.fuel_type = r.fuel_type "
+                "AND fp.update_time = r.valid_from"))
+        c.execute(text(
+            "DELETE FROM public.fuel_prices fp "
+            "WHERE fp.station_id IS NOT NULL AND fp.fuel_type IS NOT NULL "
+            "AND fp.update_time IS NOT NULL AND NOT EXISTS ("
+            "SELECT FROM price_runs r WHERE r.station_id = fp.station_id "
+            "AND r.fuel_type = fp.fuel_type AND r.valid_from = fp.update_time)"))
+        # Keep "latest_prices" at the first report of the latest price, as the change-only
+        # ingestion expects.
+        c.exec_driver_sql(sql_rebuild_latest_prices)
+if args.dry_run:
+    logging.info(f"Would save about {size_before * removed / max(rows_before, 1):,.0f} "
+                 f"of {size_before:,} bytes.")
+    sys.exit()
+
+if args.vacuum:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as c:
+        c.exec_driver_sql("VACUUM FULL ANALYZE public.fuel_prices")
+        size_after = c.execute(sql_table_size).scalar()
+    logging.info(f"Successfully compact \"fuel_prices\" from {size_before:,} to "
+                 f"{size_after:,} bytes, saving {size_before - size_after:,} bytes.")
+else:
+    logging.info(f"Successfully remove {removed} rows, about "
+                 f"{size_before * removed / max(rows_before, 1):,.0f} of {size_before:,} "
+                 f"bytes. Run VACUUM FULL or pass --vacuum to return the space.")
@@ -0,0 +1,117 @@
+import json
+import os
+
+import pandas as pd
+
+
+class CrawlState:
+    """
+    Persisted state of each (geo hash cell, fuel type), used to poll cells whose prices
+    change often more frequently than quiet cells.
+
+    For each cell, the state keeps the first and last time it was polled, the latest
+    update time of its prices, the number of polls and observed changes, and the
+    estimated mean gap between changes (exponentially weighted). A cell is due when the
+    time since its last poll exceeds half of its mean gap, clamped to [min_interval,
+    max_interval]. Every `full_sweep_interval`, all cells are due regardless.
+    """
+    def __init__(self, path, min_interval=pd.Timedelta(hours=1),
+                 max_interval=pd.Timedelta(hours=24),
+                 full_sweep_interval=pd.Timedelta(days=7), alpha=0.3):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.full_sweep_interval = full_sweep_interval
+        self.alpha = alpha
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+        else:
+            state = {}
+        self.last_full_sweep = state.get('last_full_sweep')
+        self.cells = state.get('cells', {})
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({'last_full_sweep': self.last_full_sweep, 'cells': self.cells}, f,
+                      indent=4)
+
+    def is_full_sweep(self, now):
+        return (self.last_full_sweep is None or
+                now - pd.Timestamp(self.last_full_sweep) >= self.full_sweep_interval)
+
+    def poll_interval(self, cell_state):
+        mean_gap = cell_state.get('mean_gap')
+        if mean_gap is None:
+            return self.min_interval
+        return min(max(pd.Timedelta(seconds=mean_gap / 2), self.min_interval),
+                   self.max_interval)
+
+    def due_cells(self, fuel_type, cells, now):
+        """
+        :param cells: Sorted geo hash cells of all stations.
+        :return: Cells that should be polled for `fuel_type` at `now`.
+        """
+        if self.is_full_sweep(now):
+            return list(cells)
+        due = []
+        for cell in cells:
+            cell_state = self.cells.get(f"{fuel_type}:{cell}")
+            if (cell_state is None or
+                    now - pd.Timestamp(cell_state['last_polled']) >=
+                    self.poll_interval(cell_state)):
+                due.append(cell)
+        return due
+
+    def record(self, units, rows, now, full_sweep=False):
+        """
+        Update the state of polled cells from crawled rows.
+        :param units: (fuel_type, fuel_type_id, geo_hash_list) units that were polled
+        successfully. Cells of failed units are left as they were, so a transient error
+        isn't mistaken for a quiet cell, and they stay due.
+        :param rows: DataFrame of fuel prices returned by the crawl.
+        """
+        polled = {}
+        for fuel_type, _, geo_hash_list in units:
+            polled.setdefault(fuel_type, set()).update(geo_hash_list)
+        latest = {}
+        for fuel_type, geo_hash, update_time in rows[
+                ['fuel_type', 'geo_hash', 'update_time']].itertuples(index=False):
+            cells = polled.get(fuel_type, set())
+            if not isinstance(geo_hash, str) or pd.isna(update_time):
+                continue
+            for i in range(len(geo_hash), 0, -1):
+                if geo_hash[:i] in cells:
+                    key = f"{fuel_type}:{geo_hash[:i]}"
+                    latest[key] = max(latest.get(key, update_time), update_time)
+                    break
+
+        for fuel_type, cells in polled.items():
+            for cell in cells:
+                key = f"{fuel_type}:{cell}"
+                cell_state = self.cells.setdefault(
+                    key, {'polls': 0, 'changes': 0, 'first_polled': now.isoformat()})
+                cell_state['polls'] += 1
+                cell_state['last_polled'] = now.isoformat()
+                last_updated = cell_state.get('last_updated')
+                last_updated = None if last_updated is None else pd.Timestamp(last_updated)
+                newest = latest.get(key)
+                if newest is not None and (last_updated is None or newest > last_updated):
+                    if last_updated is not None:
+                        cell_state['changes'] += 1
+                        self.observe_gap(cell_state, (newest - last_updated).total_seconds())
+                    cell_state['last_updated'] = newest.isoformat()
+                else:
+                    # No change since the last update (or the first poll if prices were
+                    # never seen), which bounds the gap from below.
+                    quiet_since = last_updated or pd.Timestamp(cell_state['first_polled'])
+                    quiet = (now - quiet_since).total_seconds()
+                    if quiet > (cell_state.get('mean_gap') or 0):
+                        self.observe_gap(cell_state, quiet)
+        if full_sweep:
+            self.last_full_sweep = now.isoformat()
+
+    def observe_gap(self, cell_state, gap):
+        mean_gap = cell_state.get('mean_gap')
+        cell_state['mean_gap'] = gap if mean_gap is None else (
+            self.alpha * gap + (1 - self.alpha) * mean_gap)
@@ -0,0 +1,328 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+
+gaspy_url = os.environ.get("GASPY_URL", "https://gaspy.nz")
+app_version = "3.21.3"
+retry_status_codes = {429, 500, 502, 503, 504}
+price_columns = ['station_id', 'brand', 'fuel_type', 'price', 'update_time', 'latitude',
+                 'longitude', 'geo_hash', 'name']
+# Fields of a station in blocksFromHashcodes responses, keyed by the column they fill.
+station_fields = {
+    'station_id': 'stationKey',
+    'brand': 'brandId',
+    'price': 'price',
+    'update_time': 'dateUpdated',
+    'latitude': 'lat',
+    'longitude': 'lng',
+    'geo_hash': 'geoHash',
+    'name': 'stationName',
+}
+
+
+def safe_astype(ins, cls):
+    try:
+        return cls(ins)
+    except (ValueError, TypeError):
+        return pd.NA
+
+
+def plan_units(selected_fuel_types, fuel_types, geo_hash_chunks):
+    """
+    Enumerate the (fuel_type, fuel_type_id, geo_hash_list) units of work in the order
+    of the sequential crawl: fuel types in the outer loop, geo hash chunks inside.
+    """
+    units = []
+    for fuel_type in selected_fuel_types:
+        fuel_type_id = fuel_types[fuel_type]
+        for geo_hash_list in geo_hash_chunks:
+            units.append((fuel_type, fuel_type_id, geo_hash_list))
+    return units
+
+
+def plan_batches(units):
+    """
+    Merge the per-fuel-type units of each geo hash chunk, so the geo hash list of a
+    chunk is requested for all its fuel types in one pass.
+    :return: List of (geo_hash_list, [(fuel_type, fuel_type_id), ...]), chunks in the
+    order they first appear in `units`.
+    """
+    batches = {}
+    for fuel_type, fuel_type_id, geo_hash_list in units:
+        batch = batches.setdefault(tuple(geo_hash_list), (geo_hash_list, []))
+        batch[1].append((fuel_type, fuel_type_id))
+    return list(batches.values())
+
+
+def blocks_request_body(geo_hash_list, fuel_type_id, fuel_type, device_id):
+    return json.dumps({
+        "hashcodes": geo_hash_list,
+        "fuel_type_id": fuel_type_id,
+        "fuel_type_code": fuel_type,
+        "gold_key": None,
+        "ev_plug_types": [],
+        "v": "22",
+        "a": app_version,
+        "udid": "ios_" + device_id,
+    })
+
+
+def parse_blocks_response(response, geo_hash_list):
+    """
+    Extract the list of stations from a blocksFromHashcodes response, and record the
+    response in `metrics`.
+    :return: The "data" list, or None if the region fails.
+    """
+    data = parse_blocks_data(response, geo_hash_list)
+    metrics.observe_request("blocksFromHashcodes", response,
+                            None if data is None else len(data))
+    if data is None:
+        metrics.count("failed_regions")
+    return data
+
+
+def parse_blocks_data(response, geo_hash_list):
+    if response.status_code != 200:
+        logging.warning(f"Geometry hash region fails: {geo_hash_list} "
+                        f"Status code: {response.status_code}. Reason: {response.reason}")
+        return None
+    response_json = response.json()
+    if not response_json.get('success'):
+        logging.warning(f"Geometry hash region fails: {geo_hash_list} "
+                        f"gaspy.nz returns errors: {response_json.get('error')}")
+        return None
+    data = response_json.get('data')
+    if not isinstance(data, list):
+        logging.warning(f"Fail to parse the response of geometry hash region "
+                        f"{geo_hash_list}")
+        return None
+    return data
+
+
+def parse_stations(data, fuel_type, brands, start_time):
+    """
+    Convert stations of one response to rows of fuel prices updated since `start_time`,
+    one station at a time. `parse_blocks` is the vectorized equivalent.
+    """
+    rows = []
+    for station in data:
+        updated_time_str = station.get('dateUpdated', '')
+        updated_time_naive = pd.to_datetime(
+            updated_time_str, format="%Y-%m-%dT%H:%M:%S.%fZ", errors='coerce')
+        updated_time = updated_time_naive.tz_localize(tz='UTC', nonexistent='NaT')
+        if updated_time >= start_time:
+            rows.append({
+                "station_id": station.get('stationKey', pd.NA),
+                "brand": brands.get(station.get('brandId'), pd.NA),
+                "fuel_type": fuel_type,
+                "price": safe_astype(station.get('price'), float),
+                "update_time": updated_time,
+                "latitude": safe_astype(station.get('lat'), float),
+                "longitude": safe_astype(station.get('lng'), float),
+                "geo_hash": station.get('geoHash', pd.NA),
+                "name": station.get('stationName', pd.NA),
+            })
+    return rows
+
+
+def parse_blocks_per_row(blocks, brands, start_time):
+    """
+    Parse blocks with `parse_stations`, the per-row path.
+    :return: DataFrame of fuel prices, columns in `price_columns`.
+    """
+    rows = []
+    for fuel_type, data in blocks:
+        rows.extend(parse_stations(data, fuel_type, brands, start_time))
+    return pd.DataFrame(rows, columns=price_columns)
+
+
+def parse_blocks(blocks, brands, start_time):
+    """
+    Convert the stations of many responses to fuel prices updated since `start_time`.
+    Raw fields are collected into columns first, and each column is converted in one
+    vectorized pass, instead of converting station by station as `parse_stations`.
+    :param blocks: List of (fuel_type, data), where data is the list of stations
+    returned by one blocksFromHashcodes request.
+    :return: DataFrame of fuel prices, columns in `price_columns`.
+    """
+    stations = [station for _, data in blocks for station in data]
+    raw = pd.DataFrame.from_records(stations, columns=list(station_fields.values()))
+    prices = pd.DataFrame({
+        "station_id": raw['stationKey'].astype(object),
+        "brand": raw['brandId'].map(brands).astype(object),
+        "fuel_type": np.repeat([fuel_type for fuel_type, _ in blocks],
+                               [len(data) for _, data in blocks]),
+        "price": pd.to_numeric(raw['price'], errors='coerce').astype(float),
+        "update_time": pd.to_datetime(raw['dateUpdated'], format="%Y-%m-%dT%H:%M:%S.%fZ",
+                                      errors='coerce', utc=True),
+        "latitude": pd.to_numeric(raw['lat'], errors='coerce').astype(float),
+        "longitude": pd.to_numeric(raw['lng'], errors='coerce').astype(float),
+        "geo_hash": raw['geoHash'].astype(object),
+        "name": raw['stationName'].astype(object),
+    }, columns=price_columns)
+    recent = prices['update_time'] >= start_time
+    metrics.count("rows_filtered", int((~recent).sum()))
+    return prices[recent].reset_index(drop=True)
+
+
+def crawl_sequential(session, units, device_id, pbar=None, sink=None, on_unit_done=None):
+    """
+    Request units one after another, sleeping about 1 second between requests.
+    :param sink: If set, each block is passed to `sink` as soon as it's received,
+    instead of being returned.
+    :param on_unit_done: If set, called with (fuel_type, geo_hash_list, data) after each
+    successful unit, e.g. to checkpoint it.
+    :return: Blocks (fuel_type, data) of successful requests, in the order of `units`.
+    """
+    blocks = []
+    for fuel_type, fuel_type_id, geo_hash_list in units:
+        response = session.post(
+            url=f"{gaspy_url}/api/v1/Map/blocksFromHashcodes",
+            data=blocks_request_body(geo_hash_list, fuel_type_id, fuel_type, device_id),
+        )
+        time.sleep(random.uniform(0.7, 1.3))
+        data = parse_blocks_response(response, geo_hash_list)
+        if data is not None:
+            if on_unit_done is not None:
+                on_unit_done(fuel_type, geo_hash_list, data)
+            if sink is None:
+                blocks.append((fuel_type, data))
+            else:
+                sink((fuel_type, data))
+        if pbar is not None:
+            pbar.update(1)
+    return blocks
+
+
+def crawl_batched(session, batches, device_id, pbar=None, sink=None, on_unit_done=None):
+    """
+    Request all fuel types of a chunk back to back over the keep-alive connection of
+    `session`, and sleep about 1 second once per chunk instead of once per request.
+    :param sink: If set, each block is passed to `sink` as soon as its chunk is
+    received, instead of being returned.
+    :param on_unit_done: Same as `crawl_sequential`.
+    :return: Blocks (fuel_type, data) of successful requests, grouped by fuel type in
+    the order of the sequential crawl.
+    """
+    blocks_per_fuel_type = {}
+    for geo_hash_list, fuels in batches:
+        responses = [
+            (fuel_type, session.post(
+                url=f"{gaspy_url}/api/v1/Map/blocksFromHashcodes",
+                data=blocks_request_body(geo_hash_list, fuel_type_id, fuel_type, device_id),
+            ))
+            for fuel_type, fuel_type_id in fuels
+        ]
+        time.sleep(random.uniform(0.7, 1.3))
+        for fuel_type, response in responses:
+            blocks = blocks_per_fuel_type.setdefault(fuel_type, [])
+            data = parse_blocks_response(response, geo_hash_list)
+            if data is not None:
+                if on_unit_done is not None:
+                    on_unit_done(fuel_type, geo_hash_list, data)
+                if sink is None:
+                    blocks.append((fuel_type, data))
+                else:
+                    sink((fuel_type, data))
+        if pbar is not None:
+            pbar.update(len(fuels))
+    return [block for blocks in blocks_per_fuel_type.values() for block in blocks]
+
+
+class RateLimiter:
+    """
+    Global requests-per-second budget shared by all concurrent requests. Each request
+    reserves the next slot, and slots are spaced by 1 / rate seconds scaled by a random
+    factor in [1 - jitter, 1 + jitter].
+    """
+    def __init__(self, rate, jitter=0.3):
+        self.interval = 1 / rate
+        self.jitter = jitter
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval * random.uniform(
+                1 - self.jitter, 1 + self.jitter)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def mount_pool(session, pool_size):
+    """
+    Size the connection pool of `session` so that concurrent requests from worker
+    threads reuse keep-alive connections instead of discarding them.
+    """
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+async def crawl_async(session, units, device_id, rate=3.0, jitter=0.3, concurrency=4,
+                      retries=3, backoff=1.0, timeout=30, pbar=None, sink=None,
+                      on_unit_done=None):
+    """
+    Request units concurrently. Blocking `session.post` calls run in worker threads,
+    at most `concurrency` in flight, started no faster than `rate` per second.
+    A request failing with a connection error or a retryable status code is retried
+    up to `retries` times with exponential backoff.
+    :param sink: If set, each block is passed to `sink` (in a worker thread, so it may
+    block) as soon as it's received, in order of completion, instead of being returned.
+    :param on_unit_done: Same as `crawl_sequential`, called in a worker thread.
+    :return: Blocks (fuel_type, data) of successful requests, in the order of `units`,
+    same as `crawl_sequential`.
+    """
+    limiter = RateLimiter(rate, jitter)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(fuel_type, fuel_type_id, geo_hash_list):
+        body = blocks_request_body(geo_hash_list, fuel_type_id, fuel_type, device_id)
+        async with semaphore:
+            for attempt in range(retries + 1):
+                await limiter.acquire()
+                try:
+                    response = await asyncio.to_thread(
+                        session.post, f"{gaspy_url}/api/v1/Map/blocksFromHashcodes",
+                        data=body, timeout=timeout)
+                except RequestException as e:
+                    metrics.count("request_errors")
+                    if attempt == retries:
+                        logging.warning(f"Geometry hash region fails: {geo_hash_list} "
+                                        f"Error: {e}")
+                        metrics.count("failed_regions")
+                        response = None
+                        break
+                else:
+                    if response.status_code not in retry_status_codes or attempt == retries:
+                        break
+                    metrics.observe_request("blocksFromHashcodes", response)
+                metrics.count("retries")
+                await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        data = None
+        if response is not None:
+            data = parse_blocks_response(response, geo_hash_list)
+        if data is not None and on_unit_done is not None:
+            # E.g. a checkpoint write and fsync, which mustn't block the event loop.
+            await asyncio.to_thread(on_unit_done, fuel_type, geo_hash_list, data)
+        if data is not None and sink is not None:
+            await asyncio.to_thread(sink, (fuel_type, data))
+            data = None
+        if pbar is not None:
+            pbar.update(1)
+        return fuel_type, data
+
+    results = await asyncio.gather(*(fetch(*unit) for unit in units))
+    return [(fuel_type, data) for fuel_type, data in results if data is not None]
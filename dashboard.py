@@ -1,39 +1,200 @@
+import gzip
+import logging
+import math
 import os
 import socket
+import sys
+import time
 import urllib.parse
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output, callback, no_update, ctx
+from dash import Dash, dcc, html, Input, Output, State, callback, no_update, ctx
+from flask import jsonify, request
 from sqlalchemy import create_engine, text
 
+from query_cache import QueryCache
+
+try:
+    import brotli
+except ImportError:  # Optional; responses are gzip-compressed without it.
+    brotli = None
+
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+startup_begin = time.perf_counter()
+
 # --- 1. Database & Data Functions ---
 
 db_connection_str = os.environ.get("NEON_DB")
 if not db_connection_str:
     raise ValueError("NEON_DB environment variable is not set.")
 
-engine = create_engine(db_connection_str)
-with open("sqls/get_latest_price.sql") as f:
-    sql_latest_price = f.read()
+# Each gunicorn worker (WEB_CONCURRENCY) has its own pool, so the connection budget
+# DB_MAX_CONNECTIONS is split between workers. The engine connects lazily, so no
+# connection is opened before gunicorn forks workers, even with --preload.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+connections_per_worker = max(1, int(os.environ.get("DB_MAX_CONNECTIONS", 10)) // workers)
+pool_size = min(int(os.environ.get("DB_POOL_SIZE", 2)), connections_per_worker)
+engine = create_engine(
+    db_connection_str,
+    pool_size=pool_size,
+    max_overflow=connections_per_worker - pool_size,
+    # Neon suspends idle computes and closes idle connections, so test a connection
+    # before using it and recycle it before it's likely to be closed.
+    pool_pre_ping=True,
+    pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", 300)),
+    pool_timeout=10,
+    # Waking a suspended compute takes a few seconds; don't hang the callback forever.
+    connect_args={"connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 10))},
+)
+with open("sqls/get_latest_price_in_bounds.sql") as f:
+    sql_latest_price_in_bounds = f.read()
+with open("sqls/get_latest_price_clusters.sql") as f:
+    sql_latest_price_clusters = f.read()
 with open("sqls/get_price.sql") as f:
     sql_price_per_station = f.read()
+with open("sqls/get_daily_price_stats.sql") as f:
+    sql_daily_price_stats = f.read()
+
+
+def data_version():
+    """
+    The latest update time in "latest_prices", which the crawler updates in the same
+    transaction as "fuel_prices", so it changes whenever a crawl writes prices.
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT max(update_time) FROM public.latest_prices")).scalar()
+
+
+# Query results (and map figures, unless CACHE_FIGURES=0) are cached in process until
+# the TTL or the next crawl, so repeat views skip the database.
+query_cache = QueryCache(
+    maxsize=int(os.environ.get("QUERY_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("QUERY_CACHE_TTL", 3600)),
+    data_version=data_version,
+    version_interval=float(os.environ.get("QUERY_CACHE_VERSION_INTERVAL", 60)),
+)
+cache_figures = os.environ.get("CACHE_FIGURES", "1") != "0"
+# Points per fuel type on the history page, after dropping repeated prices.
+history_max_points = int(os.environ.get("HISTORY_MAX_POINTS", 1000))
+
 
-def get_latest_prices(fuel_type):
-    query = text(sql_latest_price)
-    return pd.read_sql(query, engine, params={"fuel_type": fuel_type})
+# Below this zoom level, the map shows one marker per geohash cell instead of stations.
+cluster_zoom = float(os.environ.get("MAP_CLUSTER_ZOOM", 9))
+# The initial view: New Zealand, as (west, south, east, north) in degrees.
+nz_bounds = (165.0, -48.0, 180.0, -33.0)
+default_zoom = 5
 
 
+def snap_viewport(bounds, zoom):
+    """
+    Expand the bounds outwards to the grid of map tiles at the zoom level, so nearby
+    views share the same query and cache entry.
+    :param bounds: (west, south, east, north) in degrees.
+    :param zoom: Zoom level of the map.
+    :return: (west, south, east, north, zoom) with the zoom level rounded down.
+    """
+    zoom = max(0, int(zoom))
+    step = 360 / 2 ** zoom
+    west, south, east, north = bounds
+    if east < west or east - west >= 360:
+        # Crossing the antimeridian or showing the whole world.
+        west, east = -180.0, 180.0
+    return (max(-180.0, step * math.floor(west / step)),
+            max(-90.0, step * math.floor(south / step)),
+            min(180.0, step * math.ceil(east / step)),
+            min(90.0, step * math.ceil(north / step)),
+            zoom)
+
+
+def parse_viewport(relayout_data):
+    """
+    :param relayout_data: "relayoutData" of the map, after the user pans or zooms.
+    :return: (west, south, east, north, zoom) of the view, or None if the event doesn't
+    describe it, e.g. a resize.
+    """
+    try:
+        corners = relayout_data['map._derived']['coordinates']
+        zoom = relayout_data['map.zoom']
+    except (TypeError, KeyError):
+        return None
+    lons = [lon for lon, lat in corners]
+    lats = [lat for lon, lat in corners]
+    return min(lons), min(lats), max(lons), max(lats), zoom
+
+
+def geo_hash_precision(zoom):
+    """
+    Length of the geohash prefix that clusters stations at the zoom level, so a cell is
+    roughly a few markers wide on the screen.
+    """
+    return min(5, max(2, int(zoom) - 1))
+
+
+@query_cache.cached
+def get_latest_prices_in_bounds(fuel_type, west, south, east, north):
+    query = text(sql_latest_price_in_bounds)
+    return pd.read_sql(query, engine, params={
+        "fuel_type": fuel_type, "west": west, "south": south, "east": east,
+        "north": north})
+
+
+@query_cache.cached
+def get_latest_price_clusters(fuel_type, west, south, east, north, precision):
+    query = text(sql_latest_price_clusters)
+    return pd.read_sql(query, engine, params={
+        "fuel_type": fuel_type, "west": west, "south": south, "east": east,
+        "north": north, "precision": precision})
+
+
+@query_cache.cached
+def get_price_range(fuel_type):
+    """
+    The color scale covers the prices of the fuel type nationwide, so the color of a
+    station doesn't change when the view moves.
+    """
+    query = text("SELECT min(price) AS min_price, max(price) AS max_price "
+                 "FROM public.latest_prices WHERE fuel_type = :fuel_type")
+    df = pd.read_sql(query, engine, params={"fuel_type": fuel_type})
+    if df.isna().any(axis=None):
+        return None
+    return float(df.iloc[0]['min_price']), float(df.iloc[0]['max_price'])
+
+
+@query_cache.cached
 def get_historical_prices(station_id):
     query = text(sql_price_per_station)
     return pd.read_sql(query, engine, params={"station_id": station_id})
 
 
+@query_cache.cached
+def get_daily_price_stats(fuel_type, dimension, days):
+    """
+    Daily price statistics of the fuel type in the past `days` days, by "city", "brand"
+    or "geo_hash" prefix, from the rollup table refreshed by the crawler.
+    """
+    query = text(sql_daily_price_stats)
+    return pd.read_sql(query, engine, params={
+        "fuel_type": fuel_type, "dimension": dimension, "days": days})
+
+
+@query_cache.cached
+def query_station_name(station_id):
+    query = text("SELECT name FROM public.stations WHERE station_id = :station_id")
+    return pd.read_sql(query, engine, params={"station_id": station_id})
+
+
 def get_station_name(station_id):
     try:
-        query = "SELECT name FROM public.stations WHERE station_id = %s"
-        df = pd.read_sql(query, engine, params=(station_id,))
+        df = query_station_name(station_id)
         if not df.empty:
             return df.iloc[0]['name']
     except Exception:
@@ -41,16 +202,107 @@ def get_station_name(station_id):
     return "Unknown Station"
 
 
+@query_cache.cached
+def query_fuel_types():
+    # "latest_prices" has one row per station and fuel type, so it's much cheaper to
+    # scan than "fuel_prices".
+    df = pd.read_sql(
+        text("SELECT DISTINCT fuel_type FROM public.latest_prices ORDER BY fuel_type"),
+        engine)
+    return df['fuel_type'].tolist()
+
+
 def get_available_fuel_types():
+    """
+    Fuel types are loaded when the map is first viewed instead of at import, and cached
+    like other queries. A failed query isn't cached, so the next view retries.
+    """
     try:
-        df = pd.read_sql(
-            "SELECT DISTINCT fuel_type FROM public.fuel_prices ORDER BY fuel_type",
-            engine)
-        return df['fuel_type'].tolist()
-    except Exception:
+        return query_fuel_types()
+    except Exception as e:
+        logging.warning(f"Fail to load fuel types: {e}")
         return []
 
 
+def step_downsample(df, max_points=1000):
+    """
+    Reduce price history to the points that shape its step chart (line_shape="hv"):
+    the first report of each price, and the last report, which ends the line. The chart
+    is unchanged. If a fuel type still has more than `max_points` points, its time range
+    is split into `max_points / 4` buckets, and the first, last, lowest and highest
+    points of each bucket are kept, so every step wider than a bucket is kept. Missing
+    prices are a step of their own.
+    :param df: Data frame with columns fuel_type, price, update_time, sorted by
+    update_time.
+    :return: The kept rows, in the same order.
+    """
+    by_fuel = df.groupby('fuel_type', sort=False)
+    previous = by_fuel['price'].shift()
+    # A run of missing prices is one step, so missing prices are equal.
+    same = df['price'].eq(previous) | (df['price'].isna() & previous.isna())
+    keep = ~same | by_fuel.cumcount().eq(0) | by_fuel.cumcount(ascending=False).eq(0)
+    df = df[keep]
+    parts = []
+    for _, part in df.groupby('fuel_type', sort=False):
+        if part.shape[0] > max_points:
+            times = part['update_time'].astype('int64').to_numpy()
+            n_buckets = max(1, max_points // 4)
+            # In float: nanoseconds times buckets overflow int64 beyond ~10^3 buckets.
+            # The last point may round up to n_buckets, so it's clipped.
+            bucket = np.minimum(np.floor((times - times[0]) / (times[-1] - times[0] + 1)
+                                         * n_buckets), n_buckets - 1)
+            prices = part['price'].reset_index(drop=True)
+            by_bucket = prices.groupby(bucket)
+            # Buckets of only missing prices have no lowest or highest point.
+            priced = prices.dropna()
+            by_price = priced.groupby(bucket[priced.index])
+            rows = np.unique(np.concatenate([
+                by_bucket.head(1).index, by_bucket.tail(1).index,
+                by_price.idxmin().to_numpy(), by_price.idxmax().to_numpy()]).astype(int))
+            part = part.iloc[rows]
+        parts.append(part)
+    return pd.concat(parts).sort_values('update_time', kind='stable') if parts else df
+
+
+def generate_history_figure(station_id):
+    """
+    Step chart of the last 6 months of prices of the station, downsampled by
+    `step_downsample`. Times and prices are float arrays, which Plotly sends as
+    base64-encoded typed arrays instead of lists of strings.
+    """
+    df = get_historical_prices(station_id)
+    if df.empty:
+        return go.Figure().update_layout(title="No data available",
+                                         font={'family': 'Arial'})
+    df = step_downsample(df, history_max_points)
+    fig = go.Figure()
+    for fuel_type, part in df.groupby('fuel_type', sort=False):
+        times = part['update_time']
+        if times.dt.tz is not None:
+            # Show the same wall-clock times as the database returns.
+            times = times.dt.tz_localize(None)
+        fig.add_trace(go.Scatter(
+            # Milliseconds since epoch, which a date axis reads as UTC wall-clock time.
+            x=(times.astype('int64') // 10 ** 6).to_numpy(dtype=float),
+            y=part['price'].to_numpy(dtype=float),
+            name=fuel_type, mode="lines+markers", line_shape="hv",
+            hovertemplate="%{x|%Y-%m-%d %H:%M}<br>%{y}<extra>%{fullData.name}</extra>",
+        ))
+    fig.update_layout(title=f"Price History: {get_station_name(station_id)} "
+                            f"(NZ cents/L)",
+                      xaxis={'type': 'date', 'title': 'update_time'},
+                      yaxis={'title': 'price'}, legend_title_text='fuel_type',
+                      font={'family': 'Arial'})
+    return fig
+
+
+def get_history_figure(station_id):
+    if not cache_figures:
+        return generate_history_figure(station_id)
+    return query_cache.get(("history_figure", station_id),
+                           lambda: generate_history_figure(station_id).to_plotly_json())
+
+
 # --- 2. Styles ---
 
 FLOAT_CARD_STYLE = {
@@ -80,6 +332,12 @@ DETAIL_CARD_STYLE = {
     'fontFamily': 'Arial, sans-serif'
 }
 
+TRENDS_DIMENSIONS = {"city": "City", "brand": "Brand", "geo_hash": "Region (geo hash)"}
+TRENDS_STATISTICS = {"median_price": "Median", "mean_price": "Mean",
+                     "min_price": "Minimum", "max_price": "Maximum"}
+# Brands and regions with the most reports in the period; more lines aren't readable.
+TRENDS_MAX_LINES = 10
+
 # --- 3. App Initialization ---
 
 app = Dash(__name__, suppress_callback_exceptions=True)
@@ -115,23 +373,37 @@ app.index_string = '''
 </html>
 '''
 
-fuel_types = get_available_fuel_types()
-initial_fuel = fuel_types[0] if fuel_types else None
-
-
 # --- 4. Helper to Generate Map Figure ---
 
-def generate_map_figure(fuel_type):
+def generate_map_figure(fuel_type, viewport):
+    """
+    :param fuel_type: Fuel type to show.
+    :param viewport: (west, south, east, north, zoom) from snap_viewport. Only stations
+    inside the bounds are shown; below MAP_CLUSTER_ZOOM, stations in the same geohash
+    cell are merged into one marker sized by the number of stations and colored by their
+    average price.
+    """
     fig = go.Figure()
 
     lat_center, lon_center = -40.9, 174.8
-    zoom_level = 5
+    zoom_level = default_zoom
 
     if fuel_type:
-        df = get_latest_prices(fuel_type)
+        *bounds, zoom = viewport
+        if zoom < cluster_zoom:
+            df = get_latest_price_clusters(fuel_type, *bounds, geo_hash_precision(zoom))
+            # Clicking a cluster doesn't open the detail card, which needs "station_id".
+            df = df.assign(station_id=None, brand=None,
+                           name=df['stations'].astype(str) + " stations")
+            marker = dict(sizemin=8, opacity=0.8)
+        else:
+            df = get_latest_prices_in_bounds(fuel_type, *bounds)
+            marker = dict(size=12, opacity=0.9)
         if not df.empty:
             fig = px.scatter_map(
                 df, lat="latitude", lon="longitude", color="price",
+                size="stations" if zoom < cluster_zoom else None, size_max=30,
+                range_color=get_price_range(fuel_type),
                 custom_data=["brand", "price", "station_id", "name"],
                 color_continuous_scale=[
                     [0.0, "rgb(35,123,73)"],    # Dark Green
@@ -153,7 +425,7 @@ def generate_map_figure(fuel_type):
             fig.update_traces(
                 hoverinfo='none',
                 hovertemplate=None,
-                marker=dict(size=12, opacity=0.9)
+                marker=marker
             )
 
     fig.update_layout(
@@ -176,6 +448,13 @@ def generate_map_figure(fuel_type):
     return fig
 
 
+def get_map_figure(fuel_type, viewport):
+    if not cache_figures:
+        return generate_map_figure(fuel_type, viewport)
+    return query_cache.get(("map_figure", fuel_type, viewport),
+                           lambda: generate_map_figure(fuel_type, viewport).to_plotly_json())
+
+
 # --- 5. Layouts ---
 
 app.layout = html.Div([
@@ -185,8 +464,13 @@ app.layout = html.Div([
 ])
 
 
+initial_viewport = snap_viewport(nz_bounds, default_zoom)
+
+
 def layout_map():
-    fig = generate_map_figure(initial_fuel)
+    fuel_types = get_available_fuel_types()
+    initial_fuel = fuel_types[0] if fuel_types else None
+    fig = get_map_figure(initial_fuel, initial_viewport)
 
     return html.Div([
         html.Div([
@@ -197,7 +481,10 @@ def layout_map():
                 options=[{'label': ft, 'value': ft} for ft in fuel_types],
                 value=initial_fuel,
                 clearable=False
-            )
+            ),
+            html.Br(),
+            html.A("Regional and Brand Trends →", href="/trends", target="_blank",
+                   style={'color': 'blue'})
         ], style=FLOAT_CARD_STYLE),
 
         dcc.Graph(
@@ -207,6 +494,7 @@ def layout_map():
                    'width': '100%'},
             config={'scrollZoom': True, 'displayModeBar': True, 'responsive': True}
         ),
+        dcc.Store(id='map-viewport', data=initial_viewport),
 
         html.Div(id='detail-card', style=DETAIL_CARD_STYLE, children=[
             html.Button("✕", id='close-card-btn', n_clicks=0,
@@ -237,17 +525,7 @@ def layout_history(station_id):
         return html.Div([html.H3("Invalid Station ID.")], style={'padding': '50px'})
 
     station_name = get_station_name(station_id)
-    df = get_historical_prices(station_id)
-
-    if df.empty:
-        fig = go.Figure().update_layout(title="No data available",
-                                        font={'family': 'Arial'})
-    else:
-        fig = px.line(
-            df, x="update_time", y="price", color="fuel_type",
-            line_shape="hv", markers=True, title=f"Price History: {station_name} (NZ cents/L)"
-        )
-        fig.update_layout(font={'family': 'Arial'})
+    fig = get_history_figure(station_id)
 
     return html.Div([
         html.H2(station_name),
@@ -255,6 +533,54 @@ def layout_history(station_id):
     ], style=history_page_style)
 
 
+def layout_trends():
+    trends_page_style = {
+        'overflowY': 'auto',
+        'height': '100vh',
+        'width': '100vw',
+        'boxSizing': 'border-box',
+        'padding': '20px'
+    }
+    fuel_types = get_available_fuel_types()
+    control_style = {'display': 'inline-block', 'width': '200px', 'marginRight': '20px',
+                     'verticalAlign': 'top'}
+
+    return html.Div([
+        html.H2("Fuel Price Trends"),
+        html.Div([
+            html.Div([
+                html.Label("Fuel Type:"),
+                dcc.Dropdown(id='trends-fuel-type',
+                             options=[{'label': ft, 'value': ft} for ft in fuel_types],
+                             value=fuel_types[0] if fuel_types else None,
+                             clearable=False)
+            ], style=control_style),
+            html.Div([
+                html.Label("Group By:"),
+                dcc.Dropdown(id='trends-dimension',
+                             options=[{'label': label, 'value': value}
+                                      for value, label in TRENDS_DIMENSIONS.items()],
+                             value="city", clearable=False)
+            ], style=control_style),
+            html.Div([
+                html.Label("Statistic:"),
+                dcc.Dropdown(id='trends-statistic',
+                             options=[{'label': label, 'value': value}
+                                      for value, label in TRENDS_STATISTICS.items()],
+                             value="median_price", clearable=False)
+            ], style=control_style),
+            html.Div([
+                html.Label("Period:"),
+                dcc.Dropdown(id='trends-days',
+                             options=[{'label': f"Past {days} days", 'value': days}
+                                      for days in [30, 90, 180, 365]],
+                             value=90, clearable=False)
+            ], style=control_style),
+        ]),
+        dcc.Graph(id='trends-graph', style={'height': '75vh'})
+    ], style=trends_page_style)
+
+
 # --- 6. Callbacks ---
 
 @callback(Output('page-content', 'children'),
@@ -267,18 +593,67 @@ def display_page(pathname, search):
             parsed = urllib.parse.parse_qs(search.lstrip('?'))
             station_id = parsed.get('id', [None])[0]
         return layout_history(station_id)
+    elif pathname == '/trends':
+        return layout_trends()
     else:
         return layout_map()
 
 
+@callback(
+    Output('map-viewport', 'data'),
+    Input('station-map', 'relayoutData'),
+    State('map-viewport', 'data'),
+    prevent_initial_call=True
+)
+def update_map_viewport(relayout_data, current_viewport):
+    viewport = parse_viewport(relayout_data)
+    if viewport is None:
+        return no_update
+    viewport = snap_viewport(viewport[:4], viewport[4])
+    # Panning within the same tiles doesn't change the data.
+    if list(viewport) == current_viewport: return no_update
+    return viewport
+
+
 @callback(
     Output('station-map', 'figure'),
     Input('fuel-type-dropdown', 'value'),
+    Input('map-viewport', 'data'),
     prevent_initial_call=True
 )
-def update_map_figure(selected_fuel):
+def update_map_figure(selected_fuel, viewport):
     if not selected_fuel: return no_update
-    return generate_map_figure(selected_fuel)
+    return get_map_figure(selected_fuel, tuple(viewport))
+
+
+@callback(
+    Output('trends-graph', 'figure'),
+    Input('trends-fuel-type', 'value'),
+    Input('trends-dimension', 'value'),
+    Input('trends-statistic', 'value'),
+    Input('trends-days', 'value')
+)
+def update_trends_figure(fuel_type, dimension, statistic, days):
+    if not fuel_type:
+        return go.Figure().update_layout(title="No data available",
+                                         font={'family': 'Arial'})
+    df = get_daily_price_stats(fuel_type, dimension, days)
+    if df.empty:
+        return go.Figure().update_layout(title="No data available",
+                                         font={'family': 'Arial'})
+    if dimension != "city":
+        top = df.groupby('value')['reports'].sum().nlargest(TRENDS_MAX_LINES).index
+        df = df[df['value'].isin(top)]
+    fig = px.line(
+        df, x="day", y=statistic, color="value", markers=True,
+        hover_data=["stations", "reports", "min_price", "max_price"],
+        labels={"day": "Day", statistic: "Price (NZ cents/L)",
+                "value": TRENDS_DIMENSIONS[dimension]},
+        title=f"{TRENDS_STATISTICS[statistic]} Daily Price of {fuel_type} by "
+              f"{TRENDS_DIMENSIONS[dimension]}"
+    )
+    fig.update_layout(font={'family': 'Arial'})
+    return fig
 
 
 @callback(
@@ -310,6 +685,8 @@ def handle_map_interaction(clickData, close_clicks):
         name = point['customdata'][3]
     except (IndexError, KeyError):
         return no_update, no_update, no_update, no_update
+    if station_id is None:
+        return no_update, no_update, no_update, no_update
 
     content = html.Div([
         html.P([html.Strong("Brand: "), str(brand)]),
@@ -326,6 +703,51 @@ def handle_map_interaction(clickData, close_clicks):
     return style, name, content, history_href
 
 
+compressible_types = {"application/json", "text/html", "application/javascript",
+                      "text/css"}
+
+
+@server.after_request
+def compress_response(response):
+    """
+    Compress callback and page responses with brotli (if installed) or gzip, whichever
+    the browser accepts. Static files streamed by Flask are left as is.
+    """
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    if (response.direct_passthrough or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in compressible_types):
+        return response
+    body = response.get_data()
+    if len(body) < 500:
+        return response
+    if brotli is not None and "br" in accept_encoding:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif "gzip" in accept_encoding:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+@server.route("/cache-stats")
+def cache_stats():
+    return jsonify(query_cache.stats())
+
+
+@server.route("/pool-stats")
+def pool_stats():
+    return jsonify({
+        "startup_seconds": startup_seconds,
+        "pool_size": pool_size,
+        "max_overflow": connections_per_worker - pool_size,
+        "status": engine.pool.status(),
+    })
+
+
 def find_available_port(start_port: int, tries: int = 100):
     """
     Find the first available port from {start_port} to {start_port + tries}
@@ -346,6 +768,9 @@ def find_available_port(start_port: int, tries: int = 100):
                     f"{start_port + tries}.")
 
 
+startup_seconds = time.perf_counter() - startup_begin
+logging.info(f"Dashboard started in {startup_seconds:.2f}s.")
+
 if __name__ == '__main__':
     port = find_available_port(1024)
     app.run(debug=True, host='localhost', port=port)
@@ -19,6 +19,68 @@ SET xmloption = content;
 SET client_min_messages = warning;
 SET row_security = off;
 
+--
+-- Name: bump_table_version(); Type: FUNCTION; Schema: public; Owner: -
+--
+
+CREATE FUNCTION public.bump_table_version() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    UPDATE public.table_versions
+    SET version = version + 1, updated_at = now()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$;
+
+
+--
+-- Name: ensure_fuel_prices_partitions(timestamp with time zone, timestamp with time zone); Type: FUNCTION; Schema: public; Owner: -
+--
+
+CREATE FUNCTION public.ensure_fuel_prices_partitions(
+    since timestamp with time zone, until timestamp with time zone)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    y integer;
+    partition_name text;
+    lower_bound timestamp with time zone;
+    upper_bound timestamp with time zone;
+BEGIN
+    FOR y IN extract(year FROM since AT TIME ZONE 'UTC')::integer
+          .. extract(year FROM until AT TIME ZONE 'UTC')::integer + 1 LOOP
+        partition_name := 'fuel_prices_' || y;
+        CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+        -- Concurrent callers (e.g. shards) wait here, then find the partition created.
+        LOCK TABLE public.fuel_prices IN SHARE UPDATE EXCLUSIVE MODE;
+        CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+        lower_bound := make_timestamptz(y, 1, 1, 0, 0, 0, 'UTC');
+        upper_bound := make_timestamptz(y + 1, 1, 1, 0, 0, 0, 'UTC');
+        EXECUTE format('CREATE TABLE public.%I (LIKE public.fuel_prices)', partition_name);
+        IF to_regclass('public.fuel_prices_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.fuel_prices_default '
+                'WHERE update_time >= %L AND update_time < %L RETURNING *) '
+                'INSERT INTO public.%I SELECT * FROM moved',
+                lower_bound, upper_bound, partition_name);
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE public.fuel_prices ATTACH PARTITION public.%I '
+            'FOR VALUES FROM (%L) TO (%L)',
+            partition_name, lower_bound, upper_bound);
+    END LOOP;
+END;
+$$;
+
+
+--
+-- Name: FUNCTION ensure_fuel_prices_partitions(since timestamp with time zone, until timestamp with time zone); Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON FUNCTION public.ensure_fuel_prices_partitions(since timestamp with time zone, until timestamp with time zone) IS 'Create the yearly partitions of "fuel_prices" from the year of "since" to the year after "until", moving their rows out of "fuel_prices_default". Called by the crawler before writing.';
+
+
 SET default_table_access_method = heap;
 
 --
@@ -30,15 +92,17 @@ CREATE TABLE public.fuel_prices (
     fuel_type character varying(8),
     brand character varying(32),
     price numeric(6,1),
-    update_time timestamp with time zone
-);
+    update_time timestamp with time zone,
+    valid_to timestamp with time zone
+)
+PARTITION BY RANGE (update_time);
 
 
 --
 -- Name: TABLE fuel_prices; Type: COMMENT; Schema: public; Owner: -
 --
 
-COMMENT ON TABLE public.fuel_prices IS 'Records of fuel prices.';
+COMMENT ON TABLE public.fuel_prices IS 'Records of fuel prices. Partitioned by year of "update_time"; rows without "update_time" are in "fuel_prices_default".';
 
 
 --
@@ -76,6 +140,80 @@ COMMENT ON COLUMN public.fuel_prices.price IS 'Price of the fuel corresponding t
 COMMENT ON COLUMN public.fuel_prices.update_time IS 'The time that the fuel price is uploaded. It cannot be earlier than 1 days before the data is fetched.';
 
 
+--
+-- Name: COLUMN fuel_prices.valid_to; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON COLUMN public.fuel_prices.valid_to IS 'The last time the price is reported before it changes. "update_time" is the first time. Missing if the row is written without change-only ingestion.';
+
+
+--
+-- Name: fuel_prices_default; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.fuel_prices_default (
+    station_id character varying(32),
+    fuel_type character varying(8),
+    brand character varying(32),
+    price numeric(6,1),
+    update_time timestamp with time zone,
+    valid_to timestamp with time zone
+);
+
+
+--
+-- Name: daily_price_stats; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.daily_price_stats (
+    day date NOT NULL,
+    fuel_type character varying(8) NOT NULL,
+    dimension character varying(8) NOT NULL,
+    value character varying(32) NOT NULL,
+    stations integer NOT NULL,
+    reports integer NOT NULL,
+    min_price numeric(6,1),
+    median_price numeric(7,2),
+    mean_price numeric(7,2),
+    max_price numeric(6,1),
+    refreshed_at timestamp with time zone NOT NULL
+);
+
+
+--
+-- Name: TABLE daily_price_stats; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public.daily_price_stats IS 'Statistics of the prices reported in "fuel_prices" each day (in New Zealand time), by fuel type and by city, brand or geo hash prefix. Refreshed by the crawler for the days it writes, and by "refresh_price_stats.py".';
+
+
+--
+-- Name: COLUMN daily_price_stats.dimension; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON COLUMN public.daily_price_stats.dimension IS 'What "value" is: "city" of the station, "brand", or the first characters of the station''s "geo_hash".';
+
+
+--
+-- Name: latest_prices; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.latest_prices (
+    station_id character varying(32) NOT NULL,
+    fuel_type character varying(8) NOT NULL,
+    brand character varying(32),
+    price numeric(6,1),
+    update_time timestamp with time zone NOT NULL
+);
+
+
+--
+-- Name: TABLE latest_prices; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public.latest_prices IS 'The latest record in "fuel_prices" of each station and fuel type. It is updated in the same transaction as "fuel_prices" when the crawler writes prices, and can be rebuilt by "rebuild_latest_prices.py".';
+
+
 --
 -- Name: stations; Type: TABLE; Schema: public; Owner: -
 --
@@ -85,7 +223,8 @@ CREATE TABLE public.stations (
     name text,
     geo_hash character varying(8),
     latitude double precision,
-    longitude double precision
+    longitude double precision,
+    city text
 );
 
 
@@ -117,14 +256,83 @@ COMMENT ON COLUMN public.stations.name IS 'Name of the fuel station.';
 COMMENT ON COLUMN public.stations.geo_hash IS 'Geometry hash code of quadtree, which is used by "gaspy" to search fuel stations.';
 
 
+--
+-- Name: COLUMN stations.city; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON COLUMN public.stations.city IS 'City of the fuel station, from "stations.csv". Missing for stations first seen by the crawler.';
+
+
+--
+-- Name: table_versions; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.table_versions (
+    table_name text NOT NULL,
+    version bigint NOT NULL,
+    updated_at timestamp with time zone NOT NULL
+);
+
+
+--
+-- Name: TABLE table_versions; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public.table_versions IS 'Version of tables cached by clients, incremented by a trigger on every statement writing to the table.';
+
+
+--
+-- Name: fuel_prices_default; Type: TABLE ATTACH; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.fuel_prices ATTACH PARTITION public.fuel_prices_default DEFAULT;
+
+
+--
+-- Name: daily_price_stats daily_price_stats_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.daily_price_stats
+    ADD CONSTRAINT daily_price_stats_pkey PRIMARY KEY (fuel_type, dimension, value, day);
+
+
 --
 -- Name: fuel_prices fuel_prices_uniq_1; Type: CONSTRAINT; Schema: public; Owner: -
 --
 
-ALTER TABLE ONLY public.fuel_prices
+ALTER TABLE public.fuel_prices
     ADD CONSTRAINT fuel_prices_uniq_1 UNIQUE (station_id, fuel_type, update_time);
 
 
+--
+-- Name: latest_prices latest_prices_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.latest_prices
+    ADD CONSTRAINT latest_prices_pkey PRIMARY KEY (station_id, fuel_type);
+
+
+--
+-- Name: fuel_prices_station_time_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX fuel_prices_station_time_idx ON public.fuel_prices USING btree (station_id, update_time) INCLUDE (fuel_type, price);
+
+
+--
+-- Name: latest_prices_fuel_type_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX latest_prices_fuel_type_idx ON public.latest_prices USING btree (fuel_type) INCLUDE (station_id, price, brand);
+
+
+--
+-- Name: stations_location_idx; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX stations_location_idx ON public.stations USING gist (point(longitude, latitude));
+
+
 --
 -- Name: stations stations_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -133,6 +341,35 @@ ALTER TABLE ONLY public.stations
     ADD CONSTRAINT stations_pkey PRIMARY KEY (station_id);
 
 
+--
+-- Name: table_versions table_versions_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.table_versions
+    ADD CONSTRAINT table_versions_pkey PRIMARY KEY (table_name);
+
+
+--
+-- Name: stations stations_version; Type: TRIGGER; Schema: public; Owner: -
+--
+
+CREATE TRIGGER stations_version AFTER INSERT OR DELETE OR UPDATE OR TRUNCATE ON public.stations FOR EACH STATEMENT EXECUTE FUNCTION public.bump_table_version();
+
+
+--
+-- Version of the cached stations; see station_index.py.
+--
+
+INSERT INTO public.table_versions (table_name, version, updated_at) VALUES ('stations', 1, now());
+
+
+--
+-- Yearly partitions of this year and the next; the crawler adds later ones.
+--
+
+SELECT public.ensure_fuel_prices_partitions(now(), now());
+
+
 --
 -- PostgreSQL database dump complete
 --
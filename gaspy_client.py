@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.cookies import create_cookie
+
+import crawler
+from metrics import metrics
+
+# gaspy.nz doesn't publish how long a login lasts; a daily crawl logs in at most twice.
+default_session_ttl = 12 * 3600
+
+
+class GaspyClient:
+    """
+    A gaspy.nz session shared by all requests of a run, and by later runs through an
+    on-disk cache.
+    - Login: the session cookies, the device ID, and the fuel types and brands of the
+      login response are cached in `cache_path` until `ttl` seconds after login or the
+      earliest cookie expiry, so a run within that time doesn't log in again. The cache
+      is keyed by a hash of the email, and only readable by the owner.
+    - Re-authentication: a request answered with 401 logs in once again (shared by
+      concurrent requests) and is retried.
+    - Connections: a pool of `pool_size` keep-alive connections, and gzip-compressed
+      responses.
+    Crawl engines use it like a requests session, through `post`.
+    """
+    def __init__(self, email, password, session=None, cache_path=None,
+                 ttl=default_session_ttl, pool_size=10, login_headers=None):
+        """
+        :param session: The requests session (or a `RecordingSession`/`ReplaySession`)
+        to send requests with. By default, a new session.
+        :param cache_path: JSON file caching the login. If None, always log in.
+        :param login_headers: Headers of the login request, e.g. header/dart_header.json.
+        """
+        self.email = email
+        self.password = password
+        self.session = Session() if session is None else session
+        self.cache_path = cache_path
+        self.ttl = ttl
+        # requests sets "Host" from the URL, which is the same for gaspy.nz, and right
+        # for a local stub, where cookies would otherwise be scoped to gaspy.nz.
+        self.login_headers = {name: value for name, value in (login_headers or {}).items()
+                              if name.lower() != "host"}
+        self.device_id = None
+        self.fuel_types = None
+        self.brands = None
+        self.expires_at = 0.0
+        # Incremented by each login, so concurrent 401s trigger one login.
+        self.generation = 0
+        self._lock = threading.Lock()
+        self.mount(pool_size)
+        if hasattr(self.session, "headers"):
+            self.session.headers["Accept-Encoding"] = "gzip"
+
+    def mount(self, pool_size):
+        """
+        Size the connection pool, e.g. to the concurrency of the async crawl.
+        """
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def login(self):
+        """
+        Load the cached login if it's still valid, otherwise log in and cache it.
+        """
+        with self._lock:
+            if self.fuel_types is None and self._load_cache():
+                metrics.count("session_cache_hits")
+                logging.info("Reuse the cached gaspy.nz login.")
+                return
+            self._login()
+
+    def _login(self):
+        response = self.session.post(
+            url=f"{crawler.gaspy_url}/api/v1/Public/login",
+            data=json.dumps({
+                "email": self.email,
+                "password": self.password,
+                "gold_key": None,
+                "v": 22,
+                "a": crawler.app_version,
+            }),
+            headers=self.login_headers,
+        )
+        metrics.observe_request("login", response)
+        metrics.count("logins")
+        if response.status_code != 200:
+            raise Exception(f"Status code: {response.status_code}. Reason: "
+                            f"{response.reason}")
+        response_json = response.json()
+        assert response_json.get('success'), \
+            "gaspy.nz username and password don't match."
+        self.fuel_types = response_json['data']['fuel_types']
+        self.brands = response_json['data']['brands']
+        if self.device_id is None:
+            self.device_id = str(uuid.uuid4()).upper()
+        self.expires_at = time.time() + self.ttl
+        cookie_expiry = [cookie.expires for cookie in self._cookies()
+                         if cookie.expires is not None]
+        if cookie_expiry:
+            self.expires_at = min([self.expires_at] + cookie_expiry)
+        self.generation += 1
+        self._save_cache()
+
+    def post(self, url, data=None, **kwargs):
+        generation = self.generation
+        response = self.session.post(url, data=data, **kwargs)
+        if response.status_code != 401:
+            return response
+        with self._lock:
+            # Another request may have logged in again meanwhile.
+            if self.generation == generation:
+                logging.info("gaspy.nz login expires; log in again.")
+                metrics.count("relogins")
+                self._login()
+        return self.session.post(url, data=data, **kwargs)
+
+    def __getattr__(self, name):
+        # close(), headers, etc. of the wrapped session.
+        return getattr(self.session, name)
+
+    def _cookies(self):
+        return list(getattr(self.session, "cookies", []))
+
+    def _cache_key(self):
+        return hashlib.sha256(self.email.encode()).hexdigest()
+
+    def _load_cache(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+            if cache["key"] != self._cache_key() or cache["expires_at"] <= time.time():
+                return False
+            for cookie in cache["cookies"]:
+                self.session.cookies.set_cookie(create_cookie(**cookie))
+            self.device_id = cache["device_id"]
+            self.fuel_types = cache["fuel_types"]
+            self.brands = cache["brands"]
+            self.expires_at = cache["expires_at"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignore the gaspy.nz login cache {self.cache_path}: {e}")
+            return False
+        return True
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        cache = {
+            "key": self._cache_key(),
+            "expires_at": self.expires_at,
+            "device_id": self.device_id,
+            "cookies": [{"name": c.name, "value": c.value, "domain": c.domain,
+                         "path": c.path, "expires": c.expires, "secure": c.secure}
+                        for c in self._cookies()],
+            "fuel_types": self.fuel_types,
+            "brands": self.brands,
+        }
+        # The cookies authenticate as the account; don't let other users read them.
+        # Written to a temporary file and renamed, like `metrics.write_atomic`.
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,129 @@
+import logging
+import zlib
+from collections import Counter
+
+
+def parse_shard(spec):
+    """
+    :param spec: "i/N", the i-th of N shards, 1 <= i <= N.
+    :return: (i, N)
+    """
+    try:
+        index, count = map(int, spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be like 2/8, not {spec!r}.")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {spec} is out of range 1/{count} to {count}/{count}.")
+    return index, count
+
+
+def in_shard(geo_hash, shard, prefix_length=4):
+    """
+    Whether a geo hash belongs to a shard. Geo hashes are assigned by a checksum of
+    their first `prefix_length` characters, so the assignment of a cell doesn't depend
+    on the other cells, and neighbouring stations are crawled by the same shard.
+    :param shard: (i, N) from `parse_shard`.
+    """
+    index, count = shard
+    return zlib.crc32(geo_hash[:prefix_length].encode()) % count == index - 1
+
+
+def shard_stations(stations, shard, prefix_length=4):
+    """
+    :return: Stations whose geo hash belongs to the shard; stations without a geo hash
+    are dropped, as they're never requested.
+    """
+    stations = stations.dropna(subset=['geo_hash'])
+    return stations[stations['geo_hash'].map(
+        lambda geo_hash: in_shard(geo_hash, shard, prefix_length))]
+
+
+def fixed_chunks(stations, chunk_size=39):
+    """
+    Sort stations by geo_hash, group them by geo_hash length, and slice each group into
+    chunks of at most `chunk_size` stations.
+    :return: List of chunks, each a list of unique geo hashes.
+    """
+    stations = stations.dropna(subset=['geo_hash']).sort_values(by='geo_hash')
+    stations['geo_hash_len'] = stations['geo_hash'].str.len()
+    geo_hash_chunks = []
+    for length, subset in stations.groupby('geo_hash_len'):
+        for i in range(0, subset.shape[0], chunk_size):
+            geo_hash_chunks.append(
+                subset.iloc[i:i + chunk_size]['geo_hash'].unique().tolist())
+    return geo_hash_chunks
+
+
+def collapse_geo_hashes(geo_hashes, sibling_threshold=None):
+    """
+    Reduce geo hashes to the smallest set of cells covering them. Duplicates are
+    removed, and a cell is dropped if one of its prefixes (an enclosing cell) is also
+    requested.
+    :param geo_hashes: Iterable of geo hashes, missing values are ignored.
+    :param sibling_threshold: If set, whenever at least this many cells share a parent
+    cell, they are replaced by the parent. The parent may contain stations that are not
+    in the list, so responses become larger. Cells are never collapsed to be shorter
+    than the shortest input geo hash.
+    :return: Sorted list of geo hashes.
+    """
+    cells = {geo_hash for geo_hash in geo_hashes if isinstance(geo_hash, str) and geo_hash}
+    if not cells:
+        return []
+    min_length = min(map(len, cells))
+    while True:
+        cells = {
+            cell for cell in cells
+            if not any(cell[:i] in cells for i in range(1, len(cell)))
+        }
+        if sibling_threshold is None:
+            break
+        parents = Counter(cell[:-1] for cell in cells if len(cell) > min_length)
+        collapsible = {parent for parent, n in parents.items() if n >= sibling_threshold}
+        if not collapsible:
+            break
+        cells = {cell for cell in cells if cell[:-1] not in collapsible} | collapsible
+    return sorted(cells)
+
+
+def trie_chunks(stations, max_hashcodes=39, mixed_lengths=False, sibling_threshold=None):
+    """
+    Plan chunks of geo hashes over the prefix tree of stations' geo hashes. Covered and
+    duplicated cells are removed by `collapse_geo_hashes`, then cells are packed in
+    geo hash order into chunks of exactly `max_hashcodes` (except the last).
+    :param mixed_lengths: If false, cells of different geo hash lengths are never
+    packed into the same chunk, like `fixed_chunks`.
+    :return: List of chunks, each a list of unique geo hashes.
+    """
+    cells = collapse_geo_hashes(stations['geo_hash'], sibling_threshold)
+    return pack_chunks(cells, max_hashcodes, mixed_lengths)
+
+
+def pack_chunks(cells, max_hashcodes=39, mixed_lengths=False):
+    """
+    Pack sorted geo hash cells into chunks of exactly `max_hashcodes` (except the last).
+    :param mixed_lengths: If false, cells of different lengths are packed separately.
+    :return: List of chunks, each a list of geo hashes.
+    """
+    if mixed_lengths:
+        groups = [cells]
+    else:
+        groups = [
+            [cell for cell in cells if len(cell) == length]
+            for length in sorted(set(map(len, cells)))
+        ]
+    return [
+        group[i:i + max_hashcodes]
+        for group in groups
+        for i in range(0, len(group), max_hashcodes)
+    ]
+
+
+def report_savings(baseline_chunks, planned_chunks):
+    """
+    Log how many requests per fuel type the planned chunks save against the baseline.
+    :return: Number of requests saved per fuel type.
+    """
+    saved = len(baseline_chunks) - len(planned_chunks)
+    logging.info(f"Geohash planner: {len(planned_chunks)} chunks instead of "
+                 f"{len(baseline_chunks)}, {saved} requests saved per fuel type.")
+    return saved
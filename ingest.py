@@ -0,0 +1,338 @@
+import logging
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from crawler import parse_blocks
+from metrics import metrics
+from postgresql_upsert import upsert_dataframe
+
+price_key = ['station_id', 'fuel_type', 'update_time']
+price_table_columns = ['station_id', 'brand', 'fuel_type', 'price', 'update_time']
+station_table_columns = ['station_id', 'name', 'geo_hash', 'latitude', 'longitude']
+# Length of the geo hash prefix that "daily_price_stats" groups stations by, about 150 km.
+stats_geo_hash_precision = 3
+with open("sqls/refresh_daily_price_stats.sql") as f:
+    sql_refresh_daily_price_stats = f.read()
+
+
+def ensure_partitions(engine, now):
+    """
+    If "fuel_prices" is partitioned by migrations/002_partition_fuel_prices.sql, make
+    sure the partitions of this year and the next exist.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text(
+                "SELECT EXISTS (SELECT FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('public.fuel_prices'))")).scalar():
+            conn.execute(text("SELECT public.ensure_fuel_prices_partitions(:now, :now)"),
+                         {"now": now})
+
+
+def has_latest_prices(engine):
+    """
+    Whether "latest_prices" exists (migrations/001_latest_prices.sql). If not, log a
+    warning: prices can still be written, only to "fuel_prices".
+    """
+    with engine.connect() as conn:
+        exists = not conn.execute(text(
+            "SELECT to_regclass('public.latest_prices') IS NULL")).scalar()
+    if not exists:
+        logging.warning("Table \"latest_prices\" doesn't exist, so only \"fuel_prices\" "
+                        "is written. Run migrations/001_latest_prices.sql to add it.")
+    return exists
+
+
+def refresh_price_stats(engine, since=None):
+    """
+    If "daily_price_stats" exists (migrations/005_daily_price_stats.sql), recompute the
+    statistics of the days from `since` on, in New Zealand time, or of all days if
+    `since` is None.
+    :return: Number of rows of statistics written, or None if the table doesn't exist.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text(
+                "SELECT to_regclass('public.daily_price_stats') IS NULL")).scalar():
+            return None
+        with metrics.stage("refresh_price_stats"):
+            result = conn.execute(text(sql_refresh_daily_price_stats), {
+                "since": since, "geo_hash_precision": stats_geo_hash_precision})
+        return result.rowcount
+
+
+def chunk_size_of(backend):
+    """
+    Rows per write: 2000 per multi-VALUES statement, or at most 1 million per COPY.
+    """
+    return 2000 if backend == "values" else 1_000_000
+
+
+def write_chunks(engine, df, unique_key_columns, table_name, backend="values"):
+    """
+    Upsert `df` in chunks, one transaction per chunk. Rows are sorted by the key, so
+    concurrent writers (e.g. overlapping shards) lock rows in the same order and don't
+    deadlock.
+    """
+    df = df.sort_values(unique_key_columns)
+    chunk_size = chunk_size_of(backend)
+    for i in range(0, df.shape[0], chunk_size):
+        chunk = df.iloc[i:i + chunk_size]
+        with metrics.stage(f"write_chunk:{table_name}", rows=chunk.shape[0]):
+            upsert_dataframe(engine, chunk, unique_key_columns, table_name,
+                             backend=backend)
+
+
+def write_prices(engine, prices, backend="values", latest_prices=True):
+    """
+    Upsert fuel prices in chunks. In the same transaction as each chunk, the latest
+    price of each (station_id, fuel_type) in the chunk is merged into "latest_prices",
+    where it replaces the existing row only if it's at least as recent. Rows are
+    sorted by key, like `write_chunks`. `prices` may have a "valid_to" column (see
+    `ChangeFilter`), which is only written to "fuel_prices".
+    :param latest_prices: If false, e.g. if `has_latest_prices` is false, only write
+    "fuel_prices".
+    """
+    prices = prices.sort_values(price_key)
+    chunk_size = chunk_size_of(backend)
+    for i in range(0, prices.shape[0], chunk_size):
+        chunk = prices.iloc[i:i + chunk_size]
+        latest = (chunk[price_table_columns].dropna(subset=price_key)
+                  .sort_values('update_time')
+                  .drop_duplicates(subset=['station_id', 'fuel_type'], keep='last')
+                  .sort_values(['station_id', 'fuel_type']))
+        with metrics.stage("write_chunk:fuel_prices", rows=chunk.shape[0]), \
+                engine.begin() as conn:
+            upsert_dataframe(engine, chunk, price_key, 'fuel_prices', backend=backend,
+                             conn=conn)
+            if not latest_prices:
+                continue
+            upsert_dataframe(engine, latest, ['station_id', 'fuel_type'], 'latest_prices',
+                             backend=backend, conn=conn,
+                             update_where="latest_prices.update_time <= "
+                                          "EXCLUDED.update_time")
+
+
+class ChangeFilter:
+    """
+    Keep only the reports that change the price of their (station_id, fuel_type), so a
+    price reported again and again is stored once. The last known price of every
+    station and fuel type is preloaded from "latest_prices" in one query, and updated in
+    memory as reports are filtered. Reports not newer than the last known one are
+    dropped.
+    If `valid_to` is true, the rows become runs of a price: "update_time" is when the
+    price is first reported, and "valid_to" (added by migrations/004_valid_to.sql) when
+    it's last reported. A report of an unchanged price then yields the existing run
+    with a later "valid_to", which the upsert merges into the stored row.
+    """
+    def __init__(self, last_prices, valid_to=False):
+        """
+        :param last_prices: Data frame with columns station_id, fuel_type, price,
+        update_time, and valid_to if `valid_to` is true.
+        """
+        self.valid_to = valid_to
+        run_start = pd.to_datetime(last_prices['update_time'], utc=True)
+        last_seen = run_start
+        if valid_to:
+            last_seen = pd.to_datetime(last_prices['valid_to'], utc=True).fillna(run_start)
+        # Per (station_id, fuel_type): the current price, when it's first reported, and
+        # the latest report.
+        self.last = pd.DataFrame({
+            'station_id': last_prices['station_id'], 'fuel_type': last_prices['fuel_type'],
+            'last_price': self.round_prices(last_prices['price']),
+            'run_start': run_start, 'last_seen': last_seen,
+        }).drop_duplicates(subset=['station_id', 'fuel_type'], keep='last').set_index(
+            ['station_id', 'fuel_type'])
+        self.unchanged = 0
+
+    @classmethod
+    def load(cls, engine, valid_to=False):
+        if valid_to:
+            query = ("SELECT lp.station_id, lp.fuel_type, lp.price, lp.update_time, "
+                     "fp.valid_to FROM public.latest_prices lp "
+                     "LEFT JOIN public.fuel_prices fp ON fp.station_id = lp.station_id "
+                     "AND fp.fuel_type = lp.fuel_type AND fp.update_time = lp.update_time")
+        else:
+            query = ("SELECT station_id, fuel_type, price, update_time "
+                     "FROM public.latest_prices")
+        with metrics.stage("load_last_prices"), engine.connect() as conn:
+            last_prices = pd.read_sql(text(query), conn)
+        return cls(last_prices, valid_to)
+
+    @staticmethod
+    def round_prices(prices):
+        # "price" is numeric(6,1) in the database.
+        return pd.to_numeric(prices, errors='coerce').astype(float).round(1)
+
+    def filter(self, prices):
+        """
+        Compare the reports with the last known prices in one merge, and with the
+        previous report of the same station and fuel type in the batch.
+        :param prices: Data frame with `price_table_columns`.
+        :return: Rows to upsert, with a "valid_to" column if `valid_to` is true.
+        """
+        columns = price_table_columns + (['valid_to'] if self.valid_to else [])
+        # Of reports at the same time, the first is kept, like the upsert keeps one.
+        prices = (prices[price_table_columns].dropna(subset=price_key)
+                  .sort_values('update_time', kind='stable')
+                  .drop_duplicates(subset=price_key, keep='first'))
+        merged = prices.join(self.last, on=['station_id', 'fuel_type'])
+        known = merged['run_start'].notna()
+        merged = merged[~known | (merged['update_time'] > merged['last_seen'])]
+        if merged.empty:
+            return pd.DataFrame(columns=columns)
+        known = known[merged.index]
+        keys = [merged['station_id'], merged['fuel_type']]
+
+        price = self.round_prices(merged['price'])
+        by_key = price.groupby(keys, sort=False)
+        is_first = by_key.cumcount().eq(0)
+        previous = by_key.shift().where(~is_first, merged['last_price'])
+        changed = (is_first & ~known) | (
+            price.ne(previous) & ~(price.isna() & previous.isna()))
+        self.unchanged += int((~changed).sum())
+
+        # Position of the report starting the current run of each row, or -1 if the run
+        # continues the last known price.
+        positions = pd.Series(np.where(changed, np.arange(merged.shape[0]), -1),
+                              index=merged.index)
+        start = positions.groupby(keys, sort=False).cummax()
+        in_batch = start.ge(0).to_numpy()
+        start_rows = start.clip(lower=0).to_numpy()
+        run_price = pd.Series(np.where(in_batch, price.to_numpy()[start_rows],
+                                       merged['last_price'].to_numpy()), index=merged.index)
+        run_start = merged['update_time'].iloc[start_rows].set_axis(merged.index).where(
+            in_batch, merged['run_start'])
+
+        is_last = ~merged[['station_id', 'fuel_type']].duplicated(keep='last')
+        updated = pd.DataFrame({
+            'last_price': run_price[is_last], 'run_start': run_start[is_last],
+            'last_seen': merged['update_time'][is_last],
+        }).set_index([merged['station_id'][is_last], merged['fuel_type'][is_last]])
+        self.last = pd.concat([self.last[~self.last.index.isin(updated.index)], updated])
+
+        if not self.valid_to:
+            return merged.loc[changed, columns]
+        # One row per run, from its last report: the run's price since its start, valid
+        # to that report.
+        run = pd.DataFrame({'station_id': merged['station_id'],
+                            'fuel_type': merged['fuel_type'], 'start': start})
+        rows = merged[~run.duplicated(keep='last')].copy()
+        rows['valid_to'] = rows['update_time']
+        rows['price'] = run_price[rows.index]
+        rows['update_time'] = run_start[rows.index]
+        return rows[columns]
+
+
+class PipelineWriter(threading.Thread):
+    """
+    Write crawled blocks to the database while the crawl continues. The crawler puts
+    blocks into a bounded queue, which blocks it when the writer falls behind, so at
+    most `queue_size` unwritten blocks are held in memory. The writer thread takes all
+    queued blocks (up to `max_batch`) at once, parses them, drops prices already
+    written in this run on (station_id, fuel_type, update_time), and upserts prices and
+    newly seen stations. Each batch is committed on its own, so a crash keeps all
+    batches written before it. If given, `on_write` is called with the new prices of
+    each batch, e.g. to archive them, `change_filter` (a `ChangeFilter`) selects the
+    rows written to "fuel_prices", and `station_index` (a `StationIndex`) the rows
+    written to "stations". `latest_prices` is passed to `write_prices`.
+    """
+    def __init__(self, engine, brands, start_time, backend="values", queue_size=16,
+                 max_batch=16, on_write=None, change_filter=None, station_index=None,
+                 latest_prices=True):
+        super().__init__(name="PipelineWriter", daemon=True)
+        self.engine = engine
+        self.brands = brands
+        self.start_time = start_time
+        self.backend = backend
+        self.max_batch = max_batch
+        self.on_write = on_write
+        self.change_filter = change_filter
+        self.station_index = station_index
+        self.latest_prices = latest_prices
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.seen_prices = set()
+        self.seen_stations = set()
+        self.prices_written = 0
+        self.stations_written = 0
+        # Latest update time per (fuel_type, geo_hash), to update the crawl state.
+        self.latest = pd.DataFrame(columns=['fuel_type', 'geo_hash', 'update_time'])
+
+    def put(self, block):
+        if self.error is not None:
+            raise RuntimeError("The database writer has failed.") from self.error
+        self.queue.put(block)
+
+    def close(self, raise_error=True):
+        """
+        Wait until all queued blocks are written, and re-raise the writer's error if any.
+        :param raise_error: If false, the error (already logged) isn't raised, e.g. so it
+        doesn't replace an exception of the crawl that is propagating.
+        """
+        self.queue.put(None)
+        self.join()
+        if self.error is not None and raise_error:
+            raise self.error
+
+    def run(self):
+        closed = False
+        while not closed:
+            blocks = []
+            item = self.queue.get()
+            while True:
+                if item is None:
+                    closed = True
+                    break
+                blocks.append(item)
+                if len(blocks) >= self.max_batch:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            # After a failure, keep draining the queue so the crawler isn't blocked.
+            if blocks and self.error is None:
+                try:
+                    self.write(blocks)
+                except Exception as e:
+                    logging.error(f"Fail to write to the database: {e}")
+                    self.error = e
+
+    def write(self, blocks):
+        with metrics.stage("parse"):
+            rows = parse_blocks(blocks, self.brands, self.start_time)
+        with metrics.stage("dedupe"):
+            rows = rows.drop_duplicates(subset=price_key)
+            keys = list(zip(rows['station_id'], rows['fuel_type'], rows['update_time']))
+            is_new = [key not in self.seen_prices for key in keys]
+            rows = rows[is_new].copy()
+            rows["name"] = rows["name"].str[:128]
+        prices = rows[price_table_columns]
+        if self.change_filter is not None:
+            prices = self.change_filter.filter(prices)
+        write_prices(self.engine, prices, self.backend, self.latest_prices)
+        self.seen_prices.update(key for key, new in zip(keys, is_new) if new)
+        self.prices_written += prices.shape[0]
+        if self.on_write is not None:
+            self.on_write(rows[price_table_columns])
+
+        station_locs = rows.drop_duplicates(subset=['station_id'])
+        station_locs = station_locs.dropna(subset=['geo_hash'])
+        station_locs = station_locs[~station_locs['station_id'].isin(self.seen_stations)]
+        self.seen_stations.update(station_locs['station_id'])
+        station_locs = station_locs[station_table_columns]
+        if self.station_index is not None:
+            station_locs = self.station_index.changed(station_locs)
+        write_chunks(self.engine, station_locs, ['station_id'], 'stations', self.backend)
+        if self.station_index is not None:
+            self.station_index.update(station_locs)
+        self.stations_written += station_locs.shape[0]
+
+        latest = rows[['fuel_type', 'geo_hash', 'update_time']].dropna()
+        if not self.latest.empty:
+            latest = pd.concat([self.latest, latest])
+        self.latest = latest.groupby(['fuel_type', 'geo_hash'], as_index=False)[
+            'update_time'].max()
@@ -1,19 +1,124 @@
+import argparse
+import asyncio
 import json
 import logging
 import os
-import random
 import sys
-import time
-import uuid
 
 import pandas as pd
 from requests import Session
 from sqlalchemy import create_engine
 from tqdm import tqdm
 
-from postgresql_upsert import upsert_dataframe
+from archive import require_pyarrow, write_archive
+from crawler import (plan_units, plan_batches, parse_blocks, crawl_sequential,
+                     crawl_batched, crawl_async)
+from checkpoint import Checkpoint
+from crawl_state import CrawlState
+from geohash_planner import (fixed_chunks, trie_chunks, collapse_geo_hashes, pack_chunks,
+                             report_savings, parse_shard)
+from gaspy_client import GaspyClient, default_session_ttl
+from metrics import metrics
+from station_index import StationIndex
+import postgresql_upsert
+from recording import RecordingSession, ReplaySession
+from ingest import (price_table_columns, station_table_columns, ensure_partitions,
+                    has_latest_prices, write_chunks, write_prices, refresh_price_stats,
+                    ChangeFilter, PipelineWriter)
 
 # %% Initialize.
+parser = argparse.ArgumentParser(description="Record fuel prices from gaspy.nz.")
+parser.add_argument("--mode", choices=["sequential", "batched", "async"],
+                    default="sequential",
+                    help="Request station chunks one by one, all fuel types of a chunk "
+                         "back to back, or concurrently.")
+parser.add_argument("--rate", type=float, default=3.0,
+                    help="[async] Maximum requests per second.")
+parser.add_argument("--concurrency", type=int, default=4,
+                    help="[async] Maximum requests in flight.")
+parser.add_argument("--retries", type=int, default=3,
+                    help="[async] Retries of a request failing with a retryable error.")
+parser.add_argument("--planner", choices=["fixed", "trie"], default="trie",
+                    help="Slice stations into fixed chunks of each geo hash length, or "
+                         "pack collapsed geo hash cells up to --max-hashcodes.")
+parser.add_argument("--max-hashcodes", type=int, default=39,
+                    help="Maximum geo hashes per request.")
+parser.add_argument("--mixed-lengths", action="store_true",
+                    help="[trie] Pack geo hashes of different lengths into one request.")
+parser.add_argument("--sibling-threshold", type=int, default=None,
+                    help="[trie] Request the parent cell instead of its children when at "
+                         "least this many children are present.")
+parser.add_argument("--incremental", metavar="STATE_FILE", default=None,
+                    help="Only poll geo hash cells that are due according to the crawl "
+                         "state saved in STATE_FILE, and update it after the run.")
+parser.add_argument("--db-backend", choices=["values", "copy"], default="values",
+                    help="Upsert with multi-VALUES INSERT statements of 2000 rows, or "
+                         "stream rows through COPY into a staging table.")
+parser.add_argument("--pipeline", action="store_true",
+                    help="Write to the database while crawling, instead of after it.")
+parser.add_argument("--queue-size", type=int, default=16,
+                    help="[pipeline] Maximum responses waiting to be written.")
+parser.add_argument("--checkpoint", default="crawl_checkpoint.jsonl",
+                    help="File recording completed requests of this run, removed after "
+                         "the run succeeds.")
+parser.add_argument("--resume", action="store_true",
+                    help="Skip requests completed in the checkpoint of an interrupted "
+                         "run, and write their results along with the new ones.")
+parser.add_argument("--archive", metavar="DIR", default=None,
+                    help="Also append the prices to a local Parquet dataset in DIR, "
+                         "partitioned by month and fuel type. Needs pyarrow.")
+recording = parser.add_mutually_exclusive_group()
+recording.add_argument("--record", metavar="FILE", default=None,
+                       help="Record the responses of gaspy.nz to FILE (gzip JSONL).")
+recording.add_argument("--replay", metavar="FILE", default=None,
+                       help="Answer requests from a recording instead of gaspy.nz, at "
+                            "full speed. Credentials aren't needed.")
+parser.add_argument("--metrics", metavar="FILE", default=None,
+                    help="Write timings of each stage and request, and counters of "
+                         "retries, failed regions and filtered rows, to a JSON file.")
+parser.add_argument("--prometheus", metavar="FILE", default=None,
+                    help="Write the same metrics in the Prometheus text format, e.g. "
+                         "for the textfile collector of node_exporter.")
+parser.add_argument("--shard", metavar="I/N", type=parse_shard, default=None,
+                    help="Only crawl the I-th of N shards of stations, split by geo hash "
+                         "prefix, so N workers can crawl in parallel. Each shard writes "
+                         "independently; give each its own --incremental, --metrics and "
+                         "--prometheus files. The default checkpoint gets a suffix.")
+parser.add_argument("--shard-prefix-length", type=int, default=4,
+                    help="[shard] Stations are assigned to shards by this many leading "
+                         "characters of their geo hash.")
+parser.add_argument("--change-only", action="store_true",
+                    help="Only write a price when it differs from the last known price "
+                         "of the station and fuel type.")
+parser.add_argument("--valid-to", action="store_true",
+                    help="[change-only] Also extend \"valid_to\" of the stored price when "
+                         "it's reported again. Older databases need migrations/004_valid_to.sql.")
+parser.add_argument("--no-price-stats", action="store_true",
+                    help="Don't refresh \"daily_price_stats\" after writing, e.g. in shards "
+                         "that run refresh_price_stats.py once all shards finish.")
+parser.add_argument("--session-cache", default="gaspy_session.json",
+                    help="File caching the gaspy.nz login (session cookies, device ID, "
+                         "fuel types and brands) between runs.")
+parser.add_argument("--session-ttl", type=float, default=default_session_ttl / 3600,
+                    help="[session-cache] Hours a cached login is reused.")
+parser.add_argument("--no-session-cache", action="store_true",
+                    help="Always log in, and don't write the session cache.")
+parser.add_argument("--station-cache", default="stations_cache.json",
+                    help="File caching the stations between runs. It's reused while the "
+                         "stations in the database are unchanged, which needs table "
+                         "table_versions (migrations/006_table_versions.sql).")
+parser.add_argument("--no-station-cache", action="store_true",
+                    help="Always load the stations from the database.")
+args = parser.parse_args()
+if args.shard and parser.get_default("checkpoint") == args.checkpoint:
+    root, ext = os.path.splitext(args.checkpoint)
+    args.checkpoint = f"{root}.{args.shard[0]}of{args.shard[1]}{ext}"
+if args.valid_to and not args.change_only:
+    parser.error("--valid-to needs --change-only.")
+if args.replay and args.incremental:
+    parser.error("--replay requests the units of the recording; it can't be incremental.")
+if args.archive:
+    require_pyarrow()
 logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)],
     level=logging.INFO,
@@ -22,139 +127,206 @@ logging.basicConfig(
 )
 with open("header/dart_header.json") as f:
     dart_header = json.load(f)
-stations_chunk_size = 39
 neon_db = os.environ["NEON_DB"]
 
 # %% Pre-process stations.
 engine = create_engine(neon_db)
-with engine.connect() as c:
-    stations = pd.read_sql("select * from stations", c)
-stations.sort_values(by='geo_hash', inplace=True)
-stations['geo_hash_len'] = stations['geo_hash'].apply(len)
-stations_chunks = []
-for length, subset in stations.groupby('geo_hash_len'):
-    for i in range(0, subset.shape[0], stations_chunk_size):
-        stations_chunks.append(subset.iloc[i:i+stations_chunk_size])
+station_index = StationIndex.load(
+    engine, None if args.no_station_cache else args.station_cache)
+stations = station_index.stations
+if args.shard:
+    stations = station_index.shard(args.shard, args.shard_prefix_length)
+    logging.info(f"Shard {args.shard[0]}/{args.shard[1]}: {stations.shape[0]} of "
+                 f"{len(station_index)} stations.")
+with metrics.stage("plan"):
+    geo_hash_chunks = fixed_chunks(stations, args.max_hashcodes)
+    if args.planner == "trie":
+        planned_chunks = trie_chunks(stations, args.max_hashcodes, args.mixed_lengths,
+                                     args.sibling_threshold)
+        report_savings(geo_hash_chunks, planned_chunks)
+        geo_hash_chunks = planned_chunks
 
 # %% Login.
-session = Session()
-response = session.post(
-    url="https://gaspy.nz/api/v1/Public/login",
-    data=json.dumps({
-        "email": os.environ["GASPY_EMAIL"],
-        "password": os.environ["GASPY_PASSWORD"],
-        "gold_key": None,
-        "v": 22,
-        "a": "3.21.3",
-    }),
-    headers=dart_header,
+if args.replay:
+    session = ReplaySession(args.replay)
+    # Replay as if crawling at the time of the recording, and without rate limits.
+    args.mode, args.rate = "async", float("inf")
+    logging.info(f"Replay {args.replay} recorded at {session.recorded_at}.")
+    gaspy_email = gaspy_password = ""
+else:
+    session = Session()
+    if args.record:
+        session = RecordingSession(session, args.record, pd.Timestamp('now', tz='UTC'))
+    gaspy_email, gaspy_password = os.environ["GASPY_EMAIL"], os.environ["GASPY_PASSWORD"]
+# A recording or a replay needs the login request, so they don't use the cached login.
+use_session_cache = not (args.no_session_cache or args.record or args.replay)
+client = GaspyClient(
+    gaspy_email, gaspy_password, session,
+    cache_path=args.session_cache if use_session_cache else None,
+    ttl=args.session_ttl * 3600,
+    pool_size=args.concurrency if args.mode == "async" else 1,
+    login_headers=dart_header,
 )
-if response.status_code != 200:
-    raise Exception(f"Status code: {response.status_code}. Reason: {response.reason}")
-assert response.json().get('success'), "gaspy.nz username and password don't match."
-response_json = response.json()
-fuel_types = response_json['data']['fuel_types']
+with metrics.stage("login"):
+    client.login()
 fuel_types = {
     meta['code']: int(key)  # unsafe conversion, aim to raise problems before query.
-    for key, meta in fuel_types.items()
+    for key, meta in client.fuel_types.items()
 }
-brands = response_json['data']['brands']
+brands = client.brands
 selected_fuel_types = ['91', 'D', '95', '98']
 assert all(fuel_type in fuel_types.keys() for fuel_type in selected_fuel_types), \
     "Some of petrol #91, #95, #98 or diesel don't have a fuel type ID."
 
 # %% Query map data.
-now = pd.Timestamp('now', tz='UTC')
+now = session.recorded_at if args.replay else pd.Timestamp('now', tz='UTC')
+ensure_partitions(engine, now)
+latest_prices = has_latest_prices(engine)
+if args.change_only and not latest_prices:
+    logging.error("--change-only compares with table \"latest_prices\". Run "
+                  "migrations/001_latest_prices.sql first.")
+    sys.exit(1)
 start_time = now - pd.Timedelta(days=1)
-device_id = str(uuid.uuid4()).upper()
-pbar = tqdm(desc="Record fuel prices",
-            total=len(selected_fuel_types) * len(stations_chunks))
-compound_data = []
-
-
-def safe_astype(ins, cls):
-    try:
-        return cls(ins)
-    except (ValueError, TypeError):
-        return pd.NA
-
-
-for fuel_type in selected_fuel_types:
-    fuel_type_id = fuel_types[fuel_type]
-    price_per_type = []
-    for chunk in stations_chunks:
-        geo_hash_list = chunk['geo_hash'].unique().tolist()
-        response = session.post(
-            url="https://gaspy.nz/api/v1/Map/blocksFromHashcodes",
-            data=json.dumps({
-                "hashcodes": geo_hash_list,
-                "fuel_type_id": fuel_type_id,
-                "fuel_type_code": fuel_type,
-                "gold_key": None,
-                "ev_plug_types": [],
-                "v": "22",
-                "a": "3.21.3",
-                "udid": "ios_" + device_id,
-            })
-        )
-        time.sleep(random.uniform(0.7, 1.3))
-        if response.status_code != 200:
-            logging.warning(f"Geometry hash region fails: {geo_hash_list} "
-                            f"Status code: {response.status_code}. Reason: {response.reason}")
-            continue
-        response_json = response.json()
-        if not response_json.get('success'):
-            logging.warning(f"Geometry hash region fails: {geo_hash_list} "
-                            f"gaspy.nz returns errors: {response_json.get('error')}")
-            continue
-        data = response_json.get('data')
-        if not isinstance(data, list):
-            logging.warning(f"Fail to parse the response of geometry hash region "
-                            f"{geo_hash_list}")
-        for station in data:
-            updated_time_str = station.get('dateUpdated', '')
-            updated_time_naive = pd.to_datetime(
-                updated_time_str, format="%Y-%m-%dT%H:%M:%S.%fZ", errors='coerce')
-            updated_time = updated_time_naive.tz_localize(tz='UTC', nonexistent='NaT')
-            if updated_time >= start_time:
-                compound_data.append({
-                    "station_id": station.get('stationKey', pd.NA),
-                    "brand": brands.get(station.get('brandId'), pd.NA),
-                    "fuel_type": fuel_type,
-                    "price": safe_astype(station.get('price'), float),
-                    "update_time": updated_time,
-                    "latitude": safe_astype(station.get('lat'), float),
-                    "longitude": safe_astype(station.get('lng'), float),
-                    "geo_hash": station.get('geoHash', pd.NA),
-                    "name": station.get('stationName', pd.NA),
-                })
-        pbar.update(1)
-
-compound_data = pd.DataFrame(compound_data)
-compound_data.drop_duplicates(subset=['station_id', 'fuel_type'], inplace=True)
-compound_data["name"] = compound_data["name"].str[:128]
-prices = compound_data[['station_id', 'brand', 'fuel_type', 'price', 'update_time']]
-
-db_writing_chunk_size = 2000
-for i in range(0, prices.shape[0], db_writing_chunk_size):
-    upsert_dataframe(
-        engine,
-            prices.iloc[i:i + db_writing_chunk_size],
-        ['station_id', 'fuel_type', 'update_time'],
-        'fuel_prices',
-    )
-logging.info(f"Successfully upsert {prices.shape[0]} rows to the database.")
-
-# %% Insert stations.
-compound_data.drop_duplicates(subset=['station_id'], inplace=True)
-compound_data.dropna(subset=['geo_hash'], inplace=True)
-station_locs = compound_data[['station_id', 'name', 'geo_hash', 'latitude', 'longitude']]
-
-for i in range(0, station_locs.shape[0], db_writing_chunk_size):
-    upsert_dataframe(
-        engine,
-            station_locs.iloc[i:i + db_writing_chunk_size],
-        ['station_id'],
-        'stations'
-    )
-logging.info(f"Successfully upsert {station_locs.shape[0]} rows to the database.")
+device_id = client.device_id
+if args.incremental:
+    crawl_state = CrawlState(args.incremental)
+    full_sweep = crawl_state.is_full_sweep(now)
+    cells = collapse_geo_hashes(stations['geo_hash'], args.sibling_threshold)
+    units = []
+    for fuel_type in selected_fuel_types:
+        due_cells = crawl_state.due_cells(fuel_type, cells, now)
+        for geo_hash_list in pack_chunks(due_cells, args.max_hashcodes, args.mixed_lengths):
+            units.append((fuel_type, fuel_types[fuel_type], geo_hash_list))
+    logging.info(f"Incremental crawl{' (full sweep)' if full_sweep else ''}: "
+                 f"{len(units)} requests.")
+elif args.replay:
+    units = session.units(fuel_types)
+else:
+    units = plan_units(selected_fuel_types, fuel_types, geo_hash_chunks)
+checkpoint = Checkpoint(args.checkpoint)
+restored_blocks = {}
+if args.resume:
+    resumed_start_time, restored_blocks = checkpoint.resume()
+    if resumed_start_time is None:
+        checkpoint.start(start_time)
+    else:
+        start_time = resumed_start_time
+    logging.info(f"Resume from {len(restored_blocks)} completed requests.")
+else:
+    checkpoint.start(start_time)
+pending_units = [unit for unit in units
+                 if (unit[0], tuple(unit[2])) not in restored_blocks]
+# (fuel_type, geo hash list) of units which succeeded, in this run or before resuming.
+succeeded = set(restored_blocks)
+
+
+def on_unit_done(fuel_type, geo_hash_list, data):
+    checkpoint.record(fuel_type, geo_hash_list, data)
+    succeeded.add((fuel_type, tuple(geo_hash_list)))
+
+
+restored_blocks = [(fuel_type, data)
+                   for (fuel_type, _), data in restored_blocks.items()]
+
+change_filter = ChangeFilter.load(engine, args.valid_to) if args.change_only else None
+pbar = tqdm(desc="Record fuel prices", total=len(pending_units))
+if args.pipeline:
+    writer = PipelineWriter(
+        engine, brands, start_time, args.db_backend, args.queue_size,
+        on_write=(lambda rows: write_archive(rows, args.archive)) if args.archive else None,
+        change_filter=change_filter, station_index=station_index,
+        latest_prices=latest_prices)
+    writer.start()
+    sink = writer.put
+    for block in restored_blocks:
+        sink(block)
+else:
+    sink = None
+crawl_error = None
+try:
+    with metrics.stage("crawl"):
+        if args.mode == "async":
+            blocks = asyncio.run(crawl_async(
+                client, pending_units, device_id, rate=args.rate,
+                concurrency=args.concurrency, retries=args.retries, pbar=pbar, sink=sink,
+                on_unit_done=on_unit_done))
+        elif args.mode == "batched":
+            batches = plan_batches(pending_units)
+            blocks = crawl_batched(client, batches, device_id, pbar, sink,
+                                   on_unit_done)
+        else:
+            blocks = crawl_sequential(client, pending_units, device_id, pbar, sink,
+                                      on_unit_done)
+except BaseException as e:
+    crawl_error = e
+    raise
+finally:
+    pbar.close()
+    checkpoint.close()
+    if args.record:
+        session.close()
+    if args.pipeline:
+        with metrics.stage("drain_writer"):
+            # An error of the crawl is the cause; the writer's error is logged.
+            writer.close(raise_error=crawl_error is None)
+
+polled_units = [unit for unit in units if (unit[0], tuple(unit[2])) in succeeded]
+if args.pipeline:
+    logging.info(f"Successfully upsert {writer.prices_written} rows of fuel prices and "
+                 f"{writer.stations_written} rows of stations to the database.")
+    if args.incremental:
+        crawl_state.record(polled_units, writer.latest, now, full_sweep)
+else:
+    with metrics.stage("parse"):
+        compound_data = parse_blocks(restored_blocks + blocks, brands, start_time)
+    if args.incremental:
+        crawl_state.record(polled_units, compound_data, now, full_sweep)
+
+    with metrics.stage("dedupe"):
+        compound_data.drop_duplicates(subset=['station_id', 'fuel_type'], inplace=True)
+        compound_data["name"] = compound_data["name"].str[:128]
+        prices = compound_data[price_table_columns]
+        changed_prices = prices if change_filter is None else change_filter.filter(prices)
+    with metrics.stage("write_prices", rows=changed_prices.shape[0]):
+        write_prices(engine, changed_prices, args.db_backend, latest_prices)
+    logging.info(f"Successfully upsert {changed_prices.shape[0]} rows to the database.")
+    if args.archive:
+        with metrics.stage("archive", rows=prices.shape[0]):
+            n = write_archive(prices, args.archive)
+        logging.info(f"Successfully archive {n} rows to {args.archive}.")
+
+    # %% Insert stations.
+    compound_data.drop_duplicates(subset=['station_id'], inplace=True)
+    compound_data.dropna(subset=['geo_hash'], inplace=True)
+    station_locs = station_index.changed(compound_data[station_table_columns])
+    with metrics.stage("write_stations", rows=station_locs.shape[0]):
+        write_chunks(engine, station_locs, ['station_id'], 'stations', args.db_backend)
+    station_index.update(station_locs)
+    logging.info(f"Successfully upsert {station_locs.shape[0]} rows to the database; "
+                 f"{compound_data.shape[0] - station_locs.shape[0]} stations are "
+                 f"unchanged.")
+logging.info(f"Reflected {postgresql_upsert.reflection_count(engine)} tables from the "
+             f"database.")
+
+if change_filter is not None:
+    metrics.count("unchanged_prices", change_filter.unchanged)
+    logging.info(f"{change_filter.unchanged} reported prices are unchanged.")
+if not args.no_price_stats:
+    n = refresh_price_stats(engine, start_time)
+    if n is not None:
+        logging.info(f"Successfully refresh {n} rows of daily price statistics.")
+if args.incremental:
+    crawl_state.save()
+checkpoint.clear()
+
+# %% Report metrics.
+summary = metrics.summary()
+logging.info("Seconds per stage: " + ", ".join(
+    f"{name} {stage['seconds']:.2f}" for name, stage in summary["stages"].items()
+    if not name.startswith("write_chunk:")))
+logging.info("Counters: " + ", ".join(
+    f"{name} {n}" for name, n in summary["counters"].items()))
+if args.metrics:
+    metrics.write_json(args.metrics)
+if args.prometheus:
+    metrics.write_prometheus(args.prometheus)
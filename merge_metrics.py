@@ -0,0 +1,31 @@
+import argparse
+import logging
+import sys
+
+from metrics import Metrics
+
+parser = argparse.ArgumentParser(
+    description="Merge the --metrics files of the shards of a crawl into one.")
+parser.add_argument("inputs", nargs="+", metavar="FILE", help="Metrics of each shard.")
+parser.add_argument("--output", metavar="FILE", required=True,
+                    help="Merged metrics, in the same JSON format.")
+parser.add_argument("--prometheus", metavar="FILE", default=None,
+                    help="Also write the merged metrics in the Prometheus text format.")
+args = parser.parse_args()
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+
+merged = Metrics()
+for path in args.inputs:
+    merged.merge_json(path)
+merged.write_json(args.output)
+if args.prometheus:
+    merged.write_prometheus(args.prometheus)
+summary = merged.summary()
+logging.info(f"Merged {len(args.inputs)} shards: {summary['seconds']:.1f}s, "
+             f"{sum(r['count'] for r in summary['requests'].values())} requests, "
+             + ", ".join(f"{name} {n}" for name, n in summary["counters"].items()))
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Metrics:
+    """
+    Thread-safe collector of the timings and counters of one crawl run.
+    - Stages: seconds, calls and rows of each named step, e.g. login, parse, and every
+      chunk written to the database. A stage entered several times (or by several
+      threads at once) accumulates.
+    - Requests: latency, status code, payload size and number of stations of every
+      HTTP response.
+    - Counters: e.g. retries, failed geo hash regions, rows filtered by start time.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            # Set when merging finished runs; otherwise the run is still going.
+            self.ended = None
+            self.stages = {}
+            self.requests = []
+            self.counters = {}
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - t0, rows)
+
+    def observe_stage(self, name, seconds, rows=None):
+        with self._lock:
+            stage = self.stages.setdefault(
+                name, {"seconds": 0.0, "calls": 0, "max_seconds": 0.0, "rows": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            if rows is not None:
+                stage["rows"] += rows
+
+    def observe_request(self, endpoint, response, stations=None):
+        """
+        :param response: A requests response. Its latency is `response.elapsed`, the time
+        until the response headers are received.
+        :param stations: Number of stations in the response, if it's parsed.
+        """
+        with self._lock:
+            self.requests.append({
+                "endpoint": endpoint,
+                "latency": response.elapsed.total_seconds(),
+                "status_code": response.status_code,
+                "bytes": len(response.content),
+                "stations": stations,
+            })
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge_json(self, path):
+        """
+        Add the metrics of a JSON file written by `write_json` to this collector, which
+        is meant to hold only merged runs, e.g. the shards of the same crawl. Stages and
+        counters are summed, requests are pooled, and the run spans from the earliest
+        start to the latest end.
+        """
+        with open(path) as f:
+            other = json.load(f)
+        ended = other["started"] + other["seconds"]
+        with self._lock:
+            if self.ended is None:
+                self.started, self.ended = other["started"], ended
+            else:
+                self.started = min(self.started, other["started"])
+                self.ended = max(self.ended, ended)
+            for name, other_stage in other["stages"].items():
+                stage = self.stages.setdefault(
+                    name, {"seconds": 0.0, "calls": 0, "max_seconds": 0.0, "rows": 0})
+                stage["seconds"] += other_stage["seconds"]
+                stage["calls"] += other_stage["calls"]
+                stage["max_seconds"] = max(stage["max_seconds"], other_stage["max_seconds"])
+                stage["rows"] += other_stage["rows"]
+            self.requests.extend(other["request_log"])
+            for name, n in other["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        with self._lock:
+            requests = {}
+            for endpoint in dict.fromkeys(r["endpoint"] for r in self.requests):
+                samples = [r for r in self.requests if r["endpoint"] == endpoint]
+                latencies = [r["latency"] for r in samples]
+                status_codes = {}
+                for r in samples:
+                    status_codes[str(r["status_code"])] = \
+                        status_codes.get(str(r["status_code"]), 0) + 1
+                requests[endpoint] = {
+                    "count": len(samples),
+                    "status_codes": status_codes,
+                    "latency_p50": float(np.percentile(latencies, 50)),
+                    "latency_p95": float(np.percentile(latencies, 95)),
+                    "latency_max": max(latencies),
+                    "bytes": sum(r["bytes"] for r in samples),
+                    "stations": sum(r["stations"] or 0 for r in samples),
+                }
+            return {
+                "started": self.started,
+                "seconds": (self.ended or time.time()) - self.started,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "requests": requests,
+                "counters": dict(self.counters),
+            }
+
+    def write_json(self, path):
+        """
+        Write the summary, with every request, to a JSON file.
+        """
+        summary = self.summary()
+        with self._lock:
+            summary["request_log"] = list(self.requests)
+        write_atomic(path, json.dumps(summary, indent=2))
+
+    def write_prometheus(self, path, prefix="gaspy_crawl"):
+        """
+        Write the summary in the Prometheus text format, for the textfile collector of
+        node_exporter. Every value is a gauge describing the latest run.
+        """
+        summary = self.summary()
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}"
+                             if label_text else f"{prefix}_{name} {value}")
+
+        gauge("last_run_timestamp_seconds", "Start time of the latest run.",
+              [({}, summary["started"])])
+        gauge("duration_seconds", "Duration of the latest run.", [({}, summary["seconds"])])
+        gauge("stage_seconds", "Seconds spent in each stage.",
+              [({"stage": name}, s["seconds"]) for name, s in summary["stages"].items()])
+        gauge("stage_calls", "Times each stage ran.",
+              [({"stage": name}, s["calls"]) for name, s in summary["stages"].items()])
+        gauge("stage_rows", "Rows processed by each stage.",
+              [({"stage": name}, s["rows"]) for name, s in summary["stages"].items()])
+        gauge("requests", "HTTP responses by endpoint and status code.",
+              [({"endpoint": endpoint, "status_code": code}, n)
+               for endpoint, r in summary["requests"].items()
+               for code, n in r["status_codes"].items()])
+        gauge("request_latency_seconds", "Latency of HTTP responses.",
+              [({"endpoint": endpoint, "quantile": quantile}, r[key])
+               for endpoint, r in summary["requests"].items()
+               for quantile, key in [("0.5", "latency_p50"), ("0.95", "latency_p95")]])
+        gauge("response_bytes", "Bytes of HTTP responses.",
+              [({"endpoint": endpoint}, r["bytes"])
+               for endpoint, r in summary["requests"].items()])
+        gauge("events", "Counters, e.g. retries and failed geo hash regions.",
+              [({"name": name}, n) for name, n in summary["counters"].items()])
+        write_atomic(path, "\n".join(lines) + "\n")
+
+
+def write_atomic(path, content):
+    """
+    Write to a temporary file and rename it, so readers never see a partial file.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Shared by the crawler, the database writer and main.py for the current run.
+metrics = Metrics()
@@ -0,0 +1,17 @@
+-- Add table "latest_prices" to an existing database, and fill it from "fuel_prices".
+-- Run with psql from the repository root, e.g. psql "$NEON_DB" -f migrations/001_latest_prices.sql
+
+CREATE TABLE IF NOT EXISTS public.latest_prices (
+    station_id character varying(32) NOT NULL,
+    fuel_type character varying(8) NOT NULL,
+    brand character varying(32),
+    price numeric(6,1),
+    update_time timestamp with time zone NOT NULL,
+    CONSTRAINT latest_prices_pkey PRIMARY KEY (station_id, fuel_type)
+);
+
+COMMENT ON TABLE public.latest_prices IS 'The latest record in "fuel_prices" of each station and fuel type. It is updated in the same transaction as "fuel_prices" when the crawler writes prices, and can be rebuilt by "rebuild_latest_prices.py".';
+
+BEGIN;
+\i sqls/rebuild_latest_prices.sql
+COMMIT;
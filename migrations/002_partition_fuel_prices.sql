@@ -0,0 +1,86 @@
+-- Partition "fuel_prices" by year of update_time, and add covering indexes for the
+-- queries in sqls/.
+-- Run with psql in one transaction from the repository root, e.g.
+-- psql "$NEON_DB" -1 -f migrations/002_partition_fuel_prices.sql
+
+ALTER TABLE public.fuel_prices RENAME TO fuel_prices_unpartitioned;
+ALTER TABLE public.fuel_prices_unpartitioned
+    RENAME CONSTRAINT fuel_prices_uniq_1 TO fuel_prices_unpartitioned_uniq_1;
+
+CREATE TABLE public.fuel_prices (
+    station_id character varying(32),
+    fuel_type character varying(8),
+    brand character varying(32),
+    price numeric(6,1),
+    update_time timestamp with time zone
+) PARTITION BY RANGE (update_time);
+
+COMMENT ON TABLE public.fuel_prices IS 'Records of fuel prices. Partitioned by year of "update_time"; rows without "update_time" are in "fuel_prices_default".';
+COMMENT ON COLUMN public.fuel_prices.station_id IS 'Same as "id" in "stations" table. Because query is based on geo_hash, which may not be unique to stations, "station_id" in this table may not be in the stations table.';
+COMMENT ON COLUMN public.fuel_prices.fuel_type IS 'The fuel type symbol. D - Diesel; numbers - Research Octane Number (RON).';
+COMMENT ON COLUMN public.fuel_prices.brand IS 'Brand of the fuel station. If missing, the station''s brand is unknown in "gaspy".';
+COMMENT ON COLUMN public.fuel_prices.price IS 'Price of the fuel corresponding to "fuel_type" and uploaded at "updated_time", in unit of NZD per 100L.';
+COMMENT ON COLUMN public.fuel_prices.update_time IS 'The time that the fuel price is uploaded. It cannot be earlier than 1 days before the data is fetched.';
+
+ALTER TABLE public.fuel_prices
+    ADD CONSTRAINT fuel_prices_uniq_1 UNIQUE (station_id, fuel_type, update_time);
+
+-- Create yearly partitions from the year of "since" to the year after "until".
+-- The crawler calls it before writing, so the next year's partition always exists
+-- before rows for it arrive. Rows of a year already in the default partition, e.g.
+-- backfilled before its partition existed, would make CREATE TABLE ... PARTITION OF
+-- fail, so a missing partition is created detached, the rows are moved into it, and
+-- then it's attached.
+CREATE OR REPLACE FUNCTION public.ensure_fuel_prices_partitions(
+    since timestamp with time zone, until timestamp with time zone)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    y integer;
+    partition_name text;
+    lower_bound timestamp with time zone;
+    upper_bound timestamp with time zone;
+BEGIN
+    FOR y IN extract(year FROM since AT TIME ZONE 'UTC')::integer
+          .. extract(year FROM until AT TIME ZONE 'UTC')::integer + 1 LOOP
+        partition_name := 'fuel_prices_' || y;
+        CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+        -- Concurrent callers (e.g. shards) wait here, then find the partition created.
+        LOCK TABLE public.fuel_prices IN SHARE UPDATE EXCLUSIVE MODE;
+        CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+        lower_bound := make_timestamptz(y, 1, 1, 0, 0, 0, 'UTC');
+        upper_bound := make_timestamptz(y + 1, 1, 1, 0, 0, 0, 'UTC');
+        EXECUTE format('CREATE TABLE public.%I (LIKE public.fuel_prices)', partition_name);
+        IF to_regclass('public.fuel_prices_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.fuel_prices_default '
+                'WHERE update_time >= %L AND update_time < %L RETURNING *) '
+                'INSERT INTO public.%I SELECT * FROM moved',
+                lower_bound, upper_bound, partition_name);
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE public.fuel_prices ATTACH PARTITION public.%I '
+            'FOR VALUES FROM (%L) TO (%L)',
+            partition_name, lower_bound, upper_bound);
+    END LOOP;
+END;
+$$;
+
+SELECT public.ensure_fuel_prices_partitions(
+    coalesce((SELECT min(update_time) FROM public.fuel_prices_unpartitioned), now()),
+    now());
+CREATE TABLE public.fuel_prices_default PARTITION OF public.fuel_prices DEFAULT;
+
+INSERT INTO public.fuel_prices (station_id, fuel_type, brand, price, update_time)
+SELECT station_id, fuel_type, brand, price, update_time
+FROM public.fuel_prices_unpartitioned;
+DROP TABLE public.fuel_prices_unpartitioned;
+
+-- sqls/get_price.sql: one station over a time window, index-only.
+CREATE INDEX fuel_prices_station_time_idx
+    ON public.fuel_prices (station_id, update_time) INCLUDE (fuel_type, price);
+-- sqls/get_latest_price.sql: all stations of one fuel type.
+CREATE INDEX IF NOT EXISTS latest_prices_fuel_type_idx
+    ON public.latest_prices (fuel_type) INCLUDE (station_id, price, brand);
+
+ANALYZE public.fuel_prices;
+ANALYZE public.latest_prices;
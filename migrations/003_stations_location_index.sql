@@ -0,0 +1,9 @@
+-- Add a spatial index on the location of stations, for the viewport queries of the
+-- dashboard map (sqls/get_latest_price_in_bounds.sql, sqls/get_latest_price_clusters.sql).
+-- Run with psql from the repository root, e.g.
+-- psql "$NEON_DB" -f migrations/003_stations_location_index.sql
+
+CREATE INDEX IF NOT EXISTS stations_location_idx
+    ON public.stations USING gist (point(longitude, latitude));
+
+ANALYZE public.stations;
@@ -0,0 +1,8 @@
+-- Add "valid_to" to "fuel_prices", for change-only ingestion (main.py --change-only
+-- --valid-to) and compact_fuel_prices.py.
+-- Run with psql from the repository root, e.g.
+-- psql "$NEON_DB" -f migrations/004_valid_to.sql
+
+ALTER TABLE public.fuel_prices ADD COLUMN IF NOT EXISTS valid_to timestamp with time zone;
+
+COMMENT ON COLUMN public.fuel_prices.valid_to IS 'The last time the price is reported before it changes. "update_time" is the first time. Missing if the row is written without change-only ingestion.';
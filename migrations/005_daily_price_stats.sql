@@ -0,0 +1,37 @@
+-- Add table "daily_price_stats", daily price statistics by city, brand and geo hash
+-- prefix for the trends page of the dashboard, and column "city" of "stations" filled
+-- from stations.csv. The crawler refreshes the days it writes; fill the history
+-- afterward with python refresh_price_stats.py.
+-- Run with psql from the repository root, e.g.
+-- psql "$NEON_DB" -f migrations/005_daily_price_stats.sql
+
+ALTER TABLE public.stations ADD COLUMN IF NOT EXISTS city text;
+
+COMMENT ON COLUMN public.stations.city IS 'City of the fuel station, from "stations.csv". Missing for stations first seen by the crawler.';
+
+CREATE TEMPORARY TABLE station_cities (
+    id character(32), city text, name text, geo_hash text, latitude text, longitude text
+);
+\copy station_cities FROM 'stations.csv' WITH (FORMAT csv, HEADER)
+UPDATE public.stations s SET city = c.city
+FROM station_cities c
+WHERE s.station_id = c.id AND c.city IS NOT NULL;
+DROP TABLE station_cities;
+
+CREATE TABLE IF NOT EXISTS public.daily_price_stats (
+    day date NOT NULL,
+    fuel_type character varying(8) NOT NULL,
+    dimension character varying(8) NOT NULL,
+    value character varying(32) NOT NULL,
+    stations integer NOT NULL,
+    reports integer NOT NULL,
+    min_price numeric(6,1),
+    median_price numeric(7,2),
+    mean_price numeric(7,2),
+    max_price numeric(6,1),
+    refreshed_at timestamp with time zone NOT NULL,
+    CONSTRAINT daily_price_stats_pkey PRIMARY KEY (fuel_type, dimension, value, day)
+);
+
+COMMENT ON TABLE public.daily_price_stats IS 'Statistics of the prices reported in "fuel_prices" each day (in New Zealand time), by fuel type and by city, brand or geo hash prefix. Refreshed by the crawler for the days it writes, and by "refresh_price_stats.py".';
+COMMENT ON COLUMN public.daily_price_stats.dimension IS 'What "value" is: "city" of the station, "brand", or the first characters of the station''s "geo_hash".';
@@ -0,0 +1,33 @@
+-- Add table "table_versions", whose version of "stations" is incremented by every
+-- statement writing to "stations", so the crawler can tell whether its cached station
+-- index (station_index.py) is still current by reading one row.
+-- Run with psql from the repository root, e.g.
+-- psql "$NEON_DB" -f migrations/006_table_versions.sql
+
+CREATE TABLE IF NOT EXISTS public.table_versions (
+    table_name text NOT NULL,
+    version bigint NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    CONSTRAINT table_versions_pkey PRIMARY KEY (table_name)
+);
+
+COMMENT ON TABLE public.table_versions IS 'Version of tables cached by clients, incremented by a trigger on every statement writing to the table.';
+
+INSERT INTO public.table_versions (table_name, version, updated_at)
+VALUES ('stations', 1, now())
+ON CONFLICT (table_name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_table_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE public.table_versions
+    SET version = version + 1, updated_at = now()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS stations_version ON public.stations;
+CREATE TRIGGER stations_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.stations
+    FOR EACH STATEMENT EXECUTE FUNCTION public.bump_table_version();
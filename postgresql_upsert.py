@@ -1,18 +1,94 @@
-from sqlalchemy import MetaData
+import io
+import time
+import weakref
+from contextlib import nullcontext
+
+from sqlalchemy import MetaData, text
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import InvalidRequestError
+
+copy_chunk_size = 100_000
+
+
+class TableCache:
+    """
+    Reflected tables of one engine, keyed by (schema, table name), with the time they
+    were reflected.
+    """
+    def __init__(self):
+        self.tables = {}
+        self.reflections = 0
+
+
+# Kept per engine, and dropped with it.
+_table_caches = weakref.WeakKeyDictionary()
+
+
+def table_cache(engine):
+    cache = _table_caches.get(engine)
+    if cache is None:
+        cache = _table_caches[engine] = TableCache()
+    return cache
+
+
+def get_table(engine, table_name, schema="public", ttl=None):
+    """
+    Return the reflected SQLAlchemy table, reflecting only this table on a cache miss.
+    :param ttl: Seconds a reflected table is reused. If None, it's reused until
+    `invalidate_table_cache` is called.
+    """
+    cache = table_cache(engine)
+    cached = cache.tables.get((schema, table_name))
+    if cached is not None and (ttl is None or time.monotonic() - cached[1] < ttl):
+        return cached[0]
+    metadata = MetaData()
+    # Raises sqlalchemy.exc.InvalidRequestError if the table doesn't exist.
+    metadata.reflect(bind=engine, schema=schema, only=[table_name])
+    cache.reflections += 1
+    table = metadata.tables[f"{schema}.{table_name}"]
+    cache.tables[(schema, table_name)] = (table, time.monotonic())
+    return table
+
+
+def invalidate_table_cache(engine, schema=None, table_name=None):
+    """
+    Drop the cached tables of `engine` matching all given arguments, e.g. after a schema
+    migration. Without them, all of its tables are dropped.
+    """
+    tables = table_cache(engine).tables
+    for key in list(tables):
+        if all(expected is None or actual == expected
+               for actual, expected in zip(key, (schema, table_name))):
+            del tables[key]
 
 
-def upsert_dataframe(engine, df, unique_key_columns, table_name, schema="public"):
+def reflection_count(engine):
+    """
+    Number of tables reflected from `engine`, counting reflections again after expiry.
+    """
+    return table_cache(engine).reflections
+
+
+def upsert_dataframe(engine, df, unique_key_columns, table_name, schema="public",
+                     backend="values", conn=None, update_where=None):
     """
     Performs a bulk INSERT OR UPDATE of a pandas DataFrame to a Postgresql table.
     This function inserts rows from the DataFrame. If a row violates a unique
     constraint (specified by `unique_key_columns`), it updates the
     existing row with the new values from the DataFrame instead.
+    `backend` is "values" for one multi-VALUES INSERT statement, or "copy" to stream
+    the rows through COPY into a staging table and merge it with one INSERT ... SELECT.
+    If `conn` is given, the statements run in its transaction instead of a new one.
+    If `update_where` (SQL text, e.g. "t.update_time < EXCLUDED.update_time") is given,
+    existing rows are only updated where it holds.
     """
-    metadata = MetaData()
-    metadata.reflect(bind=engine, schema=schema)
-    table = metadata.tables[f"{schema}.{table_name}"]
     if df.empty: return
+    if backend == "copy":
+        update_cols = [col for col in df.columns if col not in unique_key_columns]
+        _copy_merge(engine, df, unique_key_columns, table_name, schema, update_cols,
+                    conn, update_where)
+        return
+    table = get_table(engine, table_name, schema)
     # Convert DataFrame to a list of dictionaries for SQLAlchemy
     data_to_insert = df.to_dict(orient='records')
     # The initial INSERT statement
@@ -20,23 +96,26 @@ def upsert_dataframe(engine, df, unique_key_columns, table_name, schema="public"
     # Dynamically create the 'set_' dictionary for the ON CONFLICT clause.
     # This dictionary maps columns to be updated to the new values from
     # the incoming data (referred to by 'stmt.excluded').
-    # We update all columns that are NOT part of the unique key.
+    # We update all columns of the DataFrame that are NOT part of the unique key, so
+    # columns of the table missing from the DataFrame keep their values.
     update_cols = {
         col.name: col
         for col in stmt.excluded
-        if col.name not in unique_key_columns
+        if col.name not in unique_key_columns and col.name in df.columns
     }
     # Construct the final UPSERT statement with the ON CONFLICT clause
     upsert_stmt = stmt.on_conflict_do_update(
         index_elements=unique_key_columns,
-        set_=update_cols
+        set_=update_cols,
+        where=None if update_where is None else text(update_where),
     )
     # Execute the statement within a transaction
-    with engine.begin() as conn:
+    with _transaction(engine, conn) as conn:
         conn.execute(upsert_stmt)
 
 
-def insert_if_not_exists(engine, df, unique_key_columns, table_name, schema="public"):
+def insert_if_not_exists(engine, df, unique_key_columns, table_name, schema="public",
+                         backend="values", conn=None):
     """
     Performs a bulk INSERT IGNORE of a pandas DataFrame to a PostgreSQL table.
 
@@ -50,20 +129,23 @@ def insert_if_not_exists(engine, df, unique_key_columns, table_name, schema="pub
         unique_key_columns (list): List of column names constituting the unique constraint.
         table_name (str): Target table name.
         schema (str): Target schema name.
+        backend (str): "values" for one multi-VALUES INSERT statement, or "copy" to
+            stream the rows through COPY into a staging table first.
+        conn: If given, run in this connection's transaction instead of a new one.
     """
     if df.empty:
         return
 
-    metadata = MetaData()
-    # Reflect the table structure from the database
-    metadata.reflect(bind=engine, schema=schema)
-
-    # Handle potential key errors if schema/table string formatting varies
-    full_table_name = f"{schema}.{table_name}"
-    if full_table_name not in metadata.tables:
-        raise ValueError(f"Table {full_table_name} not found in database metadata.")
+    if backend == "copy":
+        _copy_merge(engine, df, unique_key_columns, table_name, schema, update_cols=[],
+                    conn=conn)
+        return
 
-    table = metadata.tables[full_table_name]
+    # Reflect the table structure from the database, or reuse the cached one
+    try:
+        table = get_table(engine, table_name, schema)
+    except InvalidRequestError:
+        raise ValueError(f"Table {schema}.{table_name} not found in database metadata.")
 
     # Convert DataFrame to a list of dictionaries for SQLAlchemy
     data_to_insert = df.to_dict(orient='records')
@@ -78,5 +160,54 @@ def insert_if_not_exists(engine, df, unique_key_columns, table_name, schema="pub
     )
 
     # Execute the statement within a transaction
-    with engine.begin() as conn:
+    with _transaction(engine, conn) as conn:
         conn.execute(do_nothing_stmt)
+
+
+def _transaction(engine, conn):
+    """
+    A new transaction on `engine`, or the ongoing one of `conn` if given.
+    """
+    return engine.begin() if conn is None else nullcontext(conn)
+
+
+def _copy_merge(engine, df, unique_key_columns, table_name, schema, update_cols,
+                conn=None, update_where=None):
+    """
+    Stream `df` as CSV through COPY into a temporary staging table shaped like the
+    target table, then merge it into the target with one INSERT ... SELECT ... ON
+    CONFLICT statement. Rows are serialized `copy_chunk_size` at a time, so the client
+    never holds the whole CSV in memory. Columns in `update_cols` are overwritten on
+    conflict (where `update_where` holds, if given); if it's empty, conflicting rows are
+    ignored.
+    """
+    with _transaction(engine, conn) as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        target = f"{quote(schema)}.{quote(table_name)}"
+        staging = quote(f"_staging_{table_name}")
+        columns = ", ".join(quote(col) for col in df.columns)
+        keys = ", ".join(quote(col) for col in unique_key_columns)
+        if update_cols:
+            on_conflict = "DO UPDATE SET " + ", ".join(
+                f"{quote(col)} = EXCLUDED.{quote(col)}" for col in update_cols)
+            if update_where is not None:
+                on_conflict += f" WHERE {update_where}"
+        else:
+            on_conflict = "DO NOTHING"
+
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} "
+                       f"(LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP")
+        for i in range(0, df.shape[0], copy_chunk_size):
+            buffer = io.StringIO()
+            df.iloc[i:i + copy_chunk_size].to_csv(buffer, index=False, header=False,
+                                                  na_rep="\\N")
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer)
+        cursor.execute(f"INSERT INTO {target} ({columns}) "
+                       f"SELECT {columns} FROM {staging} "
+                       f"ON CONFLICT ({keys}) {on_conflict}")
+        cursor.close()
@@ -0,0 +1,106 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Thread-safe in-process LRU cache of query results for the dashboard.
+
+    An entry expires after `ttl` seconds, or as soon as a crawl writes to the database:
+    `data_version()` returns a value which changes with every write, e.g. the latest
+    update time in "latest_prices", and entries computed at another version are stale.
+    It's called at most every `version_interval` seconds, so a crawl is seen within
+    that time. At most `maxsize` entries are kept; the least recently used one is
+    evicted first.
+    """
+    def __init__(self, maxsize=256, ttl=3600, data_version=None, version_interval=60,
+                 clock=time.time):
+        """
+        :param data_version: Function returning the version of the data. If None, entries
+        only expire after `ttl`.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data_version = data_version
+        self.version_interval = version_interval
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = None
+        self._version_lock = threading.Lock()
+
+    def version(self, now):
+        """
+        The version of the data, read again if it was last read `version_interval`
+        seconds before `now`. If it can't be read, the last one is kept.
+        """
+        if self.data_version is None:
+            return None
+        with self._version_lock:
+            if (self._version_checked is None or
+                    now - self._version_checked >= self.version_interval):
+                try:
+                    self._version = self.data_version()
+                except Exception as e:
+                    logging.warning(f"Fail to read the version of the cached data: {e}")
+                self._version_checked = now
+            return self._version
+
+    def get(self, key, compute):
+        """
+        Return the cached value of `key`, or compute and cache it with `compute()`.
+        """
+        now = self.clock()
+        version = self.version(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created, created_version = entry
+                if now - created < self.ttl and created_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+        # Compute outside the lock, so slow queries don't block other callbacks.
+        value = compute()
+        with self._lock:
+            self._entries[key] = (value, now, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def cached(self, func):
+        """
+        Decorator caching `func` by its name and positional arguments.
+        """
+        @functools.wraps(func)
+        def wrapper(*args):
+            return self.get((func.__name__, *args), lambda: func(*args))
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else None,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,20 @@
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine, text
+
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+with open("sqls/rebuild_latest_prices.sql") as f:
+    sql_rebuild_latest_prices = f.read()
+
+engine = create_engine(os.environ["NEON_DB"])
+with engine.begin() as c:
+    c.exec_driver_sql(sql_rebuild_latest_prices)
+    n = c.execute(text("SELECT count(*) FROM public.latest_prices")).scalar()
+logging.info(f"Successfully rebuild {n} rows of the latest prices.")
@@ -0,0 +1,126 @@
+import gzip
+import json
+import threading
+from collections import deque
+
+import pandas as pd
+from requests import Response
+
+
+def endpoint_of(url):
+    return url.rsplit("/", 1)[-1]
+
+
+def make_response(record):
+    response = Response()
+    response.status_code = record["status_code"]
+    response.reason = record["reason"]
+    response._content = record["body"].encode()
+    response.encoding = "utf-8"
+    return response
+
+
+class RecordingSession:
+    """
+    Wrap a requests session, and record the responses of login and blocksFromHashcodes
+    to a gzip-compressed JSONL file for `ReplaySession`. The first line holds the time of
+    the recording; each following line holds one response with its status and raw body,
+    keyed by endpoint, and for blocksFromHashcodes by fuel type and geo hash list.
+    Request bodies aren't recorded, and only the fuel types and brands are kept from the
+    login response, so a recording holds no credentials or tokens.
+    """
+    def __init__(self, session, path, recorded_at):
+        self.session = session
+        self.path = path
+        self._file = gzip.open(path, "wt")
+        self._lock = threading.Lock()
+        self._write({"recorded_at": recorded_at.isoformat()})
+
+    def post(self, url, data=None, **kwargs):
+        response = self.session.post(url, data=data, **kwargs)
+        record = {"endpoint": endpoint_of(url), "status_code": response.status_code,
+                  "reason": response.reason, "body": response.text}
+        if record["endpoint"] == "login" and response.status_code == 200:
+            response_json = response.json()
+            # A failed login has no "data"; recording it lets the client report it.
+            login_data = response_json.get("data") or {}
+            record["body"] = json.dumps({"success": response_json.get("success"), "data": {
+                "fuel_types": login_data.get("fuel_types"),
+                "brands": login_data.get("brands"),
+            }})
+        elif record["endpoint"] == "blocksFromHashcodes":
+            body = json.loads(data)
+            record["fuel_type"] = body["fuel_type_code"]
+            record["geo_hash_list"] = body["hashcodes"]
+        self._write(record)
+        return response
+
+    def __getattr__(self, name):
+        # mount(), headers, etc. of the wrapped session.
+        return getattr(self.session, name)
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ReplaySession:
+    """
+    Stand-in for a requests session, answering from a file written by
+    `RecordingSession` without network. Responses of the same request are returned in
+    the recorded order, e.g. a 503 then the successful retry, and the last one is repeated
+    afterward. Requests that weren't recorded get a 404 response.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.recorded_at = None
+        self.responses = {}
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                record = json.loads(line)
+                if "recorded_at" in record:
+                    self.recorded_at = pd.Timestamp(record["recorded_at"])
+                    continue
+                self.responses.setdefault(self.key_of(record), deque()).append(record)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_of(record):
+        if record["endpoint"] == "blocksFromHashcodes":
+            return record["endpoint"], record["fuel_type"], tuple(record["geo_hash_list"])
+        return (record["endpoint"],)
+
+    def units(self, fuel_types):
+        """
+        The (fuel_type, fuel_type_id, geo_hash_list) units of the recording, in the
+        recorded order, so a replay requests exactly what was recorded whatever the
+        stations in the database are now.
+        """
+        units = []
+        for key in self.responses:
+            if key[0] == "blocksFromHashcodes":
+                _, fuel_type, geo_hash_list = key
+                units.append((fuel_type, fuel_types[fuel_type], list(geo_hash_list)))
+        return units
+
+    def post(self, url, data=None, **kwargs):
+        record = {"endpoint": endpoint_of(url)}
+        if record["endpoint"] == "blocksFromHashcodes":
+            body = json.loads(data)
+            record["fuel_type"] = body["fuel_type_code"]
+            record["geo_hash_list"] = body["hashcodes"]
+        with self._lock:
+            recorded = self.responses.get(self.key_of(record))
+            if not recorded:
+                return make_response({"status_code": 404, "reason": "Not Recorded",
+                                      "body": json.dumps({"success": False})})
+            response = recorded.popleft() if len(recorded) > 1 else recorded[0]
+        return make_response(response)
+
+    def mount(self, prefix, adapter):
+        pass
@@ -0,0 +1,32 @@
+import argparse
+import logging
+import os
+import sys
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from ingest import refresh_price_stats
+
+parser = argparse.ArgumentParser(
+    description="Recompute \"daily_price_stats\" from \"fuel_prices\", e.g. after "
+                "backfilling history or once all shards of a crawl finish.")
+parser.add_argument("--since", type=lambda x: pd.Timestamp(x, tz="Pacific/Auckland"),
+                    default=None,
+                    help="First day (in New Zealand time) to recompute, e.g. 2026-01-01. "
+                         "By default, recompute all days.")
+args = parser.parse_args()
+logging.basicConfig(
+    handlers=[logging.StreamHandler(sys.stdout)],
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+
+engine = create_engine(os.environ["NEON_DB"])
+n = refresh_price_stats(engine, args.since)
+if n is None:
+    logging.error("Table \"daily_price_stats\" doesn't exist. Run "
+                  "migrations/005_daily_price_stats.sql first.")
+    sys.exit(1)
+logging.info(f"Successfully refresh {n} rows of daily price statistics.")
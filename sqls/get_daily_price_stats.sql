@@ -0,0 +1,6 @@
+SELECT day, value, stations, reports, min_price, median_price, mean_price, max_price
+FROM public.daily_price_stats
+WHERE fuel_type = :fuel_type
+    AND dimension = :dimension
+    AND day >= current_date - :days
+ORDER BY value, day
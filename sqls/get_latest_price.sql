@@ -1,7 +1,6 @@
-SELECT DISTINCT ON (fp.station_id)
-    fp.station_id, fp.price, fp.brand, s.name, s.latitude, s.longitude
-FROM public.fuel_prices fp
+SELECT lp.station_id, lp.price, lp.brand, s.name, s.latitude, s.longitude
+FROM public.latest_prices lp
     JOIN public.stations s
-ON fp.station_id = s.station_id
-WHERE fp.fuel_type = :fuel_type
-ORDER BY fp.station_id, fp.update_time DESC
\ No newline at end of file
+ON lp.station_id = s.station_id
+WHERE lp.fuel_type = :fuel_type
+ORDER BY lp.station_id
\ No newline at end of file
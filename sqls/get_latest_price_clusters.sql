@@ -0,0 +1,12 @@
+SELECT left(s.geo_hash, :precision) AS geo_hash, count(*) AS stations,
+       avg(s.latitude) AS latitude, avg(s.longitude) AS longitude,
+       round(avg(lp.price), 1) AS price, min(lp.price) AS min_price,
+       max(lp.price) AS max_price
+FROM public.latest_prices lp
+    JOIN public.stations s
+ON lp.station_id = s.station_id
+WHERE lp.fuel_type = :fuel_type
+    AND point(s.longitude, s.latitude) <@ box(point(:west, :south), point(:east, :north))
+    AND s.geo_hash IS NOT NULL
+GROUP BY left(s.geo_hash, :precision)
+ORDER BY 1
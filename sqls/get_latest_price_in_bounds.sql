@@ -0,0 +1,7 @@
+SELECT lp.station_id, lp.price, lp.brand, s.name, s.latitude, s.longitude
+FROM public.latest_prices lp
+    JOIN public.stations s
+ON lp.station_id = s.station_id
+WHERE lp.fuel_type = :fuel_type
+    AND point(s.longitude, s.latitude) <@ box(point(:west, :south), point(:east, :north))
+ORDER BY lp.station_id
@@ -0,0 +1,24 @@
+-- Runs of an unchanged price of each station and fuel type in "fuel_prices": when the
+-- price is first reported (valid_from) and last reported (valid_to). {last_seen} is when
+-- a row was last reported: "update_time", or "coalesce(valid_to, update_time)" if the
+-- table has "valid_to".
+CREATE TEMPORARY TABLE price_runs ON COMMIT DROP AS
+SELECT station_id, fuel_type, min(update_time) AS valid_from,
+       max(last_seen) AS valid_to, count(*) AS reports
+FROM (
+    SELECT station_id, fuel_type, update_time, last_seen,
+           count(*) FILTER (WHERE changed) OVER (
+               PARTITION BY station_id, fuel_type ORDER BY update_time) AS run
+    FROM (
+        SELECT station_id, fuel_type, update_time, {last_seen} AS last_seen,
+               price IS DISTINCT FROM lag(price) OVER (
+                   PARTITION BY station_id, fuel_type ORDER BY update_time) AS changed
+        FROM public.fuel_prices
+        WHERE station_id IS NOT NULL AND fuel_type IS NOT NULL
+            AND update_time IS NOT NULL
+    ) reports
+) runs
+GROUP BY station_id, fuel_type, run;
+
+CREATE INDEX ON price_runs (station_id, fuel_type, valid_from);
+ANALYZE price_runs;
@@ -1,4 +1,5 @@
-select *
-from fuel_prices
-where station_id not in (select distinct station_id from stations)
-order by station_id, update_time
\ No newline at end of file
+select fp.*
+from fuel_prices fp
+where fp.station_id is not null
+    and not exists (select 1 from stations s where s.station_id = fp.station_id)
+order by fp.station_id, fp.update_time
\ No newline at end of file
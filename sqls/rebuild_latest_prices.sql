@@ -0,0 +1,10 @@
+LOCK TABLE public.latest_prices IN EXCLUSIVE MODE;
+TRUNCATE public.latest_prices;
+INSERT INTO public.latest_prices (station_id, fuel_type, brand, price, update_time)
+SELECT DISTINCT ON (station_id, fuel_type)
+    station_id, fuel_type, brand, price, update_time
+FROM public.fuel_prices
+WHERE station_id IS NOT NULL
+    AND fuel_type IS NOT NULL
+    AND update_time IS NOT NULL
+ORDER BY station_id, fuel_type, update_time DESC;
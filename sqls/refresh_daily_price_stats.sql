@@ -0,0 +1,44 @@
+-- Recompute "daily_price_stats" for the days (in New Zealand time) from :since on, or for
+-- all days if :since is NULL. Medians can't be merged from partial results, so each
+-- affected day is recomputed in full from "fuel_prices".
+LOCK TABLE public.daily_price_stats IN EXCLUSIVE MODE;
+
+DELETE FROM public.daily_price_stats
+WHERE CAST(:since AS timestamp with time zone) IS NULL
+    OR day >= (CAST(:since AS timestamp with time zone) AT TIME ZONE 'Pacific/Auckland')::date;
+
+INSERT INTO public.daily_price_stats (day, fuel_type, dimension, value, stations, reports,
+                                      min_price, median_price, mean_price, max_price,
+                                      refreshed_at)
+SELECT day, fuel_type, dimension, value, stations, reports, min_price, median_price,
+       mean_price, max_price, now()
+FROM (
+    SELECT day, fuel_type,
+           CASE WHEN GROUPING(city) = 0 THEN 'city'
+                WHEN GROUPING(brand) = 0 THEN 'brand'
+                ELSE 'geo_hash' END AS dimension,
+           coalesce(city, brand, geo_hash) AS value,
+           count(DISTINCT station_id) AS stations, count(*) AS reports,
+           min(price) AS min_price,
+           round(CAST(percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS numeric), 2)
+               AS median_price,
+           round(avg(price), 2) AS mean_price, max(price) AS max_price
+    FROM (
+        SELECT (fp.update_time AT TIME ZONE 'Pacific/Auckland')::date AS day,
+               fp.fuel_type, fp.station_id, fp.brand, fp.price, s.city,
+               left(s.geo_hash, :geo_hash_precision) AS geo_hash
+        FROM public.fuel_prices fp
+            LEFT JOIN public.stations s
+        ON fp.station_id = s.station_id
+        WHERE fp.fuel_type IS NOT NULL
+            AND fp.price IS NOT NULL
+            AND fp.update_time IS NOT NULL
+            AND (CAST(:since AS timestamp with time zone) IS NULL
+                OR fp.update_time >= ((CAST(:since AS timestamp with time zone)
+                    AT TIME ZONE 'Pacific/Auckland')::date::timestamp
+                    AT TIME ZONE 'Pacific/Auckland'))
+    ) reports
+    GROUP BY GROUPING SETS ((day, fuel_type, city), (day, fuel_type, brand),
+                            (day, fuel_type, geo_hash))
+) stats
+WHERE value IS NOT NULL;
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from metrics import metrics
+from geohash_planner import in_shard
+
+index_columns = ['station_id', 'name', 'geo_hash', 'latitude', 'longitude']
+# Coordinates closer than this (in degrees, about 1 cm) are the same location.
+location_tolerance = 1e-7
+
+
+class StationIndex:
+    """
+    The stations known to the database, as arrays sorted by geo hash:
+    - `position` maps station_id to its row, for diffing crawled stations.
+    - Stations with a geo hash prefix are a contiguous range, found by binary search
+      (`prefix_range`), and `prefix_table` lists the distinct prefixes of a length
+      with the range of each.
+    The index is cached in a local JSON file with the version of "stations" in the
+    database (migrations/006_table_versions.sql), so a run where the stations haven't
+    changed reads one row instead of the whole table.
+    """
+    def __init__(self, stations, version=None):
+        """
+        :param stations: Data frame with `index_columns`; extra columns are ignored.
+        :param version: Version of "stations" in the database when the rows are read.
+        """
+        stations = stations[index_columns].sort_values(
+            'geo_hash', na_position='last', kind='stable', ignore_index=True)
+        self.station_ids = stations['station_id'].str.strip().to_numpy(dtype=object)
+        self.names = stations['name'].to_numpy(dtype=object)
+        self.geo_hashes = stations['geo_hash'].to_numpy(dtype=object)
+        self.latitudes = stations['latitude'].to_numpy(dtype=float)
+        self.longitudes = stations['longitude'].to_numpy(dtype=float)
+        # Stations without a geo hash are at the end, and never requested.
+        self.n_located = int(stations['geo_hash'].notna().sum())
+        self.position = dict(zip(self.station_ids, range(len(self.station_ids))))
+        self.version = version
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    @property
+    def stations(self):
+        """
+        :return: Data frame of the stations, sorted by geo hash, for the planners.
+        """
+        return pd.DataFrame({
+            'station_id': self.station_ids, 'name': self.names,
+            'geo_hash': self.geo_hashes, 'latitude': self.latitudes,
+            'longitude': self.longitudes,
+        })
+
+    def prefix_range(self, prefix):
+        """
+        :return: (start, stop) of the rows whose geo hash starts with `prefix`.
+        """
+        located = self.geo_hashes[:self.n_located]
+        start = int(np.searchsorted(located, prefix, side='left'))
+        # Geo hashes are base32 in lowercase, so "~" sorts after every continuation.
+        stop = int(np.searchsorted(located, prefix + "~", side='left'))
+        return start, stop
+
+    def prefix_table(self, length):
+        """
+        :return: Data frame of the distinct geo hash prefixes of `length` characters, in
+        order, with the range (start, stop) of their stations.
+        """
+        prefixes = pd.Series(self.geo_hashes[:self.n_located], dtype=object).str[:length]
+        is_first = prefixes.ne(prefixes.shift()).to_numpy()
+        starts = np.flatnonzero(is_first)
+        stops = np.append(starts[1:], self.n_located)
+        return pd.DataFrame({'prefix': prefixes.to_numpy()[starts], 'start': starts,
+                             'stop': stops})
+
+    def shard(self, shard, prefix_length=4):
+        """
+        Like `geohash_planner.shard_stations`, checksumming each prefix once.
+        :return: Data frame of the stations of the shard.
+        """
+        table = self.prefix_table(prefix_length)
+        rows = [np.arange(start, stop) for prefix, start, stop in table.itertuples(
+            index=False) if in_shard(prefix, shard, prefix_length)]
+        rows = np.concatenate(rows) if rows else np.array([], dtype=int)
+        return self.stations.iloc[rows].reset_index(drop=True)
+
+    def changed(self, stations):
+        """
+        :param stations: Crawled stations, data frame with `index_columns`.
+        :return: The rows that are new, moved (geo hash or location) or renamed, i.e.
+        the only ones worth writing to "stations".
+        """
+        stations = stations.drop_duplicates(subset=['station_id'], keep='last')
+        positions = stations['station_id'].map(self.position)
+        known = positions.notna().to_numpy()
+        i = positions[known].astype(int).to_numpy()
+        old = stations[known]
+        differs = (
+            differs_from(old['geo_hash'].to_numpy(dtype=object), self.geo_hashes[i]) |
+            differs_from(old['name'].to_numpy(dtype=object), self.names[i]) |
+            ~np.isclose(old['latitude'].to_numpy(dtype=float), self.latitudes[i],
+                        rtol=0, atol=location_tolerance, equal_nan=True) |
+            ~np.isclose(old['longitude'].to_numpy(dtype=float), self.longitudes[i],
+                        rtol=0, atol=location_tolerance, equal_nan=True)
+        )
+        is_changed = ~known
+        is_changed[known] = differs
+        return stations[is_changed]
+
+    def update(self, stations):
+        """
+        Apply stations written to the database, so they aren't written again in this
+        run. The index no longer matches `version`, so it isn't cached.
+        """
+        if stations.empty:
+            return
+        merged = pd.concat([self.stations, stations[index_columns]]).drop_duplicates(
+            subset=['station_id'], keep='last')
+        self.__dict__.update(StationIndex(merged).__dict__)
+
+    def save(self, path, database):
+        """
+        :param database: Identifies the database, e.g. a hash of the connection string.
+        """
+        if self.version is None:
+            return
+        cache = {"database": database, "version": self.version,
+                 "stations": self.stations.to_dict(orient='split', index=False)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, engine, cache_path=None):
+        """
+        Read the stations from the cache if its version is the database's, otherwise
+        from the database, and refresh the cache.
+        """
+        database = hashlib.sha256(engine.url.render_as_string().encode()).hexdigest()
+        with metrics.stage("load_stations"), engine.connect() as conn:
+            version = stations_version(conn)
+            if cache_path is not None and version is not None:
+                index = cls.from_cache(cache_path, database, version)
+                if index is not None:
+                    metrics.count("station_cache_hits")
+                    logging.info(f"Reuse {len(index)} cached stations of version "
+                                 f"{version}.")
+                    return index
+            stations = pd.read_sql(text(
+                f"SELECT {', '.join(index_columns)} FROM public.stations"), conn)
+        index = cls(stations, version)
+        if cache_path is not None:
+            index.save(cache_path, database)
+        return index
+
+    @classmethod
+    def from_cache(cls, path, database, version):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                cache = json.load(f)
+            if cache["database"] != database or cache["version"] != version:
+                return None
+            stations = pd.DataFrame(**cache["stations"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignore the station cache {path}: {e}")
+            return None
+        return cls(stations, version)
+
+
+def differs_from(a, b):
+    """
+    Element-wise inequality of object arrays, where two missing values are equal.
+    """
+    return (a != b) & ~(pd.isna(a) & pd.isna(b))
+
+
+def stations_version(conn):
+    """
+    :return: Version of "stations", which changes whenever it's written, as a string;
+    or None if migrations/006_table_versions.sql isn't applied.
+    """
+    if conn.execute(text("SELECT to_regclass('public.table_versions') IS NULL")).scalar():
+        return None
+    row = conn.execute(text("SELECT version, updated_at FROM public.table_versions "
+                            "WHERE table_name = 'stations'")).first()
+    return None if row is None else f"{row.version}:{row.updated_at.isoformat()}"
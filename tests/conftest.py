@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+import pytest
+
+import crawler
+from benchmarks.local_db import bench_engine, reset_schema
+from benchmarks.stub_gaspy import StubGaspy
+
+# Modules read sqls/ and stations.csv relative to the repository root.
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def stations():
+    return pd.read_csv("stations.csv", dtype=str).dropna(subset=["geo_hash"])
+
+
+@pytest.fixture
+def stub(stations, monkeypatch):
+    """
+    Stub gaspy.nz without latency, which crawl functions request instead of gaspy.nz.
+    """
+    with StubGaspy(stations, latency=0) as stub:
+        monkeypatch.setattr(crawler, "gaspy_url", stub.url)
+        yield stub
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """
+    Skip the pause of about 1 second between requests of the sequential engines.
+    """
+    monkeypatch.setattr(crawler.time, "sleep", lambda seconds: None)
+
+
+@pytest.fixture
+def bench_db():
+    """
+    Local PostgreSQL database of BENCH_DB, with the tables of database_schema.sql
+    recreated. Tests using it are skipped if BENCH_DB isn't set.
+    """
+    if not os.environ.get("BENCH_DB"):
+        pytest.skip("BENCH_DB isn't set.")
+    engine = bench_engine()
+    reset_schema(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,34 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from checkpoint import Checkpoint
+
+start_time = pd.Timestamp('2026-01-01 06:00', tz='UTC')
+
+
+def test_resume_restores_units_recorded_concurrently(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"))
+    checkpoint.start(start_time)
+    with ThreadPoolExecutor(8) as executor:
+        for i in range(200):
+            executor.submit(checkpoint.record, "91", [f"rck{i}"], [{"stationKey": i}])
+    checkpoint.close()
+
+    resumed_start_time, blocks = Checkpoint(checkpoint.path).resume()
+    assert resumed_start_time == start_time
+    assert len(blocks) == 200
+    assert blocks[("91", ("rck7",))] == [{"stationKey": 7}]
+
+
+def test_start_warns_before_discarding_a_checkpoint(tmp_path, caplog):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"))
+    checkpoint.start(start_time)
+    checkpoint.record("91", ["rck9"], [])
+    checkpoint.close()
+    with caplog.at_level(logging.WARNING):
+        checkpoint.start(start_time)
+    checkpoint.close()
+    assert "--resume" in caplog.text
+    assert Checkpoint(checkpoint.path).resume()[1] == {}
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+t0 = pd.Timestamp('now', tz='UTC').floor('h') - pd.Timedelta(days=1)
+
+
+def hours(n):
+    return t0 + pd.Timedelta(hours=n)
+
+
+def test_compaction_keeps_stored_valid_to(bench_db):
+    pd.DataFrame([
+        # Stored by --change-only --valid-to, then reported again by a run without it.
+        ("a", "91", 250.9, hours(0), hours(3)),
+        ("a", "91", 250.9, hours(1), None),
+        ("a", "91", 252.9, hours(4), None),
+        ("b", "91", 199.9, hours(0), hours(5)),
+        ("c", "91", 210.9, hours(0), None),
+        ("c", "91", 210.9, hours(2), None),
+    ], columns=['station_id', 'fuel_type', 'price', 'update_time', 'valid_to']).to_sql(
+        "fuel_prices", bench_db, schema="public", if_exists="append", index=False)
+    subprocess.run([sys.executable, "compact_fuel_prices.py"], check=True,
+                   env=dict(os.environ, NEON_DB=os.environ["BENCH_DB"]))
+    rows = pd.read_sql("SELECT station_id, update_time, valid_to FROM public.fuel_prices "
+                       "ORDER BY station_id, update_time", bench_db)
+    assert list(rows.itertuples(index=False, name=None)) == [
+        ("a", hours(0), hours(3)),
+        ("a", hours(4), hours(4)),
+        ("b", hours(0), hours(5)),
+        ("c", hours(0), hours(2)),
+    ]
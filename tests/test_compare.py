@@ -0,0 +1,23 @@
+from benchmarks.compare import compare
+
+
+def metric(value, better="higher"):
+    return {"value": value, "unit": "x", "better": better}
+
+
+def test_flags_regressions_by_direction():
+    old = {"rate": metric(100.0), "latency": metric(10.0, "lower"),
+           "stable": metric(50.0), "removed": metric(1.0)}
+    new = {"rate": metric(80.0), "latency": metric(9.0, "lower"),
+           "stable": metric(52.0), "added": metric(1.0)}
+    rows = {name: (change, regressed)
+            for name, _, _, change, regressed in compare(old, new, 0.1)}
+    assert set(rows) == {"rate", "latency", "stable"}
+    assert rows["rate"] == (-0.2, True)
+    assert rows["latency"][1] is False and rows["latency"][0] > 0
+    assert rows["stable"][1] is False
+
+
+def test_zero_baseline():
+    rows = compare({"errors": metric(0.0, "lower")}, {"errors": metric(2.0, "lower")}, 0.1)
+    assert rows[0][4] is True
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from crawl_state import CrawlState
+
+t0 = pd.Timestamp('2026-01-01 00:00', tz='UTC')
+
+
+def rows(*reports):
+    """
+    :param reports: (fuel_type, geo_hash, hours after t0)
+    """
+    return pd.DataFrame([
+        {'fuel_type': fuel_type, 'geo_hash': geo_hash,
+         'update_time': t0 + pd.Timedelta(hours=hours)}
+        for fuel_type, geo_hash, hours in reports
+    ], columns=['fuel_type', 'geo_hash', 'update_time'])
+
+
+def test_record_observes_changes(tmp_path):
+    state = CrawlState(str(tmp_path / "state.json"))
+    units = [("91", 1, ["rck9"])]
+    state.record(units, rows(("91", "rck9h6", 0)), t0, full_sweep=True)
+    state.record(units, rows(("91", "rck9h6", 4)), t0 + pd.Timedelta(hours=5))
+    cell = state.cells["91:rck9"]
+    assert cell['polls'] == 2 and cell['changes'] == 1
+    assert cell['mean_gap'] == 4 * 3600
+    state.save()
+    assert CrawlState(state.path).cells == state.cells
+
+
+def test_cells_of_unrecorded_units_are_untouched(tmp_path):
+    state = CrawlState(str(tmp_path / "state.json"))
+    state.record([("91", 1, ["rck9", "rb68"])],
+                 rows(("91", "rck9h6", 0), ("91", "rb68nq", 0)), t0, full_sweep=True)
+    before = dict(state.cells["91:rb68"])
+    # The unit of "rb68" fails, so only "rck9" is recorded.
+    later = t0 + pd.Timedelta(hours=30)
+    state.record([("91", 1, ["rck9"])], rows(("91", "rck9h6", 0)), later)
+    assert state.cells["91:rb68"] == before
+    assert state.due_cells("91", ["rb68", "rck9"], later + pd.Timedelta(hours=1)) == \
+        ["rb68"]
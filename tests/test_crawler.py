@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pandas as pd
+from requests import Session
+
+import crawler
+from geohash_planner import fixed_chunks
+from benchmarks.bench_parse import synthetic_blocks
+from benchmarks.stub_gaspy import brands, fuel_type_meta
+
+fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+
+
+def plan(stations, n_chunks=6):
+    return crawler.plan_units(list(fuel_types), fuel_types,
+                              fixed_chunks(stations)[:n_chunks])
+
+
+def start_time():
+    return pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=2)
+
+
+def test_engines_return_same_rows(stations, stub, no_sleep):
+    units = plan(stations)
+    since = start_time()
+    sequential = crawler.parse_blocks(
+        crawler.crawl_sequential(Session(), units, "test"), brands, since)
+    batched = crawler.parse_blocks(
+        crawler.crawl_batched(Session(), crawler.plan_batches(units), "test"), brands,
+        since)
+    concurrent = crawler.parse_blocks(asyncio.run(crawler.crawl_async(
+        Session(), units, "test", rate=float("inf"), concurrency=4)), brands, since)
+    assert not sequential.empty
+    pd.testing.assert_frame_equal(sequential, batched)
+    pd.testing.assert_frame_equal(sequential, concurrent)
+
+
+def test_async_retries_failed_requests(stations, stub):
+    units = plan(stations, n_chunks=3)
+    stub.fail_every = 3
+    blocks = asyncio.run(crawler.crawl_async(
+        Session(), units, "test", rate=float("inf"), concurrency=2, backoff=0))
+    assert len(blocks) == len(units)
+
+
+def test_async_sink_receives_every_block(stations, stub):
+    units = plan(stations, n_chunks=3)
+    received = []
+    blocks = asyncio.run(crawler.crawl_async(
+        Session(), units, "test", rate=float("inf"), sink=received.append))
+    assert blocks == []
+    assert len(received) == len(units)
+
+
+def test_vectorized_parse_matches_per_row():
+    now = pd.Timestamp('now', tz='UTC')
+    since = now - pd.Timedelta(days=1)
+    blocks = synthetic_blocks(20, 40, now)
+    per_row = crawler.parse_blocks_per_row(blocks, brands, since)
+    vectorized = crawler.parse_blocks(blocks, brands, since)
+    # The per-row path keeps pd.NA in object columns, so compare as floats / strings.
+    for column in ['price', 'latitude', 'longitude']:
+        per_row[column] = pd.to_numeric(per_row[column]).astype(float)
+    per_row['update_time'] = per_row['update_time'].astype(vectorized['update_time'].dtype)
+    pd.testing.assert_frame_equal(per_row.astype(object).where(per_row.notna(), None),
+                                  vectorized.astype(object).where(vectorized.notna(), None))
+
+
+def test_async_calls_on_unit_done_off_the_event_loop(stations, stub):
+    units = plan(stations, n_chunks=2)
+    threads = []
+    asyncio.run(crawler.crawl_async(
+        Session(), units, "test", rate=float("inf"),
+        on_unit_done=lambda *unit: threads.append(threading.get_ident())))
+    assert len(threads) == len(units)
+    assert threading.get_ident() not in threads
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The dashboard requires a connection string at import, but connects lazily.
+os.environ.setdefault("NEON_DB", "postgresql://localhost/unused")
+dashboard = pytest.importorskip("dashboard")
+
+
+def history(n_reports, change_probability=0.05, days=180, seed=0):
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp('2026-06-30', tz='UTC')
+    update_time = end - pd.to_timedelta(
+        np.sort(rng.choice(days * 86400, n_reports, replace=False))[::-1], unit="s")
+    changes = rng.random(n_reports) < change_probability
+    price = 200 + np.round(np.cumsum(changes * rng.normal(0, 3, n_reports)), 1)
+    return pd.DataFrame({'fuel_type': "91", 'price': price, 'update_time': update_time})
+
+
+def step_value(df, at):
+    """
+    Price of the step chart at times `at`.
+    """
+    i = np.searchsorted(df['update_time'].to_numpy(), at, side='right') - 1
+    return df['price'].to_numpy()[i]
+
+
+def test_step_downsample_keeps_the_step_chart():
+    df = history(20_000)
+    changes = dashboard.step_downsample(df, df.shape[0])
+    assert changes.shape[0] < df.shape[0]
+    assert changes['update_time'].iloc[-1] == df['update_time'].iloc[-1]
+    at = df['update_time'].to_numpy()
+    assert (step_value(df, at) == step_value(changes, at)).all()
+
+
+# Beyond 2000 points, the buckets of 180 days in nanoseconds overflow int64.
+@pytest.mark.parametrize("max_points", [400, 2000, 4000, 20_000])
+def test_step_downsample_keeps_wide_steps(max_points):
+    df = history(200_000, change_probability=0.2)
+    # Without reports for 5 days, every 15 days.
+    days = (df['update_time'] - df['update_time'].iloc[0]).dt.days
+    df = df[days % 15 >= 5].reset_index(drop=True)
+    changes = dashboard.step_downsample(df, df.shape[0])
+    downsampled = dashboard.step_downsample(df, max_points)
+    assert changes.shape[0] > max_points
+    assert downsampled.shape[0] <= max_points
+    assert downsampled['update_time'].is_monotonic_increasing
+    # After a step wider than 2 buckets, the next bucket is empty, so the step starts
+    # with the last point of its bucket, which is kept.
+    span = df['update_time'].iloc[-1] - df['update_time'].iloc[0]
+    starts = changes['update_time']
+    wide = starts[(starts.shift(-1) - starts) > 2 * span / (max_points // 4)]
+    assert not wide.empty
+    assert wide.isin(downsampled['update_time']).all()
+
+
+def test_step_downsample_handles_missing_prices():
+    df = history(3000, change_probability=0.5)
+    df.loc[:1499, 'price'] = np.nan
+    changes = dashboard.step_downsample(df, df.shape[0])
+    # The missing prices are one step.
+    assert changes['price'].isna().sum() == 1
+    at = df['update_time'].to_numpy()
+    np.testing.assert_array_equal(step_value(df, at), step_value(changes, at))
+    downsampled = dashboard.step_downsample(df, 100)
+    assert downsampled.shape[0] <= 100
+    assert np.isnan(downsampled['price'].iloc[0])
@@ -0,0 +1,69 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+import crawler
+from gaspy_client import GaspyClient
+from benchmarks.stub_gaspy import brands
+
+
+def request_blocks(client):
+    return client.post(f"{crawler.gaspy_url}/api/v1/Map/blocksFromHashcodes",
+                       data=crawler.blocks_request_body(["rck9"], 1, "91", client.device_id))
+
+
+def test_reuses_the_cached_login(stub, tmp_path):
+    stub.token_ttl = 3600
+    path = str(tmp_path / "gaspy_session.json")
+    first = GaspyClient("a", "b", cache_path=path)
+    first.login()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    second = GaspyClient("a", "b", cache_path=path)
+    second.login()
+    assert stub.logins == 1
+    assert second.device_id == first.device_id
+    assert second.brands == brands
+    # The cached session cookie is accepted.
+    assert request_blocks(second).status_code == 200
+    assert stub.unauthorized == 0
+
+
+def test_logs_in_if_the_cache_expired(stub, tmp_path):
+    path = str(tmp_path / "gaspy_session.json")
+    GaspyClient("a", "b", cache_path=path, ttl=0).login()
+    client = GaspyClient("a", "b", cache_path=path)
+    client.login()
+    assert stub.logins == 2
+    # The new login is cached.
+    GaspyClient("a", "b", cache_path=path).login()
+    assert stub.logins == 2
+
+
+def test_logs_in_if_the_cache_is_of_another_account(stub, tmp_path):
+    path = str(tmp_path / "gaspy_session.json")
+    GaspyClient("a", "b", cache_path=path).login()
+    GaspyClient("c", "d", cache_path=path).login()
+    assert stub.logins == 2
+
+
+def test_logs_in_again_and_retries_after_401(stub):
+    stub.token_ttl = 3600
+    client = GaspyClient("a", "b")
+    client.login()
+    # The server forgets the session, like when a login expires.
+    stub.tokens.clear()
+    assert request_blocks(client).status_code == 200
+    assert stub.unauthorized == 1
+    assert stub.logins == 2
+    assert stub.requests == 1
+
+
+def test_concurrent_401s_log_in_once(stub):
+    stub.token_ttl = 3600
+    client = GaspyClient("a", "b")
+    client.login()
+    stub.tokens.clear()
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(lambda _: request_blocks(client), range(8)))
+    assert [response.status_code for response in responses] == [200] * 8
+    assert stub.logins == 2
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from requests import Session
+
+import crawler
+from geohash_planner import (collapse_geo_hashes, fixed_chunks, parse_shard,
+                             shard_stations, trie_chunks)
+from benchmarks.stub_gaspy import brands
+
+
+def crawled_stations(geo_hash_chunks):
+    units = crawler.plan_units(['91'], {'91': 1}, geo_hash_chunks)
+    blocks = crawler.crawl_sequential(Session(), units, "test")
+    since = pd.Timestamp('now', tz='UTC') - pd.Timedelta(days=30)
+    return set(crawler.parse_blocks(blocks, brands, since)['station_id'])
+
+
+def test_collapse_removes_duplicated_and_enclosed_cells():
+    assert collapse_geo_hashes(["rck9", "rck9h6", "rck9", None, "rb68"]) == \
+        ["rb68", "rck9"]
+
+
+def test_collapse_siblings_into_parent():
+    # Cells are never collapsed to be shorter than the shortest input.
+    assert collapse_geo_hashes(["rck91", "rck92", "rck93", "rb68"],
+                               sibling_threshold=3) == ["rb68", "rck9"]
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"mixed_lengths": True},
+    {"sibling_threshold": 2, "mixed_lengths": True},
+])
+def test_trie_chunks_cover_fixed_chunks(stations, stub, no_sleep, options):
+    trie = trie_chunks(stations, 39, **options)
+    baseline = fixed_chunks(stations, 39)
+    assert len(trie) <= len(baseline)
+    assert crawled_stations(trie) >= crawled_stations(baseline)
+
+
+def test_shards_partition_stations(stations):
+    shards = [shard_stations(stations, (i, 4)) for i in range(1, 5)]
+    assert sum(shard.shape[0] for shard in shards) == stations.shape[0]
+    assert set().union(*(set(shard['id']) for shard in shards)) == set(stations['id'])
+
+
+@pytest.mark.parametrize("spec", ["0/4", "5/4", "a/b"])
+def test_parse_shard_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
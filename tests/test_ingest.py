@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from ingest import (ChangeFilter, PipelineWriter, has_latest_prices, price_table_columns,
+                    write_prices)
+from benchmarks.bench_parse import synthetic_blocks
+from benchmarks.stub_gaspy import brands
+
+t0 = pd.Timestamp('2026-01-01 00:00', tz='UTC')
+
+
+def reports(*rows):
+    """
+    :param rows: (station_id, fuel_type, price, minutes after t0)
+    """
+    return pd.DataFrame([
+        {'station_id': station_id, 'brand': 'Z', 'fuel_type': fuel_type, 'price': price,
+         'update_time': t0 + pd.Timedelta(minutes=minutes)}
+        for station_id, fuel_type, price, minutes in rows
+    ], columns=price_table_columns)
+
+
+def last_prices(*rows, valid_to=False):
+    prices = reports(*rows)[['station_id', 'fuel_type', 'price', 'update_time']]
+    if valid_to:
+        prices['valid_to'] = prices['update_time']
+    return prices
+
+
+def test_keeps_only_price_changes():
+    change_filter = ChangeFilter(last_prices(("a", "91", 250.9, 0)))
+    kept = change_filter.filter(reports(
+        ("a", "91", 250.9, 10), ("a", "91", 251.9, 20), ("a", "91", 251.9, 30),
+        ("b", "91", 199.9, 10), ("a", "95", 270.0, 10)))
+    assert sorted(zip(kept['station_id'], kept['fuel_type'], kept['price'])) == [
+        ("a", "91", 251.9), ("a", "95", 270.0), ("b", "91", 199.9)]
+    assert change_filter.unchanged == 2
+
+
+def test_drops_reports_not_newer_than_last():
+    change_filter = ChangeFilter(last_prices(("a", "91", 250.9, 60)))
+    assert change_filter.filter(reports(("a", "91", 260.0, 30),
+                                        ("a", "91", 260.0, 60))).empty
+
+
+def test_remembers_prices_across_batches():
+    change_filter = ChangeFilter(last_prices())
+    assert change_filter.filter(reports(("a", "91", 250.9, 0))).shape[0] == 1
+    assert change_filter.filter(reports(("a", "91", 250.9, 10))).empty
+    assert change_filter.filter(reports(("a", "91", 250.0, 20))).shape[0] == 1
+
+
+def test_rounds_prices_like_the_database():
+    change_filter = ChangeFilter(last_prices(("a", "91", 250.9, 0)))
+    assert change_filter.filter(reports(("a", "91", 250.94, 10))).empty
+
+
+def test_missing_prices_are_a_price():
+    change_filter = ChangeFilter(last_prices(("a", "91", None, 0)))
+    kept = change_filter.filter(reports(
+        ("a", "91", None, 10), ("a", "91", 250.9, 20), ("a", "91", None, 30)))
+    assert kept['update_time'].tolist() == [t0 + pd.Timedelta(minutes=20),
+                                            t0 + pd.Timedelta(minutes=30)]
+
+
+def test_valid_to_extends_the_current_run():
+    change_filter = ChangeFilter(last_prices(("a", "91", 250.9, 0), valid_to=True),
+                                 valid_to=True)
+    kept = change_filter.filter(reports(
+        ("a", "91", 250.9, 10), ("a", "91", 250.9, 20), ("a", "91", 252.9, 30)))
+    runs = list(zip(kept['price'], kept['update_time'], kept['valid_to']))
+    assert runs == [
+        (250.9, t0, t0 + pd.Timedelta(minutes=20)),
+        (252.9, t0 + pd.Timedelta(minutes=30), t0 + pd.Timedelta(minutes=30)),
+    ]
+
+
+def test_pipeline_writer_error_is_optional_on_close():
+    now = pd.Timestamp('now', tz='UTC')
+    # Without an engine, writing fails.
+    writer = PipelineWriter(None, brands, now - pd.Timedelta(days=1))
+    writer.start()
+    for block in synthetic_blocks(2, 5, now):
+        writer.put(block)
+    writer.close(raise_error=False)
+    assert writer.error is not None
+
+    writer = PipelineWriter(None, brands, now - pd.Timedelta(days=1))
+    writer.start()
+    writer.put(synthetic_blocks(1, 5, now)[0])
+    with pytest.raises(Exception):
+        writer.close()
+
+
+def test_write_prices_without_latest_prices(bench_db, caplog):
+    prices = reports(("a", "91", 250.9, 0), ("a", "91", 251.9, 10))
+    assert has_latest_prices(bench_db)
+    write_prices(bench_db, prices)
+    latest = pd.read_sql("SELECT price FROM public.latest_prices", bench_db)
+    assert latest['price'].tolist() == [251.9]
+    with bench_db.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE public.latest_prices")
+    assert not has_latest_prices(bench_db)
+    assert "migrations/001_latest_prices.sql" in caplog.text
+    write_prices(bench_db, reports(("b", "91", 199.9, 0)), latest_prices=False)
+    assert pd.read_sql("SELECT count(*) FROM public.fuel_prices", bench_db).iloc[0, 0] == 3
@@ -0,0 +1,78 @@
+import datetime
+from types import SimpleNamespace
+
+from metrics import Metrics
+
+
+def response(latency, status_code=200, size=10):
+    return SimpleNamespace(elapsed=datetime.timedelta(seconds=latency),
+                           status_code=status_code, content=b"x" * size)
+
+
+def crawl_metrics():
+    metrics = Metrics()
+    for latency in range(1, 101):
+        metrics.observe_request("blocks", response(latency / 100), stations=2)
+    metrics.observe_request("blocks", response(5.0, status_code=503))
+    metrics.observe_request("login", response(0.5))
+    metrics.observe_stage("parse", 1.5, rows=100)
+    metrics.observe_stage("parse", 0.5, rows=20)
+    metrics.count("retries", 3)
+    return metrics
+
+
+def test_summary_percentiles():
+    summary = crawl_metrics().summary()
+    blocks = summary["requests"]["blocks"]
+    assert blocks["count"] == 101
+    assert blocks["status_codes"] == {"200": 100, "503": 1}
+    assert blocks["latency_p50"] == 0.51
+    assert abs(blocks["latency_p95"] - 0.96) < 1e-9
+    assert blocks["latency_max"] == 5.0
+    assert blocks["bytes"] == 1010
+    assert blocks["stations"] == 200
+    assert summary["stages"]["parse"] == {"seconds": 2.0, "calls": 2, "max_seconds": 1.5,
+                                          "rows": 120}
+    assert summary["counters"] == {"retries": 3}
+
+
+def test_prometheus_text_format(tmp_path):
+    path = str(tmp_path / "crawl.prom")
+    crawl_metrics().write_prometheus(path)
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert "# TYPE gaspy_crawl_stage_seconds gauge" in lines
+    assert 'gaspy_crawl_stage_rows{stage="parse"} 120' in lines
+    assert 'gaspy_crawl_requests{endpoint="blocks",status_code="503"} 1' in lines
+    assert 'gaspy_crawl_request_latency_seconds{endpoint="blocks",quantile="0.5"} 0.51' \
+        in lines
+    assert 'gaspy_crawl_events{name="retries"} 3' in lines
+    # Every sample is a metric name, optional labels and a value.
+    for line in lines:
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            assert name.startswith("gaspy_crawl_")
+            float(value)
+
+
+def test_merge_json_keeps_keys_of_every_run(tmp_path):
+    first, second = crawl_metrics(), Metrics()
+    second.observe_stage("write_prices", 2.0, rows=50)
+    second.observe_stage("parse", 3.0, rows=10)
+    second.observe_request("blocks", response(0.2))
+    second.count("failed_regions")
+    paths = [str(tmp_path / "metrics.1of2.json"), str(tmp_path / "metrics.2of2.json")]
+    first.write_json(paths[0])
+    second.write_json(paths[1])
+
+    merged = Metrics()
+    for path in paths:
+        merged.merge_json(path)
+    summary = merged.summary()
+    assert set(summary["stages"]) == {"parse", "write_prices"}
+    assert summary["stages"]["parse"] == {"seconds": 5.0, "calls": 3, "max_seconds": 3.0,
+                                          "rows": 130}
+    assert summary["counters"] == {"retries": 3, "failed_regions": 1}
+    assert set(summary["requests"]) == {"blocks", "login"}
+    assert summary["requests"]["blocks"]["count"] == 102
+    assert merged.started == min(first.started, second.started)
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import InvalidRequestError
+
+from postgresql_upsert import get_table, invalidate_table_cache, reflection_count
+
+
+@pytest.fixture
+def engine():
+    # Reflection works the same on SQLite, in memory.
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE prices (station_id text PRIMARY KEY, price real)")
+    yield engine
+    engine.dispose()
+
+
+def test_reflects_a_table_once(engine):
+    table = get_table(engine, "prices", schema="main")
+    assert get_table(engine, "prices", schema="main") is table
+    assert [column.name for column in table.columns] == ["station_id", "price"]
+    assert reflection_count(engine) == 1
+
+
+def test_invalidate_reflects_again(engine):
+    table = get_table(engine, "prices", schema="main")
+    invalidate_table_cache(engine, schema="main", table_name="other")
+    assert get_table(engine, "prices", schema="main") is table
+    invalidate_table_cache(engine)
+    assert get_table(engine, "prices", schema="main") is not table
+    assert reflection_count(engine) == 2
+
+
+def test_ttl_expires_reflected_tables(engine):
+    get_table(engine, "prices", schema="main", ttl=0)
+    get_table(engine, "prices", schema="main", ttl=0)
+    assert reflection_count(engine) == 2
+
+
+def test_cache_is_per_engine(engine):
+    get_table(engine, "prices", schema="main")
+    other = create_engine("sqlite://")
+    with pytest.raises(InvalidRequestError):
+        get_table(other, "prices", schema="main")
+    assert reflection_count(other) == 0
+    assert reflection_count(engine) == 1
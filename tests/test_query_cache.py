@@ -0,0 +1,90 @@
+from query_cache import QueryCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Counter:
+    """
+    Computes the value of a key, counting the calls.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+def test_hit_until_ttl():
+    clock = Clock()
+    cache = QueryCache(ttl=10, clock=clock)
+    compute = Counter()
+    assert cache.get("a", compute) == 1
+    clock.now = 9
+    assert cache.get("a", compute) == 1
+    clock.now = 10
+    assert cache.get("a", compute) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used():
+    cache = QueryCache(maxsize=2, clock=Clock())
+    cache.get("a", lambda: "a")
+    cache.get("b", lambda: "b")
+    cache.get("a", lambda: "not cached")
+    cache.get("c", lambda: "c")
+    assert cache.get("a", lambda: "recomputed") == "a"
+    assert cache.get("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["evictions"] == 2
+
+
+def test_expires_when_the_data_version_changes():
+    clock = Clock()
+    version = {"value": "2026-01-01 06:10"}
+    cache = QueryCache(ttl=86400, data_version=lambda: version["value"],
+                       version_interval=60, clock=clock)
+    compute = Counter()
+    assert cache.get("a", compute) == 1
+    # A crawl at any time, e.g. a delayed or incremental run.
+    version["value"] = "2026-01-01 09:47"
+    clock.now = 30
+    # The version is read again only after version_interval.
+    assert cache.get("a", compute) == 1
+    clock.now = 60
+    assert cache.get("a", compute) == 2
+    clock.now = 3600
+    assert cache.get("a", compute) == 2
+
+
+def test_keeps_the_last_version_if_it_cant_be_read():
+    clock = Clock()
+
+    def data_version():
+        if clock.now > 0:
+            raise OSError("The database is unreachable.")
+        return "v1"
+
+    cache = QueryCache(data_version=data_version, version_interval=60, clock=clock)
+    compute = Counter()
+    assert cache.get("a", compute) == 1
+    clock.now = 60
+    assert cache.get("a", compute) == 1
+
+
+def test_cached_decorator_keys_by_name_and_arguments():
+    cache = QueryCache(clock=Clock())
+    calls = []
+
+    @cache.cached
+    def query(fuel_type):
+        calls.append(fuel_type)
+        return fuel_type
+
+    assert [query("91"), query("91"), query("95")] == ["91", "91", "95"]
+    assert calls == ["91", "95"]
@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+import pytest
+from requests import Session
+
+import crawler
+from gaspy_client import GaspyClient
+from recording import RecordingSession, ReplaySession, make_response
+from benchmarks.stub_gaspy import brands, fuel_type_meta
+from geohash_planner import fixed_chunks
+
+recorded_at = pd.Timestamp('2026-01-01 06:00', tz='UTC')
+
+
+class RejectingSession:
+    """
+    Answers every request like gaspy.nz answers a wrong password.
+    """
+    def post(self, url, data=None, **kwargs):
+        return make_response({"status_code": 200, "reason": "OK",
+                              "body": json.dumps({"success": False})})
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+def test_replay_returns_the_recorded_blocks(stations, stub, no_sleep, tmp_path):
+    path = str(tmp_path / "recording.jsonl.gz")
+    fuel_types = {code: int(key) for key, code in fuel_type_meta.items()}
+    units = crawler.plan_units(list(fuel_types), fuel_types, fixed_chunks(stations)[:3])
+    session = RecordingSession(Session(), path, recorded_at)
+    GaspyClient("a", "b", session=session).login()
+    recorded = crawler.crawl_sequential(session, units, "test")
+    session.close()
+
+    replay = ReplaySession(path)
+    client = GaspyClient("a", "b", session=replay)
+    client.login()
+    assert client.brands == brands
+    assert replay.recorded_at == recorded_at
+    assert replay.units(fuel_types) == units
+    assert crawler.crawl_sequential(replay, units, "test") == recorded
+
+
+def test_recording_a_failed_login(tmp_path):
+    session = RecordingSession(RejectingSession(), str(tmp_path / "recording.jsonl.gz"),
+                               recorded_at)
+    with pytest.raises(AssertionError, match="don't match"):
+        GaspyClient("a", "wrong", session=session).login()
+    session.close()
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from station_index import StationIndex, index_columns
+
+
+def make_stations():
+    return pd.DataFrame({
+        'station_id': ["a", "b", "c", "d"],
+        'name': ["A", "B", "C", "D"],
+        'geo_hash': ["rck9h6", "rb68nq", "rck9h7", None],
+        'latitude': [-37.0, -43.0, -37.1, -40.0],
+        'longitude': [175.0, 172.0, 175.1, 174.0],
+    })
+
+
+def test_prefix_range():
+    index = StationIndex(make_stations())
+    start, stop = index.prefix_range("rck9")
+    assert sorted(index.station_ids[start:stop]) == ["a", "c"]
+    assert index.prefix_range("zzz")[0] == index.prefix_range("zzz")[1]
+
+
+def test_changed_finds_new_moved_and_renamed_stations():
+    index = StationIndex(make_stations())
+    crawled = make_stations()
+    crawled.loc[0, 'name'] = "A renamed"
+    crawled.loc[1, 'latitude'] += 0.001
+    crawled.loc[2, 'latitude'] += 1e-9
+    crawled.loc[4] = ["e", "E", "rch123", -36.0, 174.0]
+    assert sorted(index.changed(crawled)['station_id']) == ["a", "b", "e"]
+
+
+def test_update_applies_written_stations():
+    index = StationIndex(make_stations(), version="1")
+    crawled = make_stations()
+    crawled.loc[0, 'name'] = "A renamed"
+    index.update(index.changed(crawled))
+    assert index.changed(crawled).empty
+
+
+def test_cache_round_trip(tmp_path):
+    path = str(tmp_path / "stations_cache.json")
+    index = StationIndex(make_stations(), version="3:2026-01-01T00:00:00")
+    index.save(path, "db")
+    cached = StationIndex.from_cache(path, "db", index.version)
+    pd.testing.assert_frame_equal(cached.stations[index_columns],
+                                  index.stations[index_columns])
+    assert StationIndex.from_cache(path, "db", "4:2026-01-02T00:00:00") is None
+    assert StationIndex.from_cache(path, "other db", index.version) is None